@@ -0,0 +1,63 @@
+# backend/app/admin_routes.py
+import asyncio
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException
+
+from .dead_letters import DeadLetterQueue
+from .infrastructure import verify_github_token
+from .webhooks import DEAD_LETTER_TASK as WEBHOOK_DEAD_LETTER_TASK, requeue_webhook
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(verify_github_token)])
+
+
+def _queue() -> DeadLetterQueue:
+    queue = DeadLetterQueue()
+    if queue.redis is None:
+        raise HTTPException(status_code=503, detail="Dead-letter queue unavailable: Redis not configured")
+    return queue
+
+
+@router.get("/dead-letters")
+async def list_dead_letters(offset: int = 0, limit: int = 50):
+    """Newest first; entries are summarised, fetch one for its arguments and traceback."""
+    limit = max(1, min(limit, 500))
+    return await asyncio.to_thread(_queue().list, max(0, offset), limit)
+
+
+@router.get("/dead-letters/{entry_id}")
+async def get_dead_letter(entry_id: str):
+    entry = await asyncio.to_thread(_queue().get, entry_id)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Dead letter not found")
+    return entry
+
+
+@router.post("/dead-letters/{entry_id}/replay")
+async def replay_dead_letter(entry_id: str):
+    from .tasks import replay_dead_letter as send_again
+
+    queue = _queue()
+    entry = await asyncio.to_thread(queue.get, entry_id)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Dead letter not found")
+    try:
+        if entry["task"] == WEBHOOK_DEAD_LETTER_TASK:
+            task_id = await requeue_webhook(entry["args"][0])
+        else:
+            task_id = await asyncio.to_thread(send_again, entry)
+    except Exception as e:
+        logger.exception("Replay of dead letter %s failed", entry_id)
+        raise HTTPException(status_code=503, detail=f"Could not replay: {e}")
+    # Removed only once the broker accepted it; a failed replay fails again into a new entry
+    await asyncio.to_thread(queue.delete, entry_id)
+    logger.info("Replayed dead letter %s (%s for %s) as %s", entry_id, entry["task"], entry.get("request_identifier"), task_id)
+    return {"status": "replayed", "id": entry_id, "task_id": task_id}
+
+
+@router.delete("/dead-letters/{entry_id}")
+async def delete_dead_letter(entry_id: str):
+    if not await asyncio.to_thread(_queue().delete, entry_id):
+        raise HTTPException(status_code=404, detail="Dead letter not found")
+    return {"status": "deleted", "id": entry_id}
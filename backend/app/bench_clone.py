@@ -0,0 +1,86 @@
+# backend/app/bench_clone.py
+"""
+Compare a full clone of the infra repo with the shallow, blob-less sparse clone
+GitHubManager uses when GITHUB_CLONE_MODE=sparse.
+
+    python -m app.bench_clone --runs 3
+    python -m app.bench_clone --url file:///path/to/repo.git --sparse-dir backend/terraform/environments/aws/dev/requests
+
+Bytes transferred are measured as the size of the object store after the clone
+(pack files plus loose objects), which is what the server sent.
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from typing import Dict, List
+
+from .github_manager import GitHubManager
+
+DEFAULT_SPARSE_DIR = "backend/terraform/environments/aws/dev/requests"
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _checked_out_files(repo_path: str) -> int:
+    count = 0
+    for root, dirs, files in os.walk(repo_path):
+        if ".git" in dirs:
+            dirs.remove(".git")
+        count += len(files)
+    return count
+
+
+async def _clone_once(gm: GitHubManager, sparse_dirs: List[str]) -> Dict[str, float]:
+    started = time.perf_counter()
+    repo_path = await gm._setup_repository(sparse_dirs or None)
+    elapsed = time.perf_counter() - started
+    try:
+        return {
+            "seconds": elapsed,
+            "bytes": _dir_size(os.path.join(repo_path, ".git", "objects")),
+            "files": _checked_out_files(repo_path),
+        }
+    finally:
+        shutil.rmtree(os.path.dirname(repo_path), ignore_errors=True)
+
+
+async def run(url: str, runs: int, sparse_dir: str):
+    gm = GitHubManager()
+    if url:
+        gm._clone_url = lambda: url
+
+    print(f"{'mode':<8} {'runs':>4} {'median s':>10} {'min s':>8} {'objects':>12} {'files':>7}")
+    for mode, sparse_dirs in (("full", []), ("sparse", [sparse_dir])):
+        samples = [await _clone_once(gm, sparse_dirs) for _ in range(runs)]
+        seconds = [s["seconds"] for s in samples]
+        print(
+            f"{mode:<8} {runs:>4} {statistics.median(seconds):>10.2f} {min(seconds):>8.2f} "
+            f"{samples[-1]['bytes'] / 1024:>10.0f}KB {samples[-1]['files']:>7}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark full vs sparse clone of the infra repo")
+    parser.add_argument("--url", default="", help="clone URL (defaults to the configured GitHub repo)")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--sparse-dir", default=DEFAULT_SPARSE_DIR)
+    args = parser.parse_args()
+    os.chdir(tempfile.gettempdir())
+    asyncio.run(run(args.url, args.runs, args.sparse_dir))
+
+
+if __name__ == "__main__":
+    main()
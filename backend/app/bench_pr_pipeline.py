@@ -0,0 +1,164 @@
+# backend/app/bench_pr_pipeline.py
+"""
+Offline benchmark of the tfvars -> branch -> commit -> push -> PR pipeline against
+app.fake_github (local bare origin, fake REST server, gh shim). No network, Redis or
+database is needed.
+
+    python -m app.bench_pr_pipeline
+    python -m app.bench_pr_pipeline --backend api --levels 1 10 50 --latency-ms 30
+
+For every concurrency level it prints per-stage p50/p95 latency and overall throughput,
+and checks that each request got its own PR whose head branch carries its tfvars file.
+"""
+import argparse
+import asyncio
+import functools
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+from typing import Dict, List
+
+from .fake_github import OfflineGitHub
+
+# Stage name -> GitHubManager (or GitHubAPIClient) method it times
+STAGES = {
+    "render": "_tfvars_for_request",
+    "checkout": ("_setup_worktree", "_setup_repository"),
+    "write": "_create_terraform_files",
+    "commit": "_commit_changes",
+    "push": "_push_branch",
+    "pr": "_create_pr",
+    "cleanup": "_cleanup_repository",
+}
+API_STAGES = {"api_commit": "commit_files", "pr": "create_pull_request"}
+
+
+def _instrument(obj, method_name: str, stage: str, samples: Dict[str, List[float]]):
+    original = getattr(obj, method_name)
+    if asyncio.iscoroutinefunction(original):
+        @functools.wraps(original)
+        async def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await original(*args, **kwargs)
+            finally:
+                samples[stage].append(time.perf_counter() - started)
+    else:
+        @functools.wraps(original)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                samples[stage].append(time.perf_counter() - started)
+    setattr(obj, method_name, timed)
+
+
+def _details(environment: str) -> Dict:
+    return {
+        "request": SimpleNamespace(environment=environment, cloud_provider="aws"),
+        "user": SimpleNamespace(email="bench@example.com", name="Bench", department="Engineering"),
+        "parameters": {"environment": environment, "instance_type": "t3.micro", "region": "us-east-1"},
+    }
+
+
+def _pct(values: List[float], q: float) -> float:
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[int(q) - 1]
+
+
+async def run_level(fake: OfflineGitHub, backend: str, concurrency: int, total: int) -> Dict:
+    gm = fake.manager(backend=backend)
+    for name in ("app.github_manager", "app.github_api", "app.terraform_manager"):
+        # Those modules pin their loggers to INFO; one line per git step drowns the report
+        logging.getLogger(name).setLevel(logging.WARNING)
+    samples: Dict[str, List[float]] = defaultdict(list)
+    if backend == "api":
+        for stage, method in API_STAGES.items():
+            _instrument(gm.api, method, stage, samples)
+        _instrument(gm, "_tfvars_for_request", "render", samples)
+    else:
+        for stage, methods in STAGES.items():
+            for method in (methods if isinstance(methods, tuple) else (methods,)):
+                _instrument(gm, method, stage, samples)
+
+    gate = asyncio.Semaphore(concurrency)
+    prefix = f"bench_{backend}_{concurrency}_{int(time.time())}"
+
+    async def one(i: int):
+        rid = f"{prefix}_{i}"
+        async with gate:
+            started = time.perf_counter()
+            pr_number = await gm.create_pull_request(rid, _details("dev"))
+            samples["total"].append(time.perf_counter() - started)
+            return rid, pr_number
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one(i) for i in range(total)), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+
+    failures = [r for r in results if isinstance(r, Exception)]
+    succeeded = [r for r in results if not isinstance(r, Exception)]
+    numbers = [n for _, n in succeeded]
+    if len(set(numbers)) != len(numbers) or not all(numbers):
+        failures.append(AssertionError(f"PR numbers not unique/non-zero: {numbers}"))
+    for rid, number in succeeded:
+        head = fake.pulls[number]["head"]["ref"]
+        expected = f"backend/terraform/environments/aws/dev/requests/{rid}.tfvars"
+        if expected not in fake.branch_files(head):
+            failures.append(AssertionError(f"{head} does not carry {expected}"))
+
+    return {"samples": samples, "elapsed": elapsed, "ok": len(succeeded), "failures": failures}
+
+
+def _print_level(backend: str, concurrency: int, total: int, result: Dict):
+    print(f"\n{backend} backend, concurrency={concurrency}, requests={total}: "
+          f"{result['ok']}/{total} ok in {result['elapsed']:.2f}s "
+          f"({result['ok'] / result['elapsed']:.1f} req/s)")
+    print(f"  {'stage':<11} {'n':>4} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}")
+    order = ["render", "checkout", "write", "commit", "push", "api_commit", "pr", "cleanup", "total"]
+    for stage in order:
+        values = result["samples"].get(stage)
+        if not values:
+            continue
+        print(f"  {stage:<11} {len(values):>4} {_pct(values, 50) * 1000:>9.1f} "
+              f"{_pct(values, 95) * 1000:>9.1f} {max(values) * 1000:>9.1f}")
+    for failure in result["failures"][:5]:
+        print(f"  FAILED: {failure}")
+
+
+async def main_async(args) -> bool:
+    ok = True
+    with OfflineGitHub(latency_ms=args.latency_ms) as fake:
+        for concurrency in args.levels:
+            total = max(concurrency, args.requests or concurrency * 2)
+            result = await run_level(fake, args.backend, concurrency, total)
+            _print_level(args.backend, concurrency, total, result)
+            ok = ok and not result["failures"]
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline PR pipeline benchmark")
+    parser.add_argument("--backend", choices=["mirror", "clone", "api"], default="mirror")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--requests", type=int, default=0, help="requests per level (default: 2x concurrency)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="added latency per fake API call")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    # Keep rendered tfvars out of the source tree
+    workdir = tempfile.mkdtemp(prefix="aiops-bench-")
+    os.chdir(workdir)
+    os.environ["REPO_ROOT"] = workdir
+    sys.exit(0 if asyncio.run(main_async(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
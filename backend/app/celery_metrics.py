@@ -0,0 +1,151 @@
+# backend/app/celery_metrics.py
+"""
+Celery task telemetry from signals: queue wait, run time and outcome per task name, served
+by each worker on the first free port from CELERY_METRICS_PORT (logged at startup).
+
+Queue wait is measured from a timestamp stamped into the message headers at publish time
+(retries are republished, so each attempt is measured on its own). With the prefork pool
+the samples are recorded in the child processes; set PROMETHEUS_MULTIPROC_DIR for the
+worker so the endpoint, which runs in the parent, aggregates them. Each worker moves its
+children to a subdirectory named after its node name, so workers sharing a host and a
+PROMETHEUS_MULTIPROC_DIR neither count nor wipe each other's files.
+"""
+import glob
+import logging
+import os
+import re
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+from celery.signals import (
+    before_task_publish,
+    task_failure,
+    task_postrun,
+    task_prerun,
+    task_retry,
+    worker_init,
+    worker_process_shutdown,
+)
+from prometheus_client import CollectorRegistry, multiprocess, start_http_server
+
+from .config import CELERY_METRICS_PORT, CELERY_METRICS_PORT_RANGE, PROMETHEUS_MULTIPROC_DIR
+from .metrics import CELERY_TASK_QUEUE_WAIT, CELERY_TASK_RUNTIME, registry, track_celery_task
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+PUBLISHED_AT_HEADER = "published_at"
+
+# task_id -> perf_counter at task_prerun
+_started: Dict[str, float] = {}
+
+
+def _queue_wait(request) -> Optional[float]:
+    published_at = getattr(request, PUBLISHED_AT_HEADER, None)
+    if published_at is None:
+        return None  # eager call, or published by a client that does not stamp messages
+    ready_at = float(published_at)
+    if request.eta:
+        # A countdown is a deliberate delay, not queueing
+        eta = request.eta if isinstance(request.eta, datetime) else datetime.fromisoformat(request.eta)
+        ready_at = max(ready_at, eta.timestamp())
+    return max(0.0, time.time() - ready_at)
+
+
+@before_task_publish.connect
+def _stamp_published_at(headers=None, **kwargs):
+    if headers is not None:
+        headers[PUBLISHED_AT_HEADER] = time.time()
+
+
+@task_prerun.connect
+def _on_task_prerun(task_id=None, task=None, **kwargs):
+    _started[task_id] = time.perf_counter()
+    try:
+        wait = _queue_wait(task.request)
+        if wait is not None:
+            queue = (task.request.delivery_info or {}).get("routing_key") or "unknown"
+            CELERY_TASK_QUEUE_WAIT.labels(task_name=task.name, queue=queue).observe(wait)
+    except Exception as e:
+        logger.debug(f"Could not record queue wait for {task.name}: {e}")
+
+
+@task_postrun.connect
+def _on_task_postrun(task_id=None, task=None, state=None, **kwargs):
+    started = _started.pop(task_id, None)
+    outcome = (state or "unknown").lower()
+    if started is not None:
+        CELERY_TASK_RUNTIME.labels(task_name=task.name, outcome=outcome).observe(time.perf_counter() - started)
+    # Failures and retries are counted by their own signals
+    if outcome not in ("failure", "retry"):
+        track_celery_task(task.name, outcome)
+
+
+@task_failure.connect
+def _on_task_failure(sender=None, **kwargs):
+    track_celery_task(sender.name, "failure")
+
+
+@task_retry.connect
+def _on_task_retry(sender=None, **kwargs):
+    track_celery_task(sender.name, "retry")
+
+
+def _worker_multiproc_dir(node_name: str) -> str:
+    """
+    This worker's own multiprocess directory. Pool children are forked after worker_init and
+    open their value files under PROMETHEUS_MULTIPROC_DIR as it is then, so pointing the
+    environment here moves them all.
+    """
+    path = os.path.join(PROMETHEUS_MULTIPROC_DIR, re.sub(r"[^\w.@-]", "_", node_name))
+    os.makedirs(path, exist_ok=True)
+    # Files left by this worker's previous run would be added to this one's totals
+    for stale in glob.glob(os.path.join(path, "*.db")):
+        os.remove(stale)
+    # The values this process made on import live in the shared directory; it records nothing
+    # there, so drop them instead of leaving a set behind per restart
+    for own in glob.glob(os.path.join(PROMETHEUS_MULTIPROC_DIR, f"*_{os.getpid()}.db")):
+        os.remove(own)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+    return path
+
+
+def _serve(serve_registry: CollectorRegistry) -> Optional[int]:
+    """Bind the first free port from CELERY_METRICS_PORT; other workers on the host may hold earlier ones."""
+    for port in range(CELERY_METRICS_PORT, CELERY_METRICS_PORT + max(1, CELERY_METRICS_PORT_RANGE)):
+        try:
+            start_http_server(port, registry=serve_registry)
+            return port
+        except OSError:
+            continue
+    return None
+
+
+@worker_init.connect
+def _start_metrics_server(sender=None, **kwargs):
+    if not CELERY_METRICS_PORT:
+        return
+    node_name = getattr(sender, "hostname", None) or f"pid{os.getpid()}"
+    prefork = "prefork" in str(getattr(sender, "pool_cls", ""))
+    if PROMETHEUS_MULTIPROC_DIR and prefork:
+        path = _worker_multiproc_dir(node_name)
+        serve_registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(serve_registry, path=path)
+    else:
+        if prefork:
+            logger.warning("PROMETHEUS_MULTIPROC_DIR is not set; task metrics from pool processes will not be exported")
+        # Tasks run in this process: its own registry has every sample
+        serve_registry = registry
+    port = _serve(serve_registry)
+    if port is None:
+        logger.error(f"Could not serve worker metrics for {node_name}: ports {CELERY_METRICS_PORT}-"
+                     f"{CELERY_METRICS_PORT + max(1, CELERY_METRICS_PORT_RANGE) - 1} are all in use")
+    else:
+        logger.info(f"Serving worker metrics for {node_name} on :{port}")
+
+
+@worker_process_shutdown.connect
+def _on_worker_process_shutdown(pid=None, **kwargs):
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid or os.getpid())
@@ -40,12 +40,110 @@ FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000")
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 GITHUB_REPO_OWNER = os.getenv("GITHUB_REPO_OWNER", "your-org")
 GITHUB_REPO_NAME = os.getenv("GITHUB_REPO_NAME", "conversacloud")
+# "mirror" keeps a bare mirror per host and adds a worktree per request; "clone" does a fresh clone;
+# "api" skips git entirely and builds the commit through the Git Data API
+GITHUB_PR_BACKEND = os.getenv("GITHUB_PR_BACKEND", "mirror").lower()
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+# Push/clone URL override (e.g. a local bare repo for offline runs); defaults to github.com, with
+# the token sent per git command rather than stored in the URL
+GITHUB_REMOTE_URL = os.getenv("GITHUB_REMOTE_URL")
+GITHUB_API_MAX_RETRIES = int(os.getenv("GITHUB_API_MAX_RETRIES", "5"))
+GITHUB_API_MAX_WAIT = float(os.getenv("GITHUB_API_MAX_WAIT", "120"))
+# Clone backend only: "full" clones everything, "sparse" fetches the tip commit without blobs
+# and checks out just the requests directories being written
+GITHUB_CLONE_MODE = os.getenv("GITHUB_CLONE_MODE", "sparse").lower()
+# Created with mode 0700; keep it off shared temp directories
+GITHUB_MIRROR_DIR = os.getenv("GITHUB_MIRROR_DIR", str(BASE_DIR / "var" / "git-mirror"))
+
+# PR creation scheduling: at most PR_MAX_CONCURRENCY_PER_REPO PRs in flight per repository,
+# prod first, backing off on GitHub rate limits
+PR_MAX_CONCURRENCY_PER_REPO = int(os.getenv("PR_MAX_CONCURRENCY_PER_REPO", "2"))
+PR_SLOT_LEASE_SECONDS = int(os.getenv("PR_SLOT_LEASE_SECONDS", "300"))
+PR_MAX_ATTEMPTS = int(os.getenv("PR_MAX_ATTEMPTS", "5"))
+PR_BACKOFF_MAX_SECONDS = float(os.getenv("PR_BACKOFF_MAX_SECONDS", "900"))
+
+# GitHub webhooks: HMAC secret configured on the repository webhook, and the workflow file whose runs deploy requests
+GITHUB_WEBHOOK_SECRET = os.getenv("GITHUB_WEBHOOK_SECRET")
+GITHUB_DEPLOY_WORKFLOW = os.getenv("GITHUB_DEPLOY_WORKFLOW", ".github/workflows/terraform-deploy.yml")
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", "100"))
+# A record whose own application fails this many times is moved to the dead-letter queue
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "5"))
+
+# Deployment events (worker -> API) applied per batch by the notify consumer. The stream keeps
+# about DEPLOYMENT_EVENTS_MAXLEN entries; entries left unacknowledged for DEPLOYMENT_EVENTS_CLAIM_IDLE_MS
+# (consumer died, or applying failed) are claimed again, up to DEPLOYMENT_EVENTS_MAX_DELIVERIES times
+NOTIFY_BATCH_SIZE = int(os.getenv("NOTIFY_BATCH_SIZE", "50"))
+DEPLOYMENT_EVENTS_MAXLEN = int(os.getenv("DEPLOYMENT_EVENTS_MAXLEN", "100000"))
+DEPLOYMENT_EVENTS_CLAIM_IDLE_MS = int(os.getenv("DEPLOYMENT_EVENTS_CLAIM_IDLE_MS", "60000"))
+DEPLOYMENT_EVENTS_MAX_DELIVERIES = int(os.getenv("DEPLOYMENT_EVENTS_MAX_DELIVERIES", "5"))
+
+# PR status reconciliation for requests stuck waiting on a PR
+PR_STATUS_POLL_INTERVAL = int(os.getenv("PR_STATUS_POLL_INTERVAL", "300"))
+PR_STATUS_CACHE_TTL = int(os.getenv("PR_STATUS_CACHE_TTL", "120"))
+PR_STATUS_GRAPHQL_MIN = int(os.getenv("PR_STATUS_GRAPHQL_MIN", "5"))
+
+# Idempotency for pipeline stages: how long a stage may hold its lease, how long its result answers duplicates
+IDEMPOTENCY_LEASE_SECONDS = int(os.getenv("IDEMPOTENCY_LEASE_SECONDS", "900"))
+IDEMPOTENCY_RESULT_TTL = int(os.getenv("IDEMPOTENCY_RESULT_TTL", "86400"))
+IDEMPOTENCY_REAP_INTERVAL = int(os.getenv("IDEMPOTENCY_REAP_INTERVAL", "60"))
+
+# Fair dispatch of new requests: prod before qa before dev, and within an environment departments
+# share dispatch by weight, e.g. DEPARTMENT_WEIGHTS="DevOps=3,Engineering=1" (unlisted departments weigh 1).
+# At most FAIR_DISPATCH_MAX_INFLIGHT requests wait in the Celery render queues at a time.
+DEPARTMENT_WEIGHTS = {
+    name.strip(): max(1, int(weight))
+    for name, _, weight in (item.partition("=") for item in os.getenv("DEPARTMENT_WEIGHTS", "").split(","))
+    if name.strip() and weight.strip().isdigit()
+}
+FAIR_DISPATCH_MAX_INFLIGHT = int(os.getenv("FAIR_DISPATCH_MAX_INFLIGHT", "8"))
+FAIR_DISPATCH_INTERVAL = float(os.getenv("FAIR_DISPATCH_INTERVAL", "0.5"))
+
+# Pipeline stage retries: transient failures (network, git, GitHub 5xx/rate limits, DB connectivity)
+# back off exponentially with jitter up to PIPELINE_RETRY_MAX_ATTEMPTS; errors of unknown kind get
+# PIPELINE_RETRY_UNKNOWN_ATTEMPTS; permanent ones are dead-lettered at once
+PIPELINE_RETRY_MAX_ATTEMPTS = int(os.getenv("PIPELINE_RETRY_MAX_ATTEMPTS", "5"))
+PIPELINE_RETRY_UNKNOWN_ATTEMPTS = int(os.getenv("PIPELINE_RETRY_UNKNOWN_ATTEMPTS", "3"))
+PIPELINE_RETRY_BASE_SECONDS = float(os.getenv("PIPELINE_RETRY_BASE_SECONDS", "10"))
+PIPELINE_RETRY_MAX_SECONDS = float(os.getenv("PIPELINE_RETRY_MAX_SECONDS", "600"))
+DEAD_LETTER_RETENTION_DAYS = int(os.getenv("DEAD_LETTER_RETENTION_DAYS", "30"))
+
+# Worker warm start: on boot each Celery worker process builds its managers, opens a DB
+# connection and fetches the git mirror, so its first task runs as fast as later ones
+WORKER_WARM_START = os.getenv("WORKER_WARM_START", "true").lower() == "true"
+
+# Celery worker metrics: each worker serves /metrics on the first free port from CELERY_METRICS_PORT
+# (0 disables) within CELERY_METRICS_PORT_RANGE, so several workers can share a host.
+# With the prefork pool set PROMETHEUS_MULTIPROC_DIR (worker only) so every child process is included;
+# each worker keeps its files in a subdirectory named after its node name.
+CELERY_METRICS_PORT = int(os.getenv("CELERY_METRICS_PORT", "9808"))
+CELERY_METRICS_PORT_RANGE = int(os.getenv("CELERY_METRICS_PORT_RANGE", "16"))
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
 
 # API
 API_URL = os.getenv("API_URL", "http://localhost:8000")
 
 # Celery
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/1")
+# Task results and pipeline progress states; kept for CELERY_RESULT_EXPIRES seconds
+CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/2")
+CELERY_RESULT_EXPIRES = int(os.getenv("CELERY_RESULT_EXPIRES", "86400"))
+
+# Terraform state storage
+STATE_COMPRESSION = os.getenv("STATE_COMPRESSION", "zstd").lower()
+STATE_COMPRESSION_LEVEL = int(os.getenv("STATE_COMPRESSION_LEVEL", "6"))
+STATE_CHUNK_SIZE = int(os.getenv("STATE_CHUNK_SIZE", str(1024 * 1024)))
+STATE_SNAPSHOT_INTERVAL = int(os.getenv("STATE_SNAPSHOT_INTERVAL", "10"))
+STATE_UPLOAD_MAX_BYTES = int(os.getenv("STATE_UPLOAD_MAX_BYTES", str(100 * 1024 * 1024)))
+# Streamed states up to this size are parsed in memory so history can store a delta
+STATE_DELTA_MAX_BYTES = int(os.getenv("STATE_DELTA_MAX_BYTES", str(16 * 1024 * 1024)))
+PLAN_SUMMARY_MAX_RESOURCES = int(os.getenv("PLAN_SUMMARY_MAX_RESOURCES", "200"))
+
+# PR coalescing: requests for the same environment arriving within the window share one PR.
+# PR_COALESCE_WINDOW_SECONDS sets the default; PR_COALESCE_WINDOW_<ENV> overrides it. 0 disables.
+PR_COALESCE_WINDOWS = {
+    env: int(os.getenv(f"PR_COALESCE_WINDOW_{env.upper()}", os.getenv("PR_COALESCE_WINDOW_SECONDS", "0")))
+    for env in ("dev", "qa", "prod")
+}
 
 # LLM intent parsing toggle
 LLM_INTENT_ENABLED = os.getenv("LLM_INTENT_ENABLED", "true").lower() == "true"
@@ -1,5 +1,5 @@
 import logging
-from typing import Optional
+from typing import Dict, Iterable, Optional
 from .database import AsyncSessionLocal
 from .models import InfrastructureRequest, User
 from sqlalchemy.future import select
@@ -18,3 +18,12 @@ async def get_user_email_by_request(request_identifier: str) -> Optional[str]:
             return None
         infra, user = row
         return user.email
+
+async def get_user_emails_by_requests(request_identifiers: Iterable[str]) -> Dict[str, str]:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(InfrastructureRequest.request_identifier, User.email)
+            .join(User, User.id == InfrastructureRequest.user_id)
+            .where(InfrastructureRequest.request_identifier.in_(list(request_identifiers)))
+        )
+        return {request_identifier: email for request_identifier, email in result.all()}
@@ -0,0 +1,219 @@
+# backend/app/dead_letters.py
+"""
+Retry policy and dead-letter queue for the request pipeline.
+
+Failures are classified as transient (network, git transport, GitHub 5xx and rate limits,
+DB connectivity), permanent (bad input, missing data, GitHub 4xx) or unknown. Each class
+has its own attempt budget and backs off exponentially with jitter. A task that runs out
+of attempts is stored here with its arguments so it can be inspected and replayed.
+
+    dlq:entries   hash entry id -> JSON entry
+    dlq:index     zset entry id -> failed_at, newest last
+"""
+import asyncio
+import json
+import logging
+import random
+import time
+import traceback
+import uuid
+from typing import Any, Dict, List, Optional
+
+import httpx
+import redis
+from sqlalchemy.exc import DBAPIError, IntegrityError, InterfaceError, OperationalError
+
+from .config import (
+    REDIS_URL,
+    PIPELINE_RETRY_MAX_ATTEMPTS,
+    PIPELINE_RETRY_UNKNOWN_ATTEMPTS,
+    PIPELINE_RETRY_BASE_SECONDS,
+    PIPELINE_RETRY_MAX_SECONDS,
+    DEAD_LETTER_RETENTION_DAYS,
+)
+from .github_api import GitHubAPIError, GitHubRateLimitError
+from .metrics import PIPELINE_FAILURES, DEAD_LETTER_DEPTH
+from .pr_scheduler import RetryablePRError, classify_error
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+ENTRIES_KEY = "dlq:entries"
+INDEX_KEY = "dlq:index"
+
+TRANSIENT = "transient"
+PERMANENT = "permanent"
+UNKNOWN = "unknown"
+
+_redis_client = redis.from_url(REDIS_URL) if REDIS_URL else None
+
+
+class TransientError(Exception):
+    """Raise to have a stage retried with backoff."""
+
+
+class PermanentError(Exception):
+    """Raise to dead-letter a stage without retrying."""
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts: int, base_delay: float = PIPELINE_RETRY_BASE_SECONDS,
+                 max_delay: float = PIPELINE_RETRY_MAX_SECONDS):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int) -> float:
+        """Backoff before retry number `attempt` (0-based): capped exponential, jittered over its upper half."""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+
+RETRY_POLICIES = {
+    TRANSIENT: RetryPolicy(PIPELINE_RETRY_MAX_ATTEMPTS),
+    UNKNOWN: RetryPolicy(PIPELINE_RETRY_UNKNOWN_ATTEMPTS),
+    PERMANENT: RetryPolicy(1),
+}
+
+_TRANSIENT_TYPES = (
+    TransientError,
+    RetryablePRError,
+    ConnectionError,
+    TimeoutError,
+    asyncio.TimeoutError,
+    httpx.TransportError,
+    redis.exceptions.ConnectionError,
+    redis.exceptions.TimeoutError,
+    OperationalError,
+    InterfaceError,
+)
+_PERMANENT_TYPES = (PermanentError, IntegrityError, PermissionError, ValueError, LookupError, TypeError)
+
+
+def classify_failure(exc: BaseException) -> str:
+    if isinstance(exc, TransientError):
+        return TRANSIENT
+    if isinstance(exc, PermanentError):
+        return PERMANENT
+    if isinstance(exc, GitHubAPIError):
+        # Same rules PR scheduling uses: rate limits and 5xx are worth waiting for, other 4xx are not
+        return TRANSIENT if classify_error(exc, 0) is not None else PERMANENT
+    if isinstance(exc, DBAPIError) and exc.connection_invalidated:
+        return TRANSIENT
+    if isinstance(exc, _TRANSIENT_TYPES):
+        return TRANSIENT
+    if isinstance(exc, _PERMANENT_TYPES):
+        return PERMANENT
+    if isinstance(exc, Exception) and classify_error(exc, 0) is not None:
+        # git push/clone/fetch failures and rate limits reported by the gh CLI
+        return TRANSIENT
+    return UNKNOWN
+
+
+def _entry_key_fields(entry: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: entry.get(k) for k in ("id", "task", "stage", "request_identifier", "error_class", "error", "attempts", "failed_at")}
+
+
+class DeadLetterQueue:
+    def __init__(self, client: Optional[redis.Redis] = None):
+        self.redis = client if client is not None else _redis_client
+
+    def add(self, task: str, args: List[Any], kwargs: Dict[str, Any], exc: BaseException, error_class: str,
+            attempts: int, stage: Optional[str] = None, request_identifier: Optional[str] = None,
+            queue: Optional[str] = None) -> Optional[str]:
+        entry = {
+            "id": uuid.uuid4().hex,
+            "task": task,
+            "args": args,
+            "kwargs": kwargs,
+            "queue": queue,
+            "stage": stage,
+            "request_identifier": request_identifier,
+            "error_class": error_class,
+            "error": f"{type(exc).__name__}: {exc}",
+            "traceback": "".join(traceback.format_exception(type(exc), exc, exc.__traceback__))[-4000:],
+            "attempts": attempts,
+            "failed_at": time.time(),
+        }
+        if self.redis is None:
+            logger.error("Dead letter (no Redis to keep it): %s", json.dumps(_entry_key_fields(entry), default=str))
+            return None
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.hset(ENTRIES_KEY, entry["id"], json.dumps(entry, default=str))
+        pipe.zadd(INDEX_KEY, {entry["id"]: entry["failed_at"]})
+        pipe.execute()
+        logger.error("Dead-lettered %s for %s after %d attempt(s): %s", task, request_identifier, attempts, entry["error"])
+        return entry["id"]
+
+    def get(self, entry_id: str) -> Optional[Dict[str, Any]]:
+        raw = self.redis.hget(ENTRIES_KEY, entry_id)
+        return json.loads(raw) if raw else None
+
+    def list(self, offset: int = 0, limit: int = 50) -> Dict[str, Any]:
+        ids = self.redis.zrevrange(INDEX_KEY, offset, offset + limit - 1)
+        raws = self.redis.hmget(ENTRIES_KEY, ids) if ids else []
+        entries = [_entry_key_fields(json.loads(raw)) for raw in raws if raw]
+        return {"total": self.redis.zcard(INDEX_KEY), "offset": offset, "entries": entries}
+
+    def delete(self, entry_id: str) -> bool:
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.hdel(ENTRIES_KEY, entry_id)
+        pipe.zrem(INDEX_KEY, entry_id)
+        removed, _ = pipe.execute()
+        return bool(removed)
+
+    def purge_older_than(self, days: int = DEAD_LETTER_RETENTION_DAYS) -> int:
+        cutoff = time.time() - days * 86400
+        ids = self.redis.zrangebyscore(INDEX_KEY, "-inf", cutoff)
+        if ids:
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.hdel(ENTRIES_KEY, *ids)
+            pipe.zrem(INDEX_KEY, *ids)
+            pipe.execute()
+        return len(ids)
+
+    def depth(self) -> int:
+        return self.redis.zcard(INDEX_KEY)
+
+
+def retry_or_dead_letter(task, exc: BaseException, stage: str, request_identifier: Optional[str] = None,
+                         args: Optional[List[Any]] = None) -> Optional[str]:
+    """
+    Called from a bound Celery task's exception handler. Raises the task's Retry with a
+    backoff chosen by the error class while attempts remain; otherwise dead-letters the
+    task and returns the entry id. `args` replaces the task's arguments for the retry and
+    the dead letter.
+    """
+    args = list(task.request.args or []) if args is None else list(args)
+    error_class = classify_failure(exc)
+    policy = RETRY_POLICIES[error_class]
+    attempt = task.request.retries
+    if attempt + 1 < policy.max_attempts:
+        countdown = policy.delay(attempt)
+        if isinstance(exc, GitHubRateLimitError) or "rate limit" in str(exc).lower():
+            # At least as long as GitHub asked; the PR scheduler holds the repository meanwhile
+            countdown = max(countdown, classify_error(exc, attempt) or 0)
+        PIPELINE_FAILURES.labels(stage=stage, error_class=error_class, action="retry").inc()
+        logger.warning("%s for %s failed (%s, attempt %d/%d); retrying in %.1fs: %s",
+                       stage, request_identifier, error_class, attempt + 1, policy.max_attempts, countdown, exc)
+        raise task.retry(args=args, exc=exc, countdown=countdown)
+
+    PIPELINE_FAILURES.labels(stage=stage, error_class=error_class, action="dead_letter").inc()
+    delivery_info = task.request.delivery_info or {}
+    return DeadLetterQueue().add(
+        task.name,
+        args,
+        dict(task.request.kwargs or {}),
+        exc,
+        error_class,
+        attempt + 1,
+        stage=stage,
+        request_identifier=request_identifier,
+        queue=delivery_info.get("routing_key"),
+    )
+
+
+def refresh_dead_letter_metrics():
+    if _redis_client is None:
+        return
+    DEAD_LETTER_DEPTH.set(DeadLetterQueue().depth())
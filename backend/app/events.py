@@ -0,0 +1,141 @@
+# backend/app/events.py
+"""
+Typed deployment events. Celery workers append them to a Redis Stream and the API
+consumes it through a consumer group (notify_handler), so a worker never calls back into
+the API over HTTP and events written while the API restarts are delivered once it is back.
+
+The consumer group hands each event to one API process, but a user's websocket may be
+held by any of them; once applied, the event is published on a pub/sub channel every API
+process listens to, and each pushes it to the websockets it holds. Progress events are
+only of use while the request runs, so workers publish them there directly; plan
+summaries and webhook status changes are already stored by whoever receives them, which
+publishes them too.
+
+    deployment_events         stream; field "event" holds the JSON event, trimmed to ~DEPLOYMENT_EVENTS_MAXLEN
+    deployment_events:live    pub/sub channel; the JSON event, for the websocket push
+"""
+import json
+import logging
+import time
+from enum import Enum
+from typing import Any, Dict, Optional
+
+import redis
+from pydantic import BaseModel, Field, ValidationError
+
+from .config import DEPLOYMENT_EVENTS_MAXLEN
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+STREAM_KEY = "deployment_events"
+LIVE_CHANNEL = "deployment_events:live"
+CONSUMER_GROUP = "notify"
+
+
+class EventType(str, Enum):
+    PR_CREATED = "pr_created"
+    REQUEST_FAILED = "request_failed"
+    DEPLOYED = "deployed"
+    DEPLOYMENT_FAILED = "deployment_failed"
+    PROGRESS = "progress"
+    PLAN_SUMMARY = "plan_summary"
+    STATUS_CHANGED = "status_changed"
+
+
+class DeploymentEvent(BaseModel):
+    type: EventType
+    request_identifier: str
+    user_email: Optional[str] = None
+    pr_number: Optional[int] = None
+    error: Optional[str] = None
+    details: Dict[str, Any] = Field(default_factory=dict)
+    occurred_at: float = Field(default_factory=time.time)
+    version: int = 1
+
+    def payload(self) -> Dict[str, Any]:
+        """Flat dict in the shape the notify helpers (and the notify-deployment endpoint) use."""
+        data = {**self.details, "request_identifier": self.request_identifier, "user_email": self.user_email}
+        if self.pr_number is not None:
+            data["pr_number"] = self.pr_number
+        if self.error:
+            data.setdefault("error_message", self.error)
+        return data
+
+
+# Pipeline outcome / notify-deployment status -> event type
+_STATUS_TYPES = {
+    "pr_created": EventType.PR_CREATED,
+    "pr_failed": EventType.REQUEST_FAILED,
+    "deployed": EventType.DEPLOYED,
+    "success": EventType.DEPLOYED,
+    "failed": EventType.DEPLOYMENT_FAILED,
+    "failure": EventType.DEPLOYMENT_FAILED,
+}
+
+
+def pipeline_event(request_identifier: str, user_email: Optional[str], status: Optional[str],
+                   pr_number: Optional[int], error: Optional[str] = None) -> DeploymentEvent:
+    """Event for the end of the request pipeline: a PR was opened or it could not be."""
+    created = status == "pr_created" and pr_number
+    return DeploymentEvent(
+        type=EventType.PR_CREATED if created else EventType.REQUEST_FAILED,
+        request_identifier=request_identifier,
+        user_email=user_email,
+        pr_number=pr_number,
+        error=None if created else (error or status or "failed"),
+    )
+
+
+def event_from_payload(data: Dict[str, Any]) -> Optional[DeploymentEvent]:
+    """Build an event from an untyped payload: the notify-deployment body or a pre-typed Redis message."""
+    request_identifier = data.get("request_identifier") or data.get("request_id")
+    event_type = _STATUS_TYPES.get(str(data.get("status") or "").lower())
+    if not request_identifier or event_type is None:
+        return None
+    known = {"request_identifier", "request_id", "user_email", "status", "pr_number"}
+    return DeploymentEvent(
+        type=event_type,
+        request_identifier=request_identifier,
+        user_email=data.get("user_email"),
+        pr_number=data.get("pr_number"),
+        error=data.get("error_message") or data.get("error"),
+        details={k: v for k, v in data.items() if k not in known},
+    )
+
+
+def parse_event(raw) -> Optional[DeploymentEvent]:
+    if isinstance(raw, bytes):
+        raw = raw.decode("utf-8")
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        logger.warning("Dropping malformed deployment event: %r", raw[:200])
+        return None
+    if not isinstance(data, dict):
+        return None
+    if "type" in data:
+        try:
+            return DeploymentEvent.model_validate(data)
+        except ValidationError as e:
+            logger.warning("Dropping invalid deployment event: %s", e)
+            return None
+    return event_from_payload(data)
+
+
+def entry_event(fields: Dict) -> Optional[DeploymentEvent]:
+    """The event carried by a stream entry's fields."""
+    raw = fields.get(b"event") or fields.get("event")
+    return parse_event(raw) if raw else None
+
+
+def publish_event(client: redis.Redis, event: DeploymentEvent) -> str:
+    """Append the event to the stream; returns its entry id."""
+    entry_id = client.xadd(STREAM_KEY, {"event": event.model_dump_json()},
+                           maxlen=DEPLOYMENT_EVENTS_MAXLEN, approximate=True)
+    return entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+
+
+def publish_live(client: redis.Redis, event: DeploymentEvent) -> int:
+    """Publish the event to the API processes' websocket push; nothing is kept. Returns the listener count."""
+    return client.publish(LIVE_CHANNEL, event.model_dump_json())
@@ -0,0 +1,243 @@
+# backend/app/fair_scheduler.py
+"""
+Fair dispatch of new requests into the Celery pipeline.
+
+Requests wait in one Redis list per (environment, department). A single dispatcher (one
+API instance at a time, elected with a Redis lock) releases them into Celery: environments
+strictly by priority (prod, qa, dev), and departments within an environment by deficit
+round robin weighted with DEPARTMENT_WEIGHTS. Only as many requests as the render queues
+have room for are released, so ordering is decided here rather than by broker FIFO.
+
+    fair:{env}:{dept}     list of queued requests (JSON)
+    fair:{env}:active     set of departments with queued requests
+    fair:{env}:deficit    hash department -> unspent DRR credit
+    fair:{env}:cursor     index of the department the next round starts at
+    fair:inflight         requests taken off their queue whose send() has not returned yet
+
+A request is moved (LMOVE) into fair:inflight before it is sent and dropped from there once
+the broker accepted it, so a dispatcher that dies mid-send leaves it behind rather than
+losing it; the next elected dispatcher puts such requests back at the head of their queues.
+"""
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+import redis
+
+from .config import REDIS_URL, DEPARTMENT_WEIGHTS, FAIR_DISPATCH_INTERVAL
+from .metrics import FAIR_QUEUE_DEPTH, FAIR_QUEUE_WAIT
+from .pr_scheduler import ENVIRONMENT_PRIORITY
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+ENVIRONMENTS = sorted(ENVIRONMENT_PRIORITY, key=ENVIRONMENT_PRIORITY.get)
+DEFAULT_ENVIRONMENT = "dev"
+DEFAULT_DEPARTMENT = "unknown"
+
+LOCK_KEY = "fair:dispatcher"
+INFLIGHT_KEY = "fair:inflight"
+_LOCK_SECONDS = 10
+_RENEW_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) and 1 or 0
+"""
+
+# KEYS: in-flight list, department queue, environment's active set; ARGV: raw item, department
+_REQUEUE_SCRIPT = """
+if redis.call('LREM', KEYS[1], 1, ARGV[1]) == 0 then
+    return 0
+end
+redis.call('LPUSH', KEYS[2], ARGV[1])
+redis.call('SADD', KEYS[3], ARGV[2])
+return 1
+"""
+
+_redis_client = redis.from_url(REDIS_URL) if REDIS_URL else None
+
+
+def normalize_environment(environment: Optional[str]) -> str:
+    environment = (environment or "").lower()
+    return environment if environment in ENVIRONMENT_PRIORITY else DEFAULT_ENVIRONMENT
+
+
+def _weight(department: str) -> int:
+    return DEPARTMENT_WEIGHTS.get(department, 1)
+
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class FairScheduler:
+    def __init__(self, client: Optional[redis.Redis] = None):
+        self.redis = client if client is not None else _redis_client
+
+    def enqueue(self, item: Dict[str, Any], environment: Optional[str], department: Optional[str]):
+        environment = normalize_environment(environment)
+        department = department or DEFAULT_DEPARTMENT
+        payload = json.dumps({**item, "environment": environment, "department": department, "enqueued_at": time.time()})
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.rpush(f"fair:{environment}:{department}", payload)
+        pipe.sadd(f"fair:{environment}:active", department)
+        pipe.execute()
+
+    def dispatch(self, send: Callable[[Dict[str, Any]], None], budget: int) -> int:
+        """Release up to `budget` requests through `send`, highest-priority environment first."""
+        sent = 0
+        for environment in ENVIRONMENTS:
+            if sent >= budget:
+                break
+            sent += self._dispatch_environment(environment, send, budget - sent)
+        return sent
+
+    def _dispatch_environment(self, environment: str, send: Callable[[Dict[str, Any]], None], budget: int) -> int:
+        departments = sorted(_text(d) for d in self.redis.smembers(f"fair:{environment}:active"))
+        if not departments or budget <= 0:
+            return 0
+
+        deficit_key = f"fair:{environment}:deficit"
+        cursor_key = f"fair:{environment}:cursor"
+        deficits = {_text(k): int(v) for k, v in self.redis.hgetall(deficit_key).items()}
+        cursor = int(self.redis.get(cursor_key) or 0) % len(departments)
+        sent = 0
+
+        while sent < budget and departments:
+            department = departments[cursor]
+            queue_key = f"fair:{environment}:{department}"
+            # Leftover credit means the previous call ran out of budget mid-turn: resume that turn
+            credit = deficits.get(department, 0) or _weight(department)
+            emptied = False
+            while credit > 0 and sent < budget:
+                raw = self.redis.lmove(queue_key, INFLIGHT_KEY, "LEFT", "LEFT")
+                if raw is None:
+                    emptied = True
+                    break
+                item = json.loads(raw)
+                try:
+                    send(item)
+                except Exception:
+                    self._requeue(raw, environment, department)
+                    self._save(deficit_key, cursor_key, deficits, cursor)
+                    raise
+                self.redis.lrem(INFLIGHT_KEY, 1, raw)
+                FAIR_QUEUE_WAIT.labels(environment=environment, department=department).observe(
+                    max(0.0, time.time() - item.get("enqueued_at", time.time()))
+                )
+                credit -= 1
+                sent += 1
+            if not emptied and self.redis.llen(queue_key) == 0:
+                emptied = True
+
+            if emptied:
+                # An idle department does not bank credit
+                deficits.pop(department, None)
+                self.redis.srem(f"fair:{environment}:active", department)
+                # Re-check: a request may have arrived between the pop and the srem
+                if self.redis.llen(queue_key):
+                    self.redis.sadd(f"fair:{environment}:active", department)
+                else:
+                    departments.pop(cursor)
+                    cursor = cursor % len(departments) if departments else 0
+                    continue
+            elif credit > 0:
+                deficits[department] = credit
+                break
+            else:
+                deficits.pop(department, None)
+            cursor = (cursor + 1) % len(departments)
+
+        self._save(deficit_key, cursor_key, deficits, cursor)
+        return sent
+
+    def _requeue(self, raw, environment: str, department: str) -> bool:
+        """Move `raw` from the in-flight list back to the head of its queue, if it is still in flight."""
+        return bool(self.redis.eval(
+            _REQUEUE_SCRIPT, 3, INFLIGHT_KEY, f"fair:{environment}:{department}", f"fair:{environment}:active",
+            raw, department,
+        ))
+
+    def requeue_inflight(self) -> int:
+        """
+        Put requests a previous dispatcher took but never finished sending back at the head of
+        their queues, oldest first. Only call this while holding the dispatcher lock.
+        """
+        requeued = 0
+        # Newest first: each goes to the head of its queue, so the oldest ends up in front
+        for raw in self.redis.lrange(INFLIGHT_KEY, 0, -1):
+            item = json.loads(raw)
+            if self._requeue(raw, item.get("environment", DEFAULT_ENVIRONMENT), item.get("department", DEFAULT_DEPARTMENT)):
+                requeued += 1
+        return requeued
+
+    def _save(self, deficit_key: str, cursor_key: str, deficits: Dict[str, int], cursor: int):
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.delete(deficit_key)
+        if deficits:
+            pipe.hset(deficit_key, mapping=deficits)
+        pipe.set(cursor_key, cursor)
+        pipe.execute()
+
+    def depths(self) -> Dict[str, Dict[str, int]]:
+        result: Dict[str, Dict[str, int]] = {}
+        for environment in ENVIRONMENTS:
+            departments = [_text(d) for d in self.redis.smembers(f"fair:{environment}:active")]
+            pipe = self.redis.pipeline()
+            for department in departments:
+                pipe.llen(f"fair:{environment}:{department}")
+            result[environment] = dict(zip(departments, pipe.execute()))
+        return result
+
+
+_known_labels: set = set()
+
+
+def refresh_fair_queue_metrics():
+    if _redis_client is None:
+        return
+    seen = set()
+    for environment, departments in FairScheduler().depths().items():
+        for department, depth in departments.items():
+            FAIR_QUEUE_DEPTH.labels(environment=environment, department=department).set(depth)
+            seen.add((environment, department))
+    # Departments that drained drop out of the active set; report them as empty, not stale
+    for environment, department in _known_labels - seen:
+        FAIR_QUEUE_DEPTH.labels(environment=environment, department=department).set(0)
+    _known_labels.update(seen)
+
+
+async def run_dispatcher(dispatch_once: Callable[[], int], interval: float = FAIR_DISPATCH_INTERVAL):
+    """Hold the dispatcher lock while this instance is the elected dispatcher and call dispatch_once()."""
+    if _redis_client is None:
+        logger.info("No Redis configured; fair dispatcher not started")
+        return
+    token = uuid.uuid4().hex
+    leader = False
+    while True:
+        try:
+            is_leader = bool(await asyncio.to_thread(
+                _redis_client.eval, _RENEW_LOCK_SCRIPT, 1, LOCK_KEY, token, _LOCK_SECONDS * 1000
+            ))
+            if is_leader != leader:
+                leader = is_leader
+                logger.info("Fair dispatcher %s", "elected" if leader else "standing by")
+                if leader:
+                    requeued = await asyncio.to_thread(FairScheduler().requeue_inflight)
+                    if requeued:
+                        logger.warning("Requeued %d requests a previous dispatcher left in flight", requeued)
+            if leader:
+                await asyncio.to_thread(dispatch_once)
+            await asyncio.sleep(interval)
+        except asyncio.CancelledError:
+            if leader and _text(_redis_client.get(LOCK_KEY)) == token:
+                # Let a standby instance take over without waiting out the lock
+                _redis_client.delete(LOCK_KEY)
+            raise
+        except Exception as e:
+            logger.exception("Fair dispatcher error: %s", e)
+            await asyncio.sleep(max(interval, 1))
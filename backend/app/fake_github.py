@@ -0,0 +1,316 @@
+# backend/app/fake_github.py
+"""
+Offline stand-in for GitHub: a local bare repository as `origin`, a small HTTP server
+implementing the REST endpoints GitHubManager uses (pulls plus the Git Data API, backed
+by git plumbing on the bare repo), and a `gh` shim that forwards `gh pr create` to it.
+
+    with OfflineGitHub(latency_ms=20) as fake:
+        gm = fake.manager(backend="mirror")
+        await gm.create_pull_request(rid, details)
+"""
+import base64
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+logger = logging.getLogger(__name__)
+
+OWNER = "aiops-offline"
+REPO = "infra"
+_ID_RE = re.compile(r"/(?:[0-9a-f]{40}|\d+)$")
+
+_GH_SHIM = """#!{python}
+import json, os, sys, urllib.request
+
+args = sys.argv[1:]
+if args[:2] != ["pr", "create"]:
+    sys.exit("fake gh: only 'pr create' is supported")
+opts = dict(zip([a.lstrip("-") for a in args[2::2]], args[3::2]))
+req = urllib.request.Request(
+    f"{{os.environ['FAKE_GITHUB_URL']}}/repos/{{opts['repo']}}/pulls",
+    data=json.dumps({{"title": opts.get("title"), "body": opts.get("body"), "head": opts["head"], "base": opts.get("base", "main")}}).encode(),
+    headers={{"Content-Type": "application/json"}},
+    method="POST",
+)
+try:
+    with urllib.request.urlopen(req) as resp:
+        print(json.load(resp)["html_url"])
+except urllib.error.HTTPError as e:
+    sys.exit(f"fake gh: {{e.code}} {{e.read().decode()}}")
+"""
+
+
+def _git(repo: str, *args: str, input: Optional[bytes] = None, env: Optional[Dict[str, str]] = None) -> str:
+    result = subprocess.run(
+        ["git", *args], cwd=repo, input=input, capture_output=True,
+        env={**os.environ, **(env or {})}, check=True,
+    )
+    return result.stdout.decode().strip()
+
+
+def create_bare_origin(path: str, seed_dirs: List[str]) -> str:
+    """Bare repo with one commit on main containing a .gitkeep in each seed directory."""
+    subprocess.run(["git", "init", "-q", "--bare", "-b", "main", path], check=True)
+    _git(path, "config", "uploadpack.allowFilter", "true")
+    work = tempfile.mkdtemp(prefix="aiops-seed-")
+    try:
+        subprocess.run(["git", "clone", "-q", path, work], check=True, capture_output=True)
+        for d in seed_dirs:
+            os.makedirs(os.path.join(work, d), exist_ok=True)
+            open(os.path.join(work, d, ".gitkeep"), "w").close()
+        with open(os.path.join(work, "README.md"), "w") as f:
+            f.write("offline infra repo\n")
+        identity = ["-c", "user.email=seed@offline", "-c", "user.name=seed"]
+        _git(work, "add", ".")
+        _git(work, *identity, "commit", "-qm", "seed")
+        _git(work, "push", "-q", "origin", "HEAD:main")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    return path
+
+
+class _State:
+    def __init__(self, origin: str, latency: float):
+        self.origin = origin
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.pulls: Dict[int, Dict[str, Any]] = {}
+        self.next_number = 1
+        self.calls: Dict[str, int] = {}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    state: _State
+
+    def log_message(self, fmt, *args):
+        logger.debug("fake github: " + fmt, *args)
+
+    def _send(self, status: int, payload: Any = None, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload).encode() if payload is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-RateLimit-Remaining", "5000")
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _route(self, method: str):
+        if self.state.latency:
+            time.sleep(self.state.latency)
+        match = re.match(r"^/repos/[^/]+/[^/]+/(.+)$", self.path.split("?")[0])
+        if not match:
+            return self._send(404, {"message": "Not Found"})
+        route = match.group(1)
+        key = method + " " + _ID_RE.sub("/:id", route)
+        with self.state.lock:
+            self.state.calls[key] = self.state.calls.get(key, 0) + 1
+        try:
+            handler = getattr(self, f"_{method.lower()}_{route.split('/')[0]}", None)
+            if handler is None:
+                return self._send(404, {"message": "Not Found"})
+            return handler(route)
+        except subprocess.CalledProcessError as e:
+            return self._send(422, {"message": e.stderr.decode().strip()})
+
+    def do_GET(self):
+        self._route("GET")
+
+    def do_POST(self):
+        self._route("POST")
+
+    def do_PATCH(self):
+        self._route("PATCH")
+
+    # --- pulls -----------------------------------------------------------
+    def _post_pulls(self, route: str):
+        data = self._json()
+        origin = self.state.origin
+        _git(origin, "rev-parse", "--verify", f"refs/heads/{data['head']}")
+        with self.state.lock:
+            if any(pr["state"] == "open" and pr["head"]["ref"] == data["head"] for pr in self.state.pulls.values()):
+                return self._send(422, {"message": f"A pull request already exists for {OWNER}:{data['head']}."})
+            number = self.state.next_number
+            self.state.next_number += 1
+            pr = {
+                "number": number,
+                "state": "open",
+                "merged": False,
+                "title": data.get("title"),
+                "body": data.get("body"),
+                "head": {"ref": data["head"]},
+                "base": {"ref": data.get("base", "main")},
+                "html_url": f"https://github.invalid/{OWNER}/{REPO}/pull/{number}",
+            }
+            self.state.pulls[number] = pr
+        self._send(201, pr)
+
+    def _get_pulls(self, route: str):
+        if route == "pulls":
+            query = parse_qs(urlparse(self.path).query)
+            head = query.get("head", [""])[0].split(":")[-1]
+            state = query.get("state", ["open"])[0]
+            with self.state.lock:
+                pulls = [pr for pr in self.state.pulls.values()
+                         if (not head or pr["head"]["ref"] == head) and state in ("all", pr["state"])]
+            return self._send(200, pulls)
+        number = int(route.split("/")[1])
+        pr = self.state.pulls.get(number)
+        if not pr:
+            return self._send(404, {"message": "Not Found"})
+        etag = '"%s"' % hashlib.sha1(json.dumps(pr, sort_keys=True).encode()).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            return self._send(304, None, {"ETag": etag})
+        self._send(200, pr, {"ETag": etag})
+
+    # --- Git Data API ----------------------------------------------------
+    def _get_git(self, route: str):
+        parts = route.split("/")
+        origin = self.state.origin
+        if parts[1] == "ref":
+            sha = _git(origin, "rev-parse", "--verify", "refs/" + "/".join(parts[2:]))
+            return self._send(200, {"object": {"sha": sha, "type": "commit"}})
+        if parts[1] == "commits":
+            tree = _git(origin, "rev-parse", f"{parts[2]}^{{tree}}")
+            return self._send(200, {"sha": parts[2], "tree": {"sha": tree}})
+        self._send(404, {"message": "Not Found"})
+
+    def _post_git(self, route: str):
+        kind = route.split("/")[1]
+        data = self._json()
+        origin = self.state.origin
+        if kind == "blobs":
+            content = base64.b64decode(data["content"]) if data.get("encoding") == "base64" else data["content"].encode()
+            return self._send(201, {"sha": _git(origin, "hash-object", "-w", "--stdin", input=content)})
+        if kind == "trees":
+            fd, index = tempfile.mkstemp(prefix="aiops-index-")
+            os.close(fd)
+            os.remove(index)
+            env = {"GIT_INDEX_FILE": index}
+            try:
+                if data.get("base_tree"):
+                    _git(origin, "read-tree", data["base_tree"], env=env)
+                for entry in data.get("tree", []):
+                    _git(origin, "update-index", "--add", "--cacheinfo", f"{entry['mode']},{entry['sha']},{entry['path']}", env=env)
+                return self._send(201, {"sha": _git(origin, "write-tree", env=env)})
+            finally:
+                if os.path.exists(index):
+                    os.remove(index)
+        if kind == "commits":
+            args = ["commit-tree", data["tree"], "-m", data["message"]]
+            for parent in data.get("parents", []):
+                args += ["-p", parent]
+            env = {"GIT_AUTHOR_NAME": "fake", "GIT_AUTHOR_EMAIL": "fake@offline",
+                   "GIT_COMMITTER_NAME": "fake", "GIT_COMMITTER_EMAIL": "fake@offline"}
+            return self._send(201, {"sha": _git(origin, *args, env=env)})
+        if kind == "refs":
+            # Empty old value: fails if the ref already exists, like GitHub's 422
+            _git(origin, "update-ref", data["ref"], data["sha"], "")
+            return self._send(201, {"ref": data["ref"], "object": {"sha": data["sha"]}})
+        self._send(404, {"message": "Not Found"})
+
+    def _patch_git(self, route: str):
+        parts = route.split("/")
+        if parts[1] != "refs":
+            return self._send(404, {"message": "Not Found"})
+        data = self._json()
+        ref = "refs/" + "/".join(parts[2:])
+        _git(self.state.origin, "rev-parse", "--verify", ref)
+        _git(self.state.origin, "update-ref", ref, data["sha"])
+        self._send(200, {"ref": ref, "object": {"sha": data["sha"]}})
+
+
+class OfflineGitHub:
+    """Bare origin + fake REST server + gh shim, torn down on exit."""
+
+    def __init__(self, latency_ms: float = 0.0, seed_dirs: Optional[List[str]] = None):
+        self.latency = latency_ms / 1000.0
+        self.seed_dirs = seed_dirs or [f"backend/terraform/environments/aws/{env}/requests" for env in ("dev", "qa", "prod")]
+        self.root: Optional[str] = None
+        self.origin: Optional[str] = None
+        self.url: Optional[str] = None
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._saved_env: Dict[str, Optional[str]] = {}
+
+    def __enter__(self) -> "OfflineGitHub":
+        self.root = tempfile.mkdtemp(prefix="aiops-offline-")
+        self.origin = create_bare_origin(os.path.join(self.root, "origin.git"), self.seed_dirs)
+
+        self.state = _State(self.origin, self.latency)
+        handler = type("Handler", (_Handler,), {"state": self.state})
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+        shim_dir = os.path.join(self.root, "bin")
+        os.makedirs(shim_dir)
+        shim = os.path.join(shim_dir, "gh")
+        with open(shim, "w") as f:
+            f.write(_GH_SHIM.format(python=sys.executable))
+        os.chmod(shim, 0o755)
+
+        self._set_env("PATH", f"{shim_dir}{os.pathsep}{os.environ.get('PATH', '')}")
+        self._set_env("FAKE_GITHUB_URL", self.url)
+        return self
+
+    def __exit__(self, *exc):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+        for key, value in self._saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        if self.root:
+            shutil.rmtree(self.root, ignore_errors=True)
+
+    def _set_env(self, key: str, value: str):
+        self._saved_env.setdefault(key, os.environ.get(key))
+        os.environ[key] = value
+
+    @property
+    def pulls(self) -> Dict[int, Dict[str, Any]]:
+        return self.state.pulls
+
+    @property
+    def api_calls(self) -> Dict[str, int]:
+        return dict(self.state.calls)
+
+    def manager(self, backend: str = "mirror", clone_mode: str = "sparse"):
+        """A GitHubManager wired to this stand-in, with its own mirror directory."""
+        from .github_api import GitHubAPIClient
+        from .github_manager import GitHubManager
+
+        gm = GitHubManager()
+        gm.github_token = "offline-token"
+        gm.repo_owner, gm.repo_name = OWNER, REPO
+        gm.pr_backend = backend
+        gm.clone_mode = clone_mode
+        gm.remote_url = f"file://{self.origin}"
+        gm.mirror_path = os.path.join(self.root, "mirror", f"{OWNER}-{REPO}.git")
+        gm.api = GitHubAPIClient(gm.github_token, OWNER, REPO, base_url=self.url, max_retries=0)
+        # No Redis offline: the scheduler admits everything immediately
+        gm.scheduler.redis = None
+        return gm
+
+    def branch_files(self, branch: str) -> List[str]:
+        out = _git(self.origin, "diff", "--name-only", "main", f"refs/heads/{branch}")
+        return [line for line in out.splitlines() if line]
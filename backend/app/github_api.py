@@ -0,0 +1,282 @@
+# backend/app/github_api.py
+import asyncio
+import base64
+import json
+import logging
+import random
+import time
+import weakref
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from .config import GITHUB_API_URL, GITHUB_API_MAX_RETRIES, GITHUB_API_MAX_WAIT
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# One pooled client per event loop; httpx connections cannot be shared across loops
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def get_http_client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0, connect=10.0),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+        _clients[loop] = client
+    return client
+
+
+async def close_http_client():
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+class GitHubAPIError(Exception):
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"GitHub API error {status_code}: {message}")
+        self.status_code = status_code
+
+
+class GitHubRateLimitError(GitHubAPIError):
+    def __init__(self, status_code: int, message: str, retry_after: float):
+        super().__init__(status_code, message)
+        self.retry_after = retry_after
+
+
+def _is_rate_limited(resp: httpx.Response) -> bool:
+    if resp.status_code == 429:
+        return True
+    if resp.status_code != 403:
+        return False
+    if resp.headers.get("x-ratelimit-remaining") == "0":
+        return True
+    return "rate limit" in resp.text.lower()
+
+
+def rate_limit_delay(resp: httpx.Response, attempt: int) -> float:
+    """Seconds to wait before retrying, honouring Retry-After, then X-RateLimit-Reset."""
+    retry_after = resp.headers.get("retry-after")
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    reset = resp.headers.get("x-ratelimit-reset")
+    if reset and reset.isdigit() and resp.headers.get("x-ratelimit-remaining") == "0":
+        return max(0.0, int(reset) - time.time()) + 1
+    # Secondary limits without headers: GitHub asks for at least a minute
+    return 60.0 * (2 ** attempt)
+
+
+# Retried on transport errors and 5xx by default; a POST may have been applied before the
+# response was lost, so it is only retried where the caller makes the repeat harmless
+_IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT", "PATCH"}
+
+
+def _already_exists(error: GitHubAPIError) -> bool:
+    return error.status_code == 422 and "already exists" in str(error).lower()
+
+
+def _backoff(attempt: int) -> float:
+    return min(30.0, 2 ** attempt) + random.uniform(0, 1)
+
+
+class GitHubAPIClient:
+    """Thin async wrapper over the REST endpoints used to open a PR without a local clone."""
+
+    def __init__(
+        self,
+        token: Optional[str],
+        owner: str,
+        repo: str,
+        base_url: str = GITHUB_API_URL,
+        max_retries: int = GITHUB_API_MAX_RETRIES,
+        http_client: Optional[httpx.AsyncClient] = None,
+    ):
+        self.token = token
+        self.owner = owner
+        self.repo = repo
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max_retries
+        self._http_client = http_client
+        self.rate_limit_remaining: Optional[int] = None
+        self.rate_limit_reset: Optional[int] = None
+
+    @property
+    def repo_path(self) -> str:
+        return f"/repos/{self.owner}/{self.repo}"
+
+    def _headers(self, extra: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        headers = {
+            "Accept": "application/vnd.github+json",
+            "X-GitHub-Api-Version": "2022-11-28",
+            "User-Agent": "aiops-platform",
+        }
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        if extra:
+            headers.update(extra)
+        return headers
+
+    def _record_rate_limit(self, resp: httpx.Response):
+        remaining = resp.headers.get("x-ratelimit-remaining")
+        reset = resp.headers.get("x-ratelimit-reset")
+        if remaining and remaining.isdigit():
+            self.rate_limit_remaining = int(remaining)
+        if reset and reset.isdigit():
+            self.rate_limit_reset = int(reset)
+
+    async def request(self, method: str, path: str, headers: Optional[Dict[str, str]] = None,
+                      retry: Optional[bool] = None, **kwargs) -> httpx.Response:
+        """
+        Send a request, waiting out rate limits. Transport errors and 5xx are retried only
+        for idempotent methods unless `retry` says otherwise.
+        """
+        client = self._http_client or get_http_client()
+        url = path if path.startswith(("http://", "https://")) else f"{self.base_url}{path}"
+        if retry is None:
+            retry = method.upper() in _IDEMPOTENT_METHODS
+        max_retries = self.max_retries if retry else 0
+        for attempt in range(self.max_retries + 1):
+            try:
+                resp = await client.request(method, url, headers=self._headers(headers), **kwargs)
+            except httpx.TransportError as e:
+                if attempt >= max_retries:
+                    raise
+                delay = _backoff(attempt)
+                logger.warning("GitHub %s %s failed (%s); retrying in %.1fs", method, path, e, delay)
+                await asyncio.sleep(delay)
+                continue
+
+            self._record_rate_limit(resp)
+
+            if _is_rate_limited(resp):
+                delay = rate_limit_delay(resp, attempt)
+                if attempt >= self.max_retries or delay > GITHUB_API_MAX_WAIT:
+                    raise GitHubRateLimitError(resp.status_code, resp.text[:200], delay)
+                logger.warning("GitHub rate limit on %s %s; waiting %.1fs", method, path, delay)
+                await asyncio.sleep(delay)
+                continue
+
+            if resp.status_code >= 500 and attempt < max_retries:
+                delay = _backoff(attempt)
+                logger.warning("GitHub %s %s returned %s; retrying in %.1fs", method, path, resp.status_code, delay)
+                await asyncio.sleep(delay)
+                continue
+
+            if resp.status_code >= 400:
+                raise GitHubAPIError(resp.status_code, resp.text[:500])
+            return resp
+
+        raise GitHubAPIError(0, f"Exhausted retries for {method} {path}")
+
+    @property
+    def graphql_url(self) -> str:
+        # GitHub Enterprise serves REST under /api/v3 and GraphQL under /api/graphql
+        if self.base_url.endswith("/api/v3"):
+            return self.base_url[: -len("/v3")] + "/graphql"
+        return f"{self.base_url}/graphql"
+
+    async def graphql(self, query: str, variables: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        # Queries only, so a repeat is harmless
+        resp = await self.request("POST", self.graphql_url, retry=True, json={"query": query, "variables": variables or {}})
+        payload = resp.json()
+        if payload.get("errors") and not payload.get("data"):
+            raise GitHubAPIError(resp.status_code, json.dumps(payload["errors"])[:500])
+        return payload.get("data") or {}
+
+    async def get_branch_sha(self, branch: str) -> str:
+        resp = await self.request("GET", f"{self.repo_path}/git/ref/heads/{branch}")
+        return resp.json()["object"]["sha"]
+
+    async def get_commit_tree(self, commit_sha: str) -> str:
+        resp = await self.request("GET", f"{self.repo_path}/git/commits/{commit_sha}")
+        return resp.json()["tree"]["sha"]
+
+    async def create_blob(self, content: str) -> str:
+        # Blobs, trees and commits are content-addressed objects; a repeat at most leaves an unreferenced copy
+        resp = await self.request("POST", f"{self.repo_path}/git/blobs", retry=True, json={
+            "content": base64.b64encode(content.encode("utf-8")).decode("ascii"),
+            "encoding": "base64",
+        })
+        return resp.json()["sha"]
+
+    async def create_tree(self, base_tree: str, entries: List[Dict[str, Any]]) -> str:
+        resp = await self.request("POST", f"{self.repo_path}/git/trees", retry=True, json={"base_tree": base_tree, "tree": entries})
+        return resp.json()["sha"]
+
+    async def create_commit(self, message: str, tree_sha: str, parents: List[str]) -> str:
+        resp = await self.request("POST", f"{self.repo_path}/git/commits", retry=True, json={
+            "message": message,
+            "tree": tree_sha,
+            "parents": parents,
+        })
+        return resp.json()["sha"]
+
+    async def create_branch(self, branch: str, sha: str, force: bool = False):
+        """
+        Create the branch; one already pointing at `sha` (a repeat whose response was lost) counts
+        as created. With force=True an existing branch pointing elsewhere is moved to `sha`.
+        """
+        try:
+            await self.request("POST", f"{self.repo_path}/git/refs", retry=True,
+                               json={"ref": f"refs/heads/{branch}", "sha": sha})
+        except GitHubAPIError as e:
+            if not _already_exists(e):
+                raise
+            if await self.get_branch_sha(branch) == sha:
+                logger.info("Branch %s already exists at %s; reusing it", branch, sha[:12])
+            elif force:
+                await self.request("PATCH", f"{self.repo_path}/git/refs/heads/{branch}", json={"sha": sha, "force": True})
+                logger.info("Branch %s already existed; moved it to %s", branch, sha[:12])
+            else:
+                raise
+
+    async def find_pull_request(self, head: str, base: str) -> Optional[Dict[str, Any]]:
+        """The open PR from `head` into `base`, if there is one."""
+        resp = await self.request("GET", f"{self.repo_path}/pulls", params={
+            "head": f"{self.owner}:{head}",
+            "base": base,
+            "state": "open",
+        })
+        pulls = resp.json()
+        return pulls[0] if pulls else None
+
+    async def create_pull_request(self, title: str, body: str, head: str, base: str) -> Dict[str, Any]:
+        """Open the PR; if one is already open for `head` (e.g. a repeat whose response was lost) return that."""
+        try:
+            resp = await self.request("POST", f"{self.repo_path}/pulls", retry=True, json={
+                "title": title,
+                "body": body,
+                "head": head,
+                "base": base,
+            })
+            return resp.json()
+        except GitHubAPIError as e:
+            if not _already_exists(e):
+                raise
+            existing = await self.find_pull_request(head, base)
+            if existing is None:
+                raise
+            logger.info("PR #%s already open for %s; reusing it", existing.get("number"), head)
+            return existing
+
+    async def commit_files(self, branch: str, base_branch: str, files: Dict[str, str], message: str) -> str:
+        """
+        Point `branch` at one new commit off `base_branch` adding `files` (path -> content),
+        replacing whatever an earlier attempt left on it.
+        """
+        base_sha = await self.get_branch_sha(base_branch)
+        base_tree = await self.get_commit_tree(base_sha)
+        blobs = await asyncio.gather(*(self.create_blob(content) for content in files.values()))
+        entries = [
+            {"path": path, "mode": "100644", "type": "blob", "sha": blob_sha}
+            for path, blob_sha in zip(files.keys(), blobs)
+        ]
+        tree_sha = await self.create_tree(base_tree, entries)
+        commit_sha = await self.create_commit(message, tree_sha, [base_sha])
+        await self.create_branch(branch, commit_sha, force=True)
+        return commit_sha
@@ -1,73 +1,298 @@
 # backend/app/github_manager.py
 import os
+import base64
 import logging
 import asyncio
 import tempfile
 import shutil
-from typing import Optional, Dict, Any
+import fcntl
+import hashlib
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any, List, Tuple
 from pathlib import Path
-import time
 
-from .config import GITHUB_TOKEN, GITHUB_REPO_OWNER, GITHUB_REPO_NAME
-from .database import SyncSessionLocal
+from .config import GITHUB_TOKEN, GITHUB_REPO_OWNER, GITHUB_REPO_NAME, GITHUB_PR_BACKEND, GITHUB_CLONE_MODE, GITHUB_MIRROR_DIR, GITHUB_REMOTE_URL
+from .database import AsyncSessionLocal
 from .models import InfrastructureRequest, User
 from sqlalchemy import select
 
 from .terraform_manager import find_repo_root
+from .github_api import GitHubAPIClient
+from .pr_scheduler import get_scheduler
+from . import progress
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# Branches are named after what they carry, not when: every attempt, scheduler or Celery retry,
+# reuses the one branch and finds the PR an earlier attempt already opened from it
+def _request_branch(request_identifier: str) -> str:
+    return f"infra-{request_identifier}"
+
+
+def _batch_branch(environment: str, request_identifiers: List[str]) -> str:
+    digest = hashlib.sha1(",".join(sorted(request_identifiers)).encode()).hexdigest()[:12]
+    return f"infra-batch-{environment}-{digest}"
+
+
+def _ensure_private_dir(path: str):
+    # The mirror outlives every request; keep it readable by this user only
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    if os.stat(path).st_mode & 0o077:
+        os.chmod(path, 0o700)
+
+
 class GitHubManager:
     def __init__(self):
         self.github_token = GITHUB_TOKEN
         self.repo_owner = GITHUB_REPO_OWNER
         self.repo_name = GITHUB_REPO_NAME
         self.base_branch = "main"
+        self.pr_backend = GITHUB_PR_BACKEND
+        self.clone_mode = GITHUB_CLONE_MODE
+        self.remote_url = GITHUB_REMOTE_URL
+        self.api = GitHubAPIClient(self.github_token, self.repo_owner, self.repo_name)
+        self.mirror_path = os.path.join(GITHUB_MIRROR_DIR, f"{self.repo_owner}-{self.repo_name}.git")
+        self.scheduler = get_scheduler(self.repo_owner, self.repo_name)
 
-    async def create_pull_request(self, request_identifier: str) -> Optional[int]:
-        repo_path = None
+    async def create_pull_request(self, request_identifier: str, request_details: Optional[Dict] = None,
+                                  retry: bool = True) -> Optional[int]:
+        """
+        Open the request's PR, or return the one already open for it. With retry=False a
+        single attempt is made and retrying is left to the caller (the Celery stages).
+        """
         try:
             logger.info("Creating GitHub PR for request %s", request_identifier)
-            request_details = self._get_request_details_sync(request_identifier)
+            request_details = request_details or await self._get_request_details(request_identifier)
             if not request_details:
                 raise Exception(f"Request {request_identifier} not found")
 
-            repo_path = await self._setup_repository()
-
-            timestamp = int(time.time())
-            branch_name = f"infra-{request_identifier}-{timestamp}"
-            await self._create_branch(repo_path, branch_name)
-
-            await self._create_terraform_files(repo_path, request_identifier, request_details)
+            branch_name = _request_branch(request_identifier)
+            pr_title, pr_body = self._pr_title_body(request_identifier, request_details)
+            commit_message = self._generate_commit_message(request_identifier, request_details)
 
-            await self._commit_changes(repo_path, request_identifier, request_details)
-            await self._push_branch(repo_path, branch_name)
-            pr_number = await self._create_pr(request_identifier, request_details, branch_name)
+            env = getattr(request_details["request"], "environment", None)
+            pr_number = await self.scheduler.submit(env, lambda attempt: self._open_pull_request(
+                {request_identifier: request_details}, branch_name, commit_message, pr_title, pr_body
+            ), max_attempts=None if retry else 1)
             logger.info("Successfully created PR #%s for %s", pr_number, request_identifier)
             return pr_number
 
         except Exception as e:
             logger.exception("Error creating GitHub PR for %s: %s", request_identifier, e)
             raise
+
+    async def create_batch_pull_request(self, request_identifiers: List[str], retry: bool = True) -> Optional[int]:
+        """Open a single branch, commit and PR carrying the tfvars of every request in the batch."""
+        if len(request_identifiers) == 1:
+            return await self.create_pull_request(request_identifiers[0], retry=retry)
+        try:
+            logger.info("Creating batched GitHub PR for %d requests", len(request_identifiers))
+            found = await self._get_requests_details(request_identifiers)
+            details_by_id = {}
+            for request_identifier in request_identifiers:
+                if request_identifier in found:
+                    details_by_id[request_identifier] = found[request_identifier]
+                else:
+                    logger.warning("Request %s not found; leaving it out of the batch", request_identifier)
+            if not details_by_id:
+                raise Exception(f"None of the batched requests were found: {request_identifiers}")
+
+            first = next(iter(details_by_id.values()))
+            env = getattr(first["request"], "environment", "dev").lower()
+            branch_name = _batch_branch(env, request_identifiers)
+            pr_title, pr_body = self._batch_pr_title_body(details_by_id)
+            commit_message = self._generate_batch_commit_message(details_by_id)
+
+            pr_number = await self.scheduler.submit(env, lambda attempt: self._open_pull_request(
+                details_by_id, branch_name, commit_message, pr_title, pr_body
+            ), max_attempts=None if retry else 1)
+            logger.info("Successfully created batched PR #%s for %s", pr_number, list(details_by_id))
+            return pr_number
+
+        except Exception as e:
+            logger.exception("Error creating batched GitHub PR for %s: %s", request_identifiers, e)
+            raise
+
+    async def _open_pull_request(
+        self,
+        details_by_id: Dict[str, Dict],
+        branch_name: str,
+        commit_message: str,
+        pr_title: str,
+        pr_body: str,
+    ) -> int:
+        # An earlier attempt may have opened the PR and failed afterwards (e.g. updating the DB)
+        existing = await self.api.find_pull_request(branch_name, self.base_branch)
+        if existing:
+            logger.info("PR #%s is already open from %s; not opening another", existing.get("number"), branch_name)
+            return int(existing.get("number") or 0)
+
+        # Reading or rendering tfvars touches the filesystem; keep it off the event loop
+        files = dict(await asyncio.gather(*(
+            asyncio.to_thread(self._tfvars_for_request, request_identifier, request_details)
+            for request_identifier, request_details in details_by_id.items()
+        )))
+
+        if self.pr_backend == "api":
+            # Blob -> tree -> commit -> ref -> pull request, without any local checkout
+            await progress.report_async(details_by_id, progress.PUSHING)
+            await self.api.commit_files(branch_name, self.base_branch, files, commit_message)
+            pr = await self.api.create_pull_request(pr_title, pr_body, branch_name, self.base_branch)
+            logger.info("Created PR %s via API: %s", pr.get("number"), pr.get("html_url"))
+            return int(pr.get("number") or 0)
+
+        repo_path = None
+        try:
+            await progress.report_async(details_by_id, progress.CLONING)
+            if self.pr_backend == "mirror":
+                repo_path = await self._setup_worktree(branch_name)
+            else:
+                sparse_dirs = sorted({os.path.dirname(path) for path in files})
+                repo_path = await self._setup_repository(sparse_dirs if self.clone_mode == "sparse" else None)
+                await self._create_branch(repo_path, branch_name)
+
+            await self._create_terraform_files(repo_path, files)
+            await self._commit_changes(repo_path, commit_message)
+            await progress.report_async(details_by_id, progress.PUSHING)
+            await self._push_branch(repo_path, branch_name)
+            return await self._create_pr(pr_title, pr_body, branch_name)
         finally:
-            if repo_path and os.path.exists(repo_path):
-                shutil.rmtree(repo_path, ignore_errors=True)
+            if repo_path:
+                await self._cleanup_repository(repo_path, branch_name)
 
-    async def _setup_repository(self) -> str:
-        temp_dir = tempfile.mkdtemp()
-        repo_path = os.path.join(temp_dir, "repo")
+    async def warm_up(self):
+        """Create or fetch the mirror ahead of the first request that needs it."""
+        if self.pr_backend != "mirror":
+            return
+        async with self._mirror_lock():
+            await self._ensure_mirror()
+
+    def _clone_url(self) -> str:
+        if self.remote_url:
+            return self.remote_url
         if not self.github_token or not self.repo_owner or not self.repo_name:
             raise Exception("GitHub configuration missing (GITHUB_TOKEN/REPO owner/name)")
-        clone_url = f"https://{self.github_token}@github.com/{self.repo_owner}/{self.repo_name}.git"
-        proc = await asyncio.create_subprocess_exec("git", "clone", clone_url, repo_path,
+        return f"https://github.com/{self.repo_owner}/{self.repo_name}.git"
+
+    def _remote_env(self) -> Optional[Dict[str, str]]:
+        """
+        Environment for git commands that talk to GitHub. The token goes in as a per-command
+        http.extraheader, so it is never written to a remote URL or to the mirror's config.
+        """
+        if not self.github_token:
+            return None
+        auth = base64.b64encode(f"x-access-token:{self.github_token}".encode()).decode()
+        env = os.environ.copy()
+        env.update({
+            "GIT_CONFIG_COUNT": "1",
+            "GIT_CONFIG_KEY_0": "http.https://github.com/.extraheader",
+            "GIT_CONFIG_VALUE_0": f"AUTHORIZATION: basic {auth}",
+            "GIT_TERMINAL_PROMPT": "0",
+        })
+        return env
+
+    async def _git(self, *args: str, cwd: Optional[str] = None, remote: bool = False) -> Tuple[int, str, str]:
+        proc = await asyncio.create_subprocess_exec("git", *args, cwd=cwd, env=self._remote_env() if remote else None,
                                                     stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
         out, err = await proc.communicate()
-        if proc.returncode != 0:
-            raise Exception(f"Failed to clone repository: {err.decode().strip()}")
+        return proc.returncode, out.decode().strip(), err.decode().strip()
+
+    async def _setup_repository(self, sparse_dirs: Optional[List[str]] = None) -> str:
+        temp_dir = tempfile.mkdtemp()
+        repo_path = os.path.join(temp_dir, "repo")
+        clone_args = ["clone"]
+        if sparse_dirs:
+            # Tip commit only, no file contents up front; blobs for the sparse paths are fetched on checkout
+            clone_args += ["--depth", "1", "--filter=blob:none", "--sparse", "--branch", self.base_branch]
+        rc, _, err = await self._git(*clone_args, self._clone_url(), repo_path, remote=True)
+        if rc != 0:
+            raise Exception(f"Failed to clone repository: {err}")
+        if sparse_dirs:
+            rc, _, err = await self._git("sparse-checkout", "set", *sparse_dirs, cwd=repo_path)
+            if rc != 0:
+                raise Exception(f"Failed to set sparse checkout: {err}")
         await self._configure_git(repo_path)
         return repo_path
 
+    @asynccontextmanager
+    async def _mirror_lock(self):
+        """Serialise fetch and worktree bookkeeping across coroutines and worker processes."""
+        _ensure_private_dir(os.path.dirname(self.mirror_path))
+        fd = os.open(f"{self.mirror_path}.lock", os.O_CREAT | os.O_RDWR)
+        try:
+            await asyncio.to_thread(fcntl.flock, fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    async def _ensure_mirror(self):
+        """Create the bare mirror on first use, otherwise fetch only the base branch incrementally."""
+        if not os.path.exists(os.path.join(self.mirror_path, "HEAD")):
+            # Not clone --bare: that copies every remote branch, earlier requests' infra-* included,
+            # into refs/heads; the fetch below brings in only the base branch
+            for args in (("init", "--bare", self.mirror_path),
+                         ("remote", "add", "origin", self._clone_url()),
+                         ("config", "remote.origin.fetch", "+refs/heads/*:refs/remotes/origin/*")):
+                rc, _, err = await self._git(*args, cwd=None if args[0] == "init" else self.mirror_path)
+                if rc != 0:
+                    shutil.rmtree(self.mirror_path, ignore_errors=True)
+                    raise Exception(f"Failed to create repository mirror: {err}")
+            await self._configure_git(self.mirror_path)
+            logger.info("Created repository mirror at %s", self.mirror_path)
+        else:
+            # Drop worktrees left behind by crashed runs
+            await self._git("worktree", "prune", cwd=self.mirror_path)
+            # Mirrors created by older versions kept the token in the remote URL
+            await self._git("remote", "set-url", "origin", self._clone_url(), cwd=self.mirror_path)
+
+        rc, _, err = await self._git(
+            "fetch", "--prune", "origin",
+            f"+refs/heads/{self.base_branch}:refs/remotes/origin/{self.base_branch}",
+            cwd=self.mirror_path, remote=True,
+        )
+        if rc != 0:
+            raise Exception(f"Failed to fetch {self.base_branch} into mirror: {err}")
+
+    async def _drop_stale_worktree(self, branch_name: str):
+        """Remove a worktree still holding `branch_name`: it belongs to an attempt that died before cleanup."""
+        _, out, _ = await self._git("worktree", "list", "--porcelain", cwd=self.mirror_path)
+        path = None
+        for line in out.splitlines():
+            if line.startswith("worktree "):
+                path = line[len("worktree "):]
+            elif line == f"branch refs/heads/{branch_name}" and path:
+                logger.warning("Removing worktree %s left on %s by an earlier attempt", path, branch_name)
+                await self._git("worktree", "remove", "--force", path, cwd=self.mirror_path)
+
+    async def _setup_worktree(self, branch_name: str) -> str:
+        worktree_path = os.path.join(tempfile.mkdtemp(prefix="aiops-wt-"), "repo")
+        async with self._mirror_lock():
+            await self._ensure_mirror()
+            # Branch names are stable per request (stage leases keep two attempts of one request
+            # apart), so an earlier attempt may have left the branch or its worktree behind
+            await self._drop_stale_worktree(branch_name)
+            rc, _, err = await self._git(
+                "worktree", "add", "-B", branch_name, worktree_path, f"refs/remotes/origin/{self.base_branch}",
+                cwd=self.mirror_path,
+            )
+        if rc != 0:
+            raise Exception(f"Failed to create worktree for {branch_name}: {err}")
+        logger.info("Created worktree %s on branch %s", worktree_path, branch_name)
+        return worktree_path
+
+    async def _cleanup_repository(self, repo_path: str, branch_name: Optional[str]):
+        if self.pr_backend == "mirror":
+            async with self._mirror_lock():
+                await self._git("worktree", "remove", "--force", repo_path, cwd=self.mirror_path)
+                if branch_name:
+                    await self._git("branch", "-D", branch_name, cwd=self.mirror_path)
+                    await self._git("update-ref", "-d", f"refs/remotes/origin/{branch_name}", cwd=self.mirror_path)
+        temp_dir = os.path.dirname(repo_path)
+        if os.path.exists(temp_dir):
+            await asyncio.to_thread(shutil.rmtree, temp_dir, True)
+
     async def _configure_git(self, repo_path: str):
         commands = [
             ["git", "config", "user.email", "aiops-bot@company.com"],
@@ -85,7 +310,8 @@ class GitHubManager:
         if proc.returncode != 0:
             raise Exception(f"Failed to create branch {branch_name}: {err.decode().strip()}")
 
-    async def _create_terraform_files(self, repo_path: str, request_identifier: str, request_details: Dict):
+    def _tfvars_for_request(self, request_identifier: str, request_details: Dict) -> Tuple[str, str]:
+        """Return the tfvars path relative to the repo root and its content."""
         request = request_details["request"]
         user = request_details["user"]
         params = request_details["parameters"] or {}
@@ -95,36 +321,40 @@ class GitHubManager:
         env = (params.get("environment") or getattr(request, "environment", "dev")).lower()
 
         tfvars_name = f"{request_identifier}.tfvars"
+        repo_relative = f"backend/terraform/environments/{cloud}/{env}/requests/{tfvars_name}"
+
         canonical_tfvars = None
         if repo_root:
             canonical_tfvars = repo_root / "terraform" / "environments" / cloud / env / "requests" / tfvars_name
 
-        clone_requests_dir = Path(repo_path) / "backend" / "terraform" / "environments" / cloud / env / "requests"
-        clone_requests_dir.mkdir(parents=True, exist_ok=True)
-        clone_tfvars_path = clone_requests_dir / tfvars_name
-
         if canonical_tfvars and canonical_tfvars.exists():
-            shutil.copy2(canonical_tfvars, clone_tfvars_path)
-            logger.info("Copied tfvars from canonical workspace: %s -> %s", canonical_tfvars, clone_tfvars_path)
-            return
+            logger.info("Using tfvars from canonical workspace: %s", canonical_tfvars)
+            return repo_relative, canonical_tfvars.read_text(encoding="utf-8")
 
         backend_tfvars = Path.cwd().resolve() / "terraform" / "environments" / cloud / env / "requests" / tfvars_name
         if backend_tfvars.exists():
-            shutil.copy2(backend_tfvars, clone_tfvars_path)
-            logger.info("Copied tfvars from backend fallback: %s -> %s", backend_tfvars, clone_tfvars_path)
-            return
+            logger.info("Using tfvars from backend fallback: %s", backend_tfvars)
+            return repo_relative, backend_tfvars.read_text(encoding="utf-8")
 
         from .terraform_manager import _render_tfvars_content
-        content = _render_tfvars_content(request_identifier, user, params)
-        clone_tfvars_path.write_text(content, encoding="utf-8")
-        logger.info("Generated tfvars in clone (fallback): %s", clone_tfvars_path)
+        logger.info("Rendering tfvars for %s (fallback)", request_identifier)
+        return repo_relative, _render_tfvars_content(request_identifier, user, params)
+
+    async def _create_terraform_files(self, repo_path: str, files: Dict[str, str]):
+        await asyncio.to_thread(self._write_files, repo_path, files)
 
-    async def _commit_changes(self, repo_path: str, request_identifier: str, request_details: Dict):
+    def _write_files(self, repo_path: str, files: Dict[str, str]):
+        for repo_relative, content in files.items():
+            clone_tfvars_path = Path(repo_path) / repo_relative
+            clone_tfvars_path.parent.mkdir(parents=True, exist_ok=True)
+            clone_tfvars_path.write_text(content, encoding="utf-8")
+            logger.info("Wrote tfvars into working copy: %s", clone_tfvars_path)
+
+    async def _commit_changes(self, repo_path: str, commit_message: str):
         proc = await asyncio.create_subprocess_exec("git", "add", ".", cwd=repo_path,
                                                     stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
         await proc.communicate()
 
-        commit_message = self._generate_commit_message(request_identifier, request_details)
         proc = await asyncio.create_subprocess_exec("git", "commit", "-m", commit_message, cwd=repo_path,
                                                     stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
         out, err = await proc.communicate()
@@ -134,29 +364,46 @@ class GitHubManager:
                 logger.info("Nothing to commit (no changes).")
             else:
                 raise Exception(f"Failed to commit changes: {err.decode().strip()}")
-        logger.info("Committed changes for %s", request_identifier)
+        logger.info("Committed changes in %s", repo_path)
 
     def _generate_commit_message(self, request_identifier: str, request_details: Dict) -> str:
         request = request_details["request"]
         user = request_details["user"]
         return f"Auto infra PR: {request_identifier}\n\nAuto-generated by AIOps Platform"
 
+    def _generate_batch_commit_message(self, details_by_id: Dict[str, Dict]) -> str:
+        lines = "\n".join(f"- {request_identifier}" for request_identifier in details_by_id)
+        return f"Auto infra PR: {len(details_by_id)} requests\n\n{lines}\n\nAuto-generated by AIOps Platform"
+
     async def _push_branch(self, repo_path: str, branch_name: str):
-        proc = await asyncio.create_subprocess_exec("git", "fetch", "origin", cwd=repo_path,
-                                                    stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
-        await proc.communicate()
+        # Worktrees come from a freshly fetched mirror and sparse clones are seconds old, so only full clones need this
+        if self.pr_backend != "mirror" and self.clone_mode != "sparse":
+            await self._git("fetch", "origin", cwd=repo_path, remote=True)
 
-        proc = await asyncio.create_subprocess_exec("git", "push", "origin", branch_name, "--force-with-lease", cwd=repo_path,
-                                                    stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
-        out, err = await proc.communicate()
-        if proc.returncode != 0:
-            raise Exception(f"Failed to push branch {branch_name}: {err.decode().strip()}")
+        # The branch belongs to this request alone; a failed earlier attempt's push is replaced
+        rc, _, err = await self._git("push", "origin", branch_name, "--force", cwd=repo_path, remote=True)
+        if rc != 0:
+            raise Exception(f"Failed to push branch {branch_name}: {err}")
         logger.info("Pushed branch %s to origin.", branch_name)
 
-    async def _create_pr(self, request_identifier: str, request_details: Dict, branch_name: str) -> int:
+    def _pr_title_body(self, request_identifier: str, request_details: Dict) -> Tuple[str, str]:
         user = request_details.get("user")
         pr_title = f"[{getattr(request_details['request'],'environment','DEV').upper()}] AWS EC2 - {request_identifier}"
         pr_body = f"Auto generated PR for {request_identifier}\n\nRequested by: {getattr(user,'email','unknown')}\n"
+        return pr_title, pr_body
+
+    def _batch_pr_title_body(self, details_by_id: Dict[str, Dict]) -> Tuple[str, str]:
+        first = next(iter(details_by_id.values()))
+        env = getattr(first["request"], "environment", "DEV").upper()
+        pr_title = f"[{env}] AWS EC2 - {len(details_by_id)} requests"
+        rows = []
+        for request_identifier, request_details in details_by_id.items():
+            user = request_details.get("user")
+            rows.append(f"- {request_identifier} (requested by: {getattr(user, 'email', 'unknown')})")
+        pr_body = f"Auto generated PR for {len(details_by_id)} requests\n\n" + "\n".join(rows) + "\n"
+        return pr_title, pr_body
+
+    async def _create_pr(self, pr_title: str, pr_body: str, branch_name: str) -> int:
         env = os.environ.copy()
         env["GH_TOKEN"] = self.github_token or env.get("GH_TOKEN", "")
         proc = await asyncio.create_subprocess_exec("gh", "pr", "create", "--title", pr_title, "--body", pr_body,
@@ -174,39 +421,38 @@ class GitHubManager:
         logger.info("Created PR %s: %s", pr_number, pr_url)
         return pr_number
 
-    def _get_request_details_sync(self, request_identifier: str) -> Dict:
-        with SyncSessionLocal() as db:
-            try:
-                result = db.execute(
+    async def _get_requests_details(self, request_identifiers: List[str]) -> Dict[str, Dict]:
+        """One query for all requests; requests without a user row are still returned."""
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
                     select(InfrastructureRequest, User)
-                    .join(User)
-                    .where(InfrastructureRequest.request_identifier == request_identifier)
-                )
-                request_data = result.first()
-                
-                if request_data:
-                    request, user = request_data
-                    return {
-                        "request": request, 
-                        "user": user, 
-                        "parameters": request.request_parameters
-                    }
-                
-                result = db.execute(
-                    select(InfrastructureRequest)
-                    .where(InfrastructureRequest.request_identifier == request_identifier)
+                    .outerjoin(User, User.id == InfrastructureRequest.user_id)
+                    .where(InfrastructureRequest.request_identifier.in_(request_identifiers))
                 )
-                req = result.scalar_one_or_none()
-                
-                if req:
-                    return {
-                        "request": req, 
-                        "user": None, 
-                        "parameters": getattr(req, "request_parameters", {})
-                    }
-                
-                return None
-                
-            except Exception as e:
-                logger.exception("Error in sync database lookup for %s: %s", request_identifier, e)
-                return None
\ No newline at end of file
+                rows = result.all()
+        except Exception as e:
+            logger.exception("Error in database lookup for %s: %s", request_identifiers, e)
+            return {}
+        return {
+            request.request_identifier: {
+                "request": request,
+                "user": user,
+                "parameters": request.request_parameters,
+            }
+            for request, user in rows
+        }
+
+    async def _get_request_details(self, request_identifier: str) -> Optional[Dict]:
+        return (await self._get_requests_details([request_identifier])).get(request_identifier)
+
+
+_manager: Optional[GitHubManager] = None
+
+
+def get_github_manager() -> GitHubManager:
+    """The process-wide GitHubManager; it keeps no per-request state."""
+    global _manager
+    if _manager is None:
+        _manager = GitHubManager()
+    return _manager
@@ -0,0 +1,217 @@
+# backend/app/idempotency.py
+"""
+Idempotency for the request pipeline, keyed by request_identifier and stage.
+
+    idem:{rid}:{stage}:lease      SET NX with a TTL while the stage runs (value: owner token)
+    idem:{rid}:{stage}:result     JSON result of the finished stage, returned to duplicates
+    idem:{rid}:dispatch:pipeline  id of the pipeline already dispatched for the request
+    idem:leases                   zset of "{rid}:{stage}" -> lease deadline, swept by the reaper
+
+A duplicate that arrives while the stage runs is told so (StageInFlight); one that arrives
+after it finished gets the stored result without redoing the work. A failed stage drops
+its lease so its retry can claim it again.
+"""
+import json
+import logging
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+import redis
+
+from .config import REDIS_URL, IDEMPOTENCY_LEASE_SECONDS, IDEMPOTENCY_RESULT_TTL
+from .metrics import IDEMPOTENCY_OUTCOMES
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+LEASES_KEY = "idem:leases"
+
+# Only the owner may extend or drop its lease
+_RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('PEXPIRE', KEYS[1], ARGV[2])
+    redis.call('ZADD', KEYS[2], ARGV[3], ARGV[4])
+    return 1
+end
+return 0
+"""
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+    redis.call('ZREM', KEYS[2], ARGV[2])
+    return 1
+end
+return 0
+"""
+
+# Only reap if the deadline is still past; a renewal in between moves it forward
+_REAP_SCRIPT = """
+local deadline = redis.call('ZSCORE', KEYS[2], ARGV[1])
+if deadline and tonumber(deadline) <= tonumber(ARGV[2]) then
+    redis.call('DEL', KEYS[1])
+    redis.call('ZREM', KEYS[2], ARGV[1])
+    return 1
+end
+return 0
+"""
+
+_redis_client = redis.from_url(REDIS_URL) if REDIS_URL else None
+
+
+class StageInFlight(Exception):
+    """Another worker holds the lease for this request and stage."""
+
+    def __init__(self, request_identifier: str, stage: str):
+        super().__init__(f"{stage} for {request_identifier} is already running")
+        self.request_identifier = request_identifier
+        self.stage = stage
+
+
+def _key(request_identifier: str, stage: str, kind: str) -> str:
+    return f"idem:{request_identifier}:{stage}:{kind}"
+
+
+def get_result(request_identifier: str, stage: str, client: Optional[redis.Redis] = None) -> Optional[Dict[str, Any]]:
+    client = client if client is not None else _redis_client
+    if client is None:
+        return None
+    raw = client.get(_key(request_identifier, stage, "result"))
+    return json.loads(raw) if raw else None
+
+
+class _LeaseRenewer(threading.Thread):
+    """Extends a held lease every third of its TTL until stopped."""
+
+    def __init__(self, client: redis.Redis, request_identifier: str, stage: str, token: str, lease_seconds: int):
+        super().__init__(name=f"idem-lease-{stage}", daemon=True)
+        self.client = client
+        self.lease_key = _key(request_identifier, stage, "lease")
+        self.member = f"{request_identifier}:{stage}"
+        self.token = token
+        self.lease_seconds = lease_seconds
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.lease_seconds / 3):
+            try:
+                deadline = time.time() + self.lease_seconds
+                renewed = self.client.eval(
+                    _RENEW_SCRIPT, 2, self.lease_key, LEASES_KEY,
+                    self.token, int(self.lease_seconds * 1000), deadline, self.member,
+                )
+                if not renewed:
+                    logger.warning("Lost idempotency lease %s", self.lease_key)
+                    return
+            except Exception as e:
+                logger.warning("Could not renew idempotency lease %s: %s", self.lease_key, e)
+
+
+def run_once(
+    request_identifier: str,
+    stage: str,
+    fn: Callable[[], Dict[str, Any]],
+    keep: Callable[[Dict[str, Any]], bool] = lambda result: True,
+    lease_seconds: int = IDEMPOTENCY_LEASE_SECONDS,
+    result_ttl: int = IDEMPOTENCY_RESULT_TTL,
+    client: Optional[redis.Redis] = None,
+) -> Dict[str, Any]:
+    """
+    Run fn() at most once per (request_identifier, stage). Returns the stored result if the
+    stage already finished and raises StageInFlight if another worker is running it. Results
+    for which keep() is false are not stored, so the stage can run again.
+    """
+    client = client if client is not None else _redis_client
+    if client is None:
+        return fn()
+
+    stored = get_result(request_identifier, stage, client)
+    if stored is not None:
+        IDEMPOTENCY_OUTCOMES.labels(stage=stage, outcome="duplicate_done").inc()
+        logger.info("%s for %s already done, returning stored result", stage, request_identifier)
+        return stored
+
+    lease_key = _key(request_identifier, stage, "lease")
+    member = f"{request_identifier}:{stage}"
+    token = uuid.uuid4().hex
+    if not client.set(lease_key, token, nx=True, ex=lease_seconds):
+        IDEMPOTENCY_OUTCOMES.labels(stage=stage, outcome="duplicate_in_flight").inc()
+        raise StageInFlight(request_identifier, stage)
+    client.zadd(LEASES_KEY, {member: time.time() + lease_seconds})
+    IDEMPOTENCY_OUTCOMES.labels(stage=stage, outcome="acquired").inc()
+
+    # The stage may have finished between the result check and the lease
+    stored = get_result(request_identifier, stage, client)
+    if stored is not None:
+        client.eval(_RELEASE_SCRIPT, 2, lease_key, LEASES_KEY, token, member)
+        IDEMPOTENCY_OUTCOMES.labels(stage=stage, outcome="duplicate_done").inc()
+        return stored
+
+    renewer = _LeaseRenewer(client, request_identifier, stage, token, lease_seconds)
+    renewer.start()
+    try:
+        result = fn()
+        if keep(result):
+            client.set(_key(request_identifier, stage, "result"), json.dumps(result, default=str), ex=result_ttl)
+            IDEMPOTENCY_OUTCOMES.labels(stage=stage, outcome="completed").inc()
+        else:
+            IDEMPOTENCY_OUTCOMES.labels(stage=stage, outcome="released").inc()
+        return result
+    except BaseException:
+        IDEMPOTENCY_OUTCOMES.labels(stage=stage, outcome="released").inc()
+        raise
+    finally:
+        renewer.stopped.set()
+        try:
+            client.eval(_RELEASE_SCRIPT, 2, lease_key, LEASES_KEY, token, member)
+        except Exception as e:
+            logger.warning("Could not release idempotency lease %s (expires on its own): %s", lease_key, e)
+
+
+def claim_dispatch(request_identifier: str, pipeline_id: str, ttl: int = IDEMPOTENCY_LEASE_SECONDS,
+                   client: Optional[redis.Redis] = None) -> Optional[str]:
+    """
+    Record pipeline_id as the pipeline for this request. Returns None if it was recorded,
+    or the id of the pipeline already dispatched for it.
+    """
+    client = client if client is not None else _redis_client
+    if client is None:
+        return None
+    key = _key(request_identifier, "dispatch", "pipeline")
+    if client.set(key, pipeline_id, nx=True, ex=ttl):
+        return None
+    existing = client.get(key)
+    IDEMPOTENCY_OUTCOMES.labels(stage="dispatch", outcome="duplicate_in_flight").inc()
+    return existing.decode() if isinstance(existing, bytes) else existing
+
+
+def release_dispatch(request_identifier: str, client: Optional[redis.Redis] = None):
+    """Forget the dispatched pipeline, e.g. when sending it to the broker failed."""
+    client = client if client is not None else _redis_client
+    if client is not None:
+        client.delete(_key(request_identifier, "dispatch", "pipeline"))
+
+
+def reap_expired_leases(client: Optional[redis.Redis] = None, now: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Sweep leases whose deadline passed: their owner died without releasing them. The lease
+    key is normally gone with its TTL by then; the sweep clears the bookkeeping and counts
+    them, so stages that die mid-flight show up as outcome="reaped".
+    """
+    client = client if client is not None else _redis_client
+    if client is None:
+        return {"reaped": 0}
+    now = now if now is not None else time.time()
+    expired = client.zrangebyscore(LEASES_KEY, "-inf", now)
+    reaped = []
+    for raw in expired:
+        member = raw.decode() if isinstance(raw, bytes) else raw
+        request_identifier, _, stage = member.rpartition(":")
+        if not client.eval(_REAP_SCRIPT, 2, _key(request_identifier, stage, "lease"), LEASES_KEY, member, now):
+            continue
+        IDEMPOTENCY_OUTCOMES.labels(stage=stage, outcome="reaped").inc()
+        reaped.append(member)
+    if reaped:
+        logger.warning("Reaped %d expired idempotency leases: %s", len(reaped), reaped)
+    return {"reaped": len(reaped), "leases": reaped}
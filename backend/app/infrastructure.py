@@ -1,18 +1,28 @@
 # backend/app/infrastructure.py
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from typing import Dict, Any, Optional
+import asyncio
+import json
 import logging
+import zlib
 from datetime import datetime
 from uuid import UUID, uuid4
 
 from .database import get_db, AsyncSessionLocal
-from .models import User, InfrastructureRequest, TerraformState, UserNotification
+from .models import User, InfrastructureRequest, TerraformState, UserNotification, ManagedResource
 from .schemas import InfrastructureRequestCreate
 from .utils import get_current_user
 from .websocket_manager import manager
-from .config import API_TOKEN
+from .state_storage import StateBlobWriter, store_state_blob, iter_state_bytes, release_state_blob
+from .state_index import StateStreamParser, StateParseError, extract_managed_resources, upsert_managed_resources
+from .plan_summary import PlanSummaryParser, PlanParseError, format_plan_message
+from .state_history import record_state_version, load_state_version, list_state_versions, diff_state_versions
+from .events import DeploymentEvent, EventType, event_from_payload
+from .db_helpers import get_user_email_by_request
+from .config import API_TOKEN, STATE_UPLOAD_MAX_BYTES, STATE_CHUNK_SIZE, STATE_DELTA_MAX_BYTES
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/infrastructure", tags=["infrastructure"])
@@ -91,9 +101,14 @@ async def create_infrastructure_request_endpoint(
         await db.refresh(db_request)
 
         # dispatch celery
-        from .tasks import process_infrastructure_request
+        from .tasks import start_request_pipeline
         try:
-            task_result = process_infrastructure_request.delay(request_data.request_identifier, current_user.email)
+            # Dispatch makes blocking Redis calls (claim, progress, fair queue); keep them off the loop
+            task_result = await asyncio.to_thread(
+                start_request_pipeline,
+                request_data.request_identifier, current_user.email,
+                environment=request_data.environment, department=current_user.department,
+            )
             logger.info(f"Dispatched Celery task {task_result.id} for request {request_data.request_identifier}")
         except Exception as e:
             logger.exception(f"Failed to dispatch Celery task: {e}")
@@ -117,15 +132,16 @@ async def get_user_requests(
     current_user: User = Depends(get_current_user)
 ):
     try:
+        # Only the small resource_ids column is selected; state bytes live in terraform_state_blobs
         result = await db.execute(
-            select(InfrastructureRequest, TerraformState)
+            select(InfrastructureRequest, TerraformState.resource_ids)
             .outerjoin(TerraformState, InfrastructureRequest.request_identifier == TerraformState.request_identifier)
             .where(InfrastructureRequest.user_id == current_user.id)
             .order_by(InfrastructureRequest.created_at.desc())
         )
 
         requests = []
-        for request, state in result.all():
+        for request, resource_ids in result.all():
             request_data = {
                 "id": str(request.id),
                 "request_identifier": request.request_identifier,
@@ -138,11 +154,11 @@ async def get_user_requests(
                 "deployed_at": request.deployed_at.isoformat() if request.deployed_at else None
             }
 
-            if state and state.resource_ids:
+            if resource_ids:
                 request_data["resources"] = {
-                    "instance_id": state.resource_ids.get("instance_id"),
-                    "public_ip": state.resource_ids.get("public_ip"),
-                    "console_url": state.resource_ids.get("console_url")
+                    "instance_id": resource_ids.get("instance_id"),
+                    "public_ip": resource_ids.get("public_ip"),
+                    "console_url": resource_ids.get("console_url")
                 }
 
             requests.append(request_data)
@@ -212,8 +228,13 @@ async def create_infrastructure_request(request_data: Dict[str, Any]) -> str:
 
             # CRITICAL FIX: Trigger Celery task
             try:
-                from .tasks import process_infrastructure_request
-                task_result = process_infrastructure_request.delay(req_id, user_email)
+                from .tasks import start_request_pipeline
+                task_result = await asyncio.to_thread(
+                    start_request_pipeline,
+                    req_id, user_email,
+                    environment=db_request.environment,
+                    department=user_obj.department if user_obj else request_data.get("department"),
+                )
                 logger.info(f"SUCCESS: Dispatched Celery task {task_result.id} for request {req_id}")
             except Exception as e:
                 logger.error(f"FAILED to dispatch Celery task for {req_id}: {e}")
@@ -226,6 +247,70 @@ async def create_infrastructure_request(request_data: Dict[str, Any]) -> str:
         raise
 
 
+async def _get_request_or_404(db: AsyncSession, request_id: str) -> InfrastructureRequest:
+    result = await db.execute(
+        select(InfrastructureRequest).where(
+            InfrastructureRequest.request_identifier == request_id
+        )
+    )
+    infra_request = result.scalar_one_or_none()
+
+    if not infra_request:
+        logger.error(f"Infrastructure request not found: {request_id}")
+        raise HTTPException(status_code=404, detail="Infrastructure request not found")
+    return infra_request
+
+
+async def _save_terraform_state(
+    db: AsyncSession,
+    infra_request: InfrastructureRequest,
+    state_blob,
+    state_doc: Optional[Any],
+    resource_ids: Dict[str, Any],
+    resource_records: Optional[list],
+    status: str = "deployed",
+    cloud_provider: Optional[str] = None,
+    environment: Optional[str] = None
+):
+    request_id = infra_request.request_identifier
+    existing_state_result = await db.execute(
+        select(TerraformState).where(
+            TerraformState.request_identifier == request_id
+        )
+    )
+    terraform_state = existing_state_result.scalar_one_or_none()
+    previous_blob_id = None
+
+    if terraform_state:
+        previous_blob_id = terraform_state.state_blob_id
+        terraform_state.state_blob_id = state_blob.id
+        terraform_state.resource_ids = resource_ids
+        terraform_state.status = status
+        logger.info(f"Updated existing Terraform state for: {request_id}")
+    else:
+        terraform_state = TerraformState(
+            request_id=infra_request.id,
+            user_id=infra_request.user_id,
+            request_identifier=request_id,
+            cloud_provider=cloud_provider or infra_request.cloud_provider,
+            environment=environment or infra_request.environment,
+            state_blob_id=state_blob.id,
+            resource_ids=resource_ids,
+            status=status
+        )
+        db.add(terraform_state)
+        logger.info(f"Created new Terraform state for: {request_id}")
+
+    await record_state_version(db, request_id, state_doc, state_blob)
+    if resource_records is not None:
+        await upsert_managed_resources(db, infra_request, resource_records)
+    if previous_blob_id and previous_blob_id != state_blob.id:
+        await release_state_blob(db, previous_blob_id)
+
+    infra_request.status = "deployed"
+    infra_request.deployed_at = datetime.utcnow()
+
+
 @router.post("/store-state")
 async def store_terraform_state(
     state_data: Dict[str, Any],
@@ -239,23 +324,7 @@ async def store_terraform_state(
 
         logger.info(f"Storing Terraform state for request: {request_id}")
 
-        result = await db.execute(
-            select(InfrastructureRequest).where(
-                InfrastructureRequest.request_identifier == request_id
-            )
-        )
-        infra_request = result.scalar_one_or_none()
-
-        if not infra_request:
-            logger.error(f"Infrastructure request not found: {request_id}")
-            raise HTTPException(status_code=404, detail="Infrastructure request not found")
-
-        existing_state_result = await db.execute(
-            select(TerraformState).where(
-                TerraformState.request_identifier == request_id
-            )
-        )
-        terraform_state = existing_state_result.scalar_one_or_none()
+        infra_request = await _get_request_or_404(db, request_id)
 
         resource_ids = {
             "instance_id": state_data.get("instance_id"),
@@ -263,27 +332,28 @@ async def store_terraform_state(
             "console_url": state_data.get("console_url")
         }
 
-        if terraform_state:
-            terraform_state.terraform_state_file = state_data.get("terraform_state", "")
-            terraform_state.resource_ids = resource_ids
-            terraform_state.status = state_data.get("status", "deployed")
-            logger.info(f"Updated existing Terraform state for: {request_id}")
+        raw_state = state_data.get("terraform_state") or ""
+        if isinstance(raw_state, str):
+            try:
+                state_doc = json.loads(raw_state) if raw_state else None
+            except ValueError:
+                state_doc = None
         else:
-            terraform_state = TerraformState(
-                request_id=infra_request.id,
-                user_id=infra_request.user_id,
-                request_identifier=request_id,
-                cloud_provider=state_data.get("cloud_provider", infra_request.cloud_provider),
-                environment=state_data.get("environment", infra_request.environment),
-                terraform_state_file=state_data.get("terraform_state", ""),
-                resource_ids=resource_ids,
-                status=state_data.get("status", "deployed")
-            )
-            db.add(terraform_state)
-            logger.info(f"Created new Terraform state for: {request_id}")
-
-        infra_request.status = "deployed"
-        infra_request.deployed_at = datetime.utcnow()
+            state_doc = raw_state
+            raw_state = json.dumps(raw_state, separators=(",", ":"))
+        state_blob = await store_state_blob(db, raw_state.encode("utf-8"))
+
+        await _save_terraform_state(
+            db,
+            infra_request,
+            state_blob,
+            state_doc,
+            resource_ids,
+            extract_managed_resources(state_doc) if state_doc is not None else None,
+            status=state_data.get("status", "deployed"),
+            cloud_provider=state_data.get("cloud_provider"),
+            environment=state_data.get("environment")
+        )
 
         await db.commit()
 
@@ -297,37 +367,485 @@ async def store_terraform_state(
         raise HTTPException(status_code=500, detail=f"Failed to store Terraform state: {str(e)}")
 
 
+async def _iter_upload_body(request: Request, max_bytes: int):
+    """
+    Yield the request body in pieces, inflating Content-Encoding: gzip on the fly.
+    Both the wire size and the inflated size are capped at max_bytes.
+    """
+    content_encoding = request.headers.get("content-encoding", "identity").lower()
+    if content_encoding not in ("identity", "gzip"):
+        raise HTTPException(status_code=415, detail=f"Unsupported Content-Encoding: {content_encoding}")
+
+    declared_length = request.headers.get("content-length")
+    if declared_length and declared_length.isdigit() and int(declared_length) > max_bytes:
+        raise HTTPException(status_code=413, detail="Upload exceeds size limit")
+
+    inflater = zlib.decompressobj(31) if content_encoding == "gzip" else None
+    received = 0
+    inflated = 0
+
+    def checked(data: bytes) -> bytes:
+        nonlocal inflated
+        inflated += len(data)
+        if inflated > max_bytes:
+            raise HTTPException(status_code=413, detail="Upload exceeds size limit")
+        return data
+
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > max_bytes:
+            raise HTTPException(status_code=413, detail="Upload exceeds size limit")
+        if inflater is None:
+            if chunk:
+                yield checked(chunk)
+            continue
+        # Bound each inflate step so a small gzip bomb cannot expand in one call
+        data = inflater.decompress(chunk, STATE_CHUNK_SIZE)
+        if data:
+            yield checked(data)
+        while inflater.unconsumed_tail:
+            data = inflater.decompress(inflater.unconsumed_tail, STATE_CHUNK_SIZE)
+            if data:
+                yield checked(data)
+
+    if inflater is not None:
+        tail = inflater.flush()
+        if tail:
+            yield checked(tail)
+
+
+@router.post("/store-state/stream")
+async def store_terraform_state_stream(
+    request: Request,
+    request_identifier: str,
+    status: str = "deployed",
+    db: AsyncSession = Depends(get_db),
+    _: bool = Depends(verify_github_token)
+):
+    """
+    Streaming variant of /store-state. The body is the raw state JSON, optionally
+    sent with Content-Encoding: gzip. Bytes are compressed into storage and parsed
+    incrementally as they arrive. States up to STATE_DELTA_MAX_BYTES are also kept in
+    memory so the history records a delta; larger ones are kept as snapshots, so memory
+    use stays bounded.
+    """
+    try:
+        logger.info(f"Streaming Terraform state for request: {request_identifier}")
+        infra_request = await _get_request_or_404(db, request_identifier)
+
+        writer = StateBlobWriter(db)
+        parser = StateStreamParser()
+        buffered: Optional[bytearray] = bytearray()
+
+        async for data in _iter_upload_body(request, STATE_UPLOAD_MAX_BYTES):
+            await writer.write(data)
+            parser.feed(data)
+            if buffered is not None:
+                buffered.extend(data)
+                if len(buffered) > STATE_DELTA_MAX_BYTES:
+                    buffered = None
+        parser.close()
+
+        state_blob = await writer.finish()
+        await _save_terraform_state(
+            db,
+            infra_request,
+            state_blob,
+            json.loads(buffered) if buffered else None,
+            parser.resource_ids(),
+            parser.resources,
+            status=status
+        )
+        await db.commit()
+
+        logger.info(
+            f"Streamed Terraform state for {request_identifier}: "
+            f"{writer.raw_size} bytes raw, {state_blob.stored_size} bytes stored"
+        )
+        return {
+            "message": "Terraform state stored successfully",
+            "status": "success",
+            "raw_size": writer.raw_size,
+            "stored_size": state_blob.stored_size,
+            "resources_indexed": len(parser.resources)
+        }
+
+    except HTTPException:
+        raise
+    except (zlib.error, StateParseError) as e:
+        logger.error(f"Invalid Terraform state upload for {request_identifier}: {e}")
+        raise HTTPException(status_code=400, detail=f"Invalid Terraform state: {e}")
+    except Exception as e:
+        logger.exception(f"Error streaming Terraform state: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to store Terraform state: {str(e)}")
+
+
+@router.post("/plan")
+async def store_terraform_plan(
+    request: Request,
+    request_identifier: str,
+    db: AsyncSession = Depends(get_db),
+    _: bool = Depends(verify_github_token)
+):
+    """
+    Ingest `terraform show -json` output (optionally gzip-encoded), store a compact
+    per-resource change summary on the request and push it to the requester.
+    """
+    # notify_handler imports this module
+    from .notify_handler import push_live
+
+    try:
+        infra_request = await _get_request_or_404(db, request_identifier)
+
+        parser = PlanSummaryParser()
+        async for data in _iter_upload_body(request, STATE_UPLOAD_MAX_BYTES):
+            parser.feed(data)
+        parser.close()
+
+        summary = parser.summary()
+        infra_request.plan_summary = summary
+        await db.commit()
+        logger.info(f"Stored plan summary for {request_identifier}: {summary['counts']}")
+
+        user = await db.get(User, infra_request.user_id)
+        if user:
+            # The user's websocket may be held by any API process
+            await push_live(DeploymentEvent(
+                type=EventType.PLAN_SUMMARY,
+                request_identifier=request_identifier,
+                user_email=user.email,
+                details={"plan_summary": summary},
+            ))
+
+        return {"message": "Plan summary stored", "status": "success", "counts": summary["counts"]}
+
+    except HTTPException:
+        raise
+    except (zlib.error, PlanParseError) as e:
+        logger.error(f"Invalid Terraform plan upload for {request_identifier}: {e}")
+        raise HTTPException(status_code=400, detail=f"Invalid Terraform plan: {e}")
+    except Exception as e:
+        logger.exception(f"Error storing Terraform plan: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to store Terraform plan: {str(e)}")
+
+
+@router.get("/requests/{request_identifier}/plan")
+async def get_request_plan(
+    request_identifier: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    result = await db.execute(
+        select(InfrastructureRequest.plan_summary).where(
+            InfrastructureRequest.request_identifier == request_identifier,
+            InfrastructureRequest.user_id == current_user.id
+        )
+    )
+    row = result.first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Infrastructure request not found")
+    return {"request_identifier": request_identifier, "plan_summary": row[0]}
+
+
+@router.get("/requests/{request_identifier}/progress")
+async def get_request_progress(
+    request_identifier: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    result = await db.execute(
+        select(InfrastructureRequest.status, InfrastructureRequest.pr_number).where(
+            InfrastructureRequest.request_identifier == request_identifier,
+            InfrastructureRequest.user_id == current_user.id
+        )
+    )
+    row = result.first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Infrastructure request not found")
+
+    response = {"request_identifier": request_identifier, "status": row.status, "pr_number": row.pr_number,
+                "state": None, "progress": None}
+    try:
+        from .tasks import pipeline_progress
+        response.update(await asyncio.to_thread(pipeline_progress, request_identifier))
+    except Exception as e:
+        logger.warning(f"Could not read pipeline progress for {request_identifier}: {e}")
+    return response
+
+
+@router.get("/state/{request_identifier}")
+async def get_terraform_state(
+    request_identifier: str,
+    db: AsyncSession = Depends(get_db),
+    _: bool = Depends(verify_github_token)
+):
+    result = await db.execute(
+        select(TerraformState.state_blob_id).where(
+            TerraformState.request_identifier == request_identifier
+        )
+    )
+    blob_id = result.scalar_one_or_none()
+    if not blob_id:
+        raise HTTPException(status_code=404, detail="Terraform state not found")
+
+    return StreamingResponse(iter_state_bytes(db, blob_id), media_type="application/json")
+
+
+@router.get("/state/{request_identifier}/versions")
+async def get_terraform_state_versions(
+    request_identifier: str,
+    db: AsyncSession = Depends(get_db),
+    _: bool = Depends(verify_github_token)
+):
+    versions = await list_state_versions(db, request_identifier)
+    return {"request_identifier": request_identifier, "versions": versions}
+
+
+@router.get("/state/{request_identifier}/versions/{version}")
+async def get_terraform_state_version(
+    request_identifier: str,
+    version: int,
+    db: AsyncSession = Depends(get_db),
+    _: bool = Depends(verify_github_token)
+):
+    state = await load_state_version(db, request_identifier, version)
+    if state is None:
+        raise HTTPException(status_code=404, detail="State version not found")
+    return {"request_identifier": request_identifier, "version": version, "state": state}
+
+
+@router.get("/state/{request_identifier}/diff")
+async def diff_terraform_state_versions(
+    request_identifier: str,
+    from_version: int,
+    to_version: int,
+    db: AsyncSession = Depends(get_db),
+    _: bool = Depends(verify_github_token)
+):
+    patch = await diff_state_versions(db, request_identifier, from_version, to_version)
+    if patch is None:
+        raise HTTPException(status_code=404, detail="State version not found")
+    return {
+        "request_identifier": request_identifier,
+        "from_version": from_version,
+        "to_version": to_version,
+        "patch": patch
+    }
+
+
+@router.get("/resources/{provider_id}")
+async def find_managed_resource(
+    provider_id: str,
+    resource_type: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    _: bool = Depends(verify_github_token)
+):
+    query = select(ManagedResource).where(ManagedResource.provider_id == provider_id)
+    if resource_type:
+        query = query.where(ManagedResource.resource_type == resource_type)
+    result = await db.execute(query.order_by(ManagedResource.updated_at.desc()))
+    resources = result.scalars().all()
+    if not resources:
+        raise HTTPException(status_code=404, detail="Resource not found")
+
+    return {
+        "provider_id": provider_id,
+        "resources": [
+            {
+                "request_identifier": r.request_identifier,
+                "resource_type": r.resource_type,
+                "address": r.address,
+                "arn": r.arn,
+                "region": r.region,
+                "department": r.department,
+                "user_id": str(r.user_id),
+                "cloud_provider": r.cloud_provider,
+                "environment": r.environment,
+                "status": r.status,
+                "updated_at": r.updated_at.isoformat() if r.updated_at else None
+            }
+            for r in resources
+        ]
+    }
+
+
 @router.post("/notify-deployment")
 async def notify_deployment_status(
     notification_data: Dict[str, Any],
     db: AsyncSession = Depends(get_db),
     _: bool = Depends(verify_github_token)
 ):
-    try:
-        request_id = notification_data.get("request_identifier")
-        user_email = notification_data.get("user_email")
-        status = notification_data.get("status")
-        
-        if not request_id or not user_email:
-            raise HTTPException(status_code=400, detail="request_identifier and user_email required")
-
-        logger.info(f"Notification: {request_id} - {status}")
+    # notify_handler imports this module
+    from .notify_handler import push_live
 
-        if status == "pr_created":
-            await _notify_pr_created(user_email, request_id, notification_data)
-        elif status == "deployed":
-            await _notify_deployment_success(user_email, request_id, notification_data, db)
-        elif status == "failed":
-            await _notify_deployment_failed(user_email, request_id, notification_data, db)
+    request_id = notification_data.get("request_identifier") or notification_data.get("request_id")
+    if not request_id:
+        raise HTTPException(status_code=400, detail="request_identifier required")
 
-        return {"message": "Notification sent", "status": "success"}
+    event = event_from_payload(notification_data)
+    if event is None:
+        logger.info(f"Ignoring notification for {request_id} with status {notification_data.get('status')!r}")
+        return {"message": "Notification ignored", "status": "ignored"}
 
+    try:
+        await apply_deployment_event(event, db)
     except Exception as e:
         logger.exception(f"Error sending notification: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    # The user's websocket may be held by any API process
+    await push_live(event)
+    return {"message": "Notification sent", "status": "success"}
+
+
+async def apply_deployment_event(event: DeploymentEvent, db: Optional[AsyncSession] = None):
+    """
+    Record a deployment event, whether it came from a worker over Redis or from CI: the
+    request's status and the notification kept for offline users. Runs once per event; the
+    websocket messages are push_deployment_event's, which every API process runs.
+    """
+    if event.type not in (EventType.REQUEST_FAILED, EventType.DEPLOYED, EventType.DEPLOYMENT_FAILED):
+        return  # progress and pr_created are live only
+
+    user_email = event.user_email or await get_user_email_by_request(event.request_identifier)
+    if not user_email:
+        logger.warning(f"No user found for request: {event.request_identifier}")
+        return
+    # Carried on to the live push, so no process has to look it up again
+    event.user_email = user_email
+
+    request_id = event.request_identifier
+    data = event.payload()
+    logger.info(f"Notification: {request_id} - {event.type.value}")
+
+    if event.type == EventType.REQUEST_FAILED:
+        await _record_request_failed(user_email, request_id, data)
+    elif db is not None:
+        await _record_deployment_result(event, user_email, data, db)
+    else:
+        async with AsyncSessionLocal() as session:
+            await _record_deployment_result(event, user_email, data, session)
+
+
+async def push_deployment_event(event: DeploymentEvent):
+    """Send a deployment event to its user's websocket, if the user is connected to this process."""
+    if not manager.active_connections:
+        return
+    user_email = event.user_email or await get_user_email_by_request(event.request_identifier)
+    if not user_email or not manager.is_user_connected(user_email):
+        return
+
+    request_id = event.request_identifier
+    data = event.payload()
+    if event.type == EventType.PROGRESS:
+        await _push_progress(user_email, request_id, data)
+    elif event.type == EventType.PR_CREATED:
+        await _push_pr_created(user_email, request_id, data)
+    elif event.type == EventType.REQUEST_FAILED:
+        await _push_request_failed(user_email, request_id, data)
+    elif event.type == EventType.DEPLOYED:
+        await _push_deployment_success(user_email, request_id, data)
+    elif event.type == EventType.PLAN_SUMMARY:
+        await _push_plan_summary(user_email, request_id, data)
+    elif event.type == EventType.STATUS_CHANGED:
+        await _push_status_change(user_email, request_id, data)
+    else:
+        await _push_deployment_failed(user_email, request_id, data)
+
+
+async def _record_deployment_result(event: DeploymentEvent, user_email: str, data: Dict[str, Any], db: AsyncSession):
+    deployed = event.type == EventType.DEPLOYED
+    request_id = event.request_identifier
+    try:
+        result = await db.execute(
+            select(InfrastructureRequest).where(
+                InfrastructureRequest.request_identifier == request_id
+            )
+        )
+        infra_request = result.scalar_one_or_none()
+        if infra_request:
+            infra_request.status = "deployed" if deployed else "failed"
+            if deployed:
+                infra_request.deployed_at = datetime.utcnow()
+            await db.commit()
+    except Exception as e:
+        logger.error(f"Failed to update status: {e}")
+
+    # Store notification for offline users
+    if deployed:
+        await store_notification_in_db(user_email, request_id, "deployed", {
+            "message": _deployment_success_message(request_id, data),
+            "instance_id": data.get("instance_id", ""),
+            "public_ip": data.get("public_ip", ""),
+            "console_url": data.get("console_url", ""),
+            "ssh_command": data.get("ssh_command", "")
+        })
+    else:
+        await store_notification_in_db(user_email, request_id, "failed", {
+            "message": _deployment_failed_message(request_id),
+            "error_message": data.get("error_message", "Deployment failed")
+        })
+
+
+async def _record_request_failed(user_email: str, request_id: str, data: Dict[str, Any]):
+    # The pipeline already marked the request pr_failed; only keep the notification
+    await store_notification_in_db(user_email, request_id, "failed", {
+        "message": _request_failed_message(request_id),
+        "error_message": data.get("error_message", "Pull request could not be created")
+    })
+
+
+def _deployment_success_message(request_id: str, data: Dict[str, Any]) -> str:
+    return f"""Your infrastructure is ready!
+
+Request: {request_id.split('_')[-1]}
+Instance ID: {data.get("instance_id", "")}
+Public IP: {data.get("public_ip", "")}
+SSH: {data.get("ssh_command", "")}
+
+Console: {data.get("console_url", "")}"""
+
+
+def _deployment_failed_message(request_id: str) -> str:
+    return f"Deployment failed for request {request_id.split('_')[-1]}. DevOps team has been notified."
+
+
+def _request_failed_message(request_id: str) -> str:
+    return f"Request {request_id.split('_')[-1]} could not be submitted for approval. DevOps team has been notified."
 
 
-async def _notify_pr_created(user_email: str, request_id: str, data: Dict[str, Any]):
+async def _push_progress(user_email: str, request_id: str, data: Dict[str, Any]):
+    # Live only: a user who is offline sees the outcome notification instead
+    await manager.send_personal_message(user_email, {
+        "type": "request_progress",
+        "request_id": request_id,
+        "state": data.get("state"),
+        "message": data.get("message"),
+        "pr_number": data.get("pr_number"),
+    })
+
+
+async def _push_plan_summary(user_email: str, request_id: str, data: Dict[str, Any]):
+    # Live only: the summary itself is kept on the request for GET /requests/{id}/plan
+    await manager.send_personal_message(user_email, {
+        "type": "plan_summary",
+        "request_id": request_id,
+        "message": format_plan_message(request_id, data["plan_summary"]),
+        "plan_summary": data["plan_summary"]
+    })
+
+
+async def _push_status_change(user_email: str, request_id: str, data: Dict[str, Any]):
+    # Live only: the webhook handler already stored the new status on the request
+    await manager.send_personal_message(user_email, {
+        "type": "request_status",
+        "request_id": request_id,
+        "status": data.get("status"),
+        "pr_number": data.get("pr_number"),
+        "message": data.get("message")
+    })
+
+
+async def _push_pr_created(user_email: str, request_id: str, data: Dict[str, Any]):
     pr_number = data.get("pr_number")
     short_id = request_id.split('_')[-1]
     
@@ -352,41 +870,18 @@ async def _notify_pr_created(user_email: str, request_id: str, data: Dict[str, A
     )
 
 
-async def _notify_deployment_success(user_email: str, request_id: str, data: Dict[str, Any], db: AsyncSession):
+async def _push_deployment_success(user_email: str, request_id: str, data: Dict[str, Any]):
     instance_id = data.get("instance_id", "")
     public_ip = data.get("public_ip", "")
     console_url = data.get("console_url", "")
     ssh_command = data.get("ssh_command", "")
     short_id = request_id.split('_')[-1]
-    
-    try:
-        result = await db.execute(
-            select(InfrastructureRequest).where(
-                InfrastructureRequest.request_identifier == request_id
-            )
-        )
-        infra_request = result.scalar_one_or_none()
-        if infra_request:
-            infra_request.status = "deployed"
-            infra_request.deployed_at = datetime.utcnow()
-            await db.commit()
-    except Exception as e:
-        logger.error(f"Failed to update status: {e}")
-
-    message = f"""Your infrastructure is ready!
-
-Request: {short_id}
-Instance ID: {instance_id}
-Public IP: {public_ip}
-SSH: {ssh_command}
-
-Console: {console_url}"""
 
     await manager.send_personal_message(user_email, {
         "type": "deployment_complete",
         "request_id": request_id,
         "status": "deployed",
-        "message": message,
+        "message": _deployment_success_message(request_id, data),
         "deployment_data": {
             "instance_id": instance_id,
             "public_ip": public_ip,
@@ -418,39 +913,15 @@ Console: {console_url}"""
         }
     )
 
-    # Store notification for offline users
-    await store_notification_in_db(user_email, request_id, "deployed", {
-        "message": message,
-        "instance_id": instance_id,
-        "public_ip": public_ip,
-        "console_url": console_url,
-        "ssh_command": ssh_command
-    })
 
-
-async def _notify_deployment_failed(user_email: str, request_id: str, data: Dict[str, Any], db: AsyncSession):
+async def _push_deployment_failed(user_email: str, request_id: str, data: Dict[str, Any]):
     short_id = request_id.split('_')[-1]
-    
-    try:
-        result = await db.execute(
-            select(InfrastructureRequest).where(
-                InfrastructureRequest.request_identifier == request_id
-            )
-        )
-        infra_request = result.scalar_one_or_none()
-        if infra_request:
-            infra_request.status = "failed"
-            await db.commit()
-    except Exception as e:
-        logger.error(f"Failed to update status: {e}")
-
-    message = f"Deployment failed for request {short_id}. DevOps team has been notified."
 
     await manager.send_personal_message(user_email, {
         "type": "deployment_failed",
         "request_id": request_id,
         "status": "failed",
-        "message": message,
+        "message": _deployment_failed_message(request_id),
         "buttons": [
             {"text": "Try Again", "action": "create_ec2"}
         ],
@@ -464,12 +935,28 @@ async def _notify_deployment_failed(user_email: str, request_id: str, data: Dict
         "error"
     )
 
-    # Store notification for offline users
-    await store_notification_in_db(user_email, request_id, "failed", {
-        "message": message,
-        "error_message": data.get("error_message", "Deployment failed")
+
+async def _push_request_failed(user_email: str, request_id: str, data: Dict[str, Any]):
+    short_id = request_id.split('_')[-1]
+
+    await manager.send_personal_message(user_email, {
+        "type": "request_failed",
+        "request_id": request_id,
+        "status": "pr_failed",
+        "message": _request_failed_message(request_id),
+        "buttons": [
+            {"text": "Try Again", "action": "create_ec2"}
+        ],
+        "show_text_input": True
     })
 
+    await manager.send_popup_notification(
+        user_email,
+        "Request Failed",
+        f"Request {short_id} could not be submitted.",
+        "error"
+    )
+
 
 @router.get("/health")
 async def infrastructure_health():
@@ -0,0 +1,92 @@
+# backend/app/json_patch.py
+"""
+Minimal RFC 6902 JSON-patch support used for Terraform state history.
+Only add/remove/replace are generated; lists of different length are
+replaced wholesale, which keeps diffs of Terraform state small in practice.
+"""
+import copy
+from typing import Any, Dict, List
+
+
+def _escape(token: str) -> str:
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def _diff(src: Any, dst: Any, path: str, ops: List[Dict[str, Any]]):
+    if type(src) is not type(dst):
+        ops.append({"op": "replace", "path": path, "value": dst})
+        return
+
+    if isinstance(src, dict):
+        for key in src:
+            if key not in dst:
+                ops.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+        for key, value in dst.items():
+            child = f"{path}/{_escape(key)}"
+            if key not in src:
+                ops.append({"op": "add", "path": child, "value": value})
+            else:
+                _diff(src[key], value, child, ops)
+        return
+
+    if isinstance(src, list):
+        if len(src) != len(dst):
+            ops.append({"op": "replace", "path": path, "value": dst})
+            return
+        for index, (a, b) in enumerate(zip(src, dst)):
+            _diff(a, b, f"{path}/{index}", ops)
+        return
+
+    if src != dst:
+        ops.append({"op": "replace", "path": path, "value": dst})
+
+
+def make_patch(src: Any, dst: Any) -> List[Dict[str, Any]]:
+    ops: List[Dict[str, Any]] = []
+    _diff(src, dst, "", ops)
+    return ops
+
+
+def _resolve_parent(doc: Any, path: str):
+    tokens = [_unescape(t) for t in path.split("/")[1:]]
+    parent = doc
+    for token in tokens[:-1]:
+        parent = parent[int(token)] if isinstance(parent, list) else parent[token]
+    return parent, tokens[-1]
+
+
+def apply_patch(doc: Any, ops: List[Dict[str, Any]], in_place: bool = False) -> Any:
+    if not in_place:
+        doc = copy.deepcopy(doc)
+    for op in ops:
+        path = op["path"]
+        if path == "":
+            if op["op"] == "remove":
+                doc = None
+            else:
+                doc = copy.deepcopy(op["value"])
+            continue
+
+        parent, key = _resolve_parent(doc, path)
+        if isinstance(parent, list):
+            if op["op"] == "add":
+                index = len(parent) if key == "-" else int(key)
+                parent.insert(index, copy.deepcopy(op["value"]))
+            elif op["op"] == "remove":
+                del parent[int(key)]
+            elif op["op"] == "replace":
+                parent[int(key)] = copy.deepcopy(op["value"])
+            else:
+                raise ValueError(f"Unsupported JSON-patch op: {op['op']}")
+        else:
+            if op["op"] in ("add", "replace"):
+                parent[key] = copy.deepcopy(op["value"])
+            elif op["op"] == "remove":
+                del parent[key]
+            else:
+                raise ValueError(f"Unsupported JSON-patch op: {op['op']}")
+    return doc
@@ -8,7 +8,11 @@ from .chat import router as chat_router
 from .infrastructure import router as infrastructure_router
 from .config import ALLOWED_ORIGINS
 from .database import engine, Base
+from .migrations import run_migrations
 from .notification_routes import router as notification_router
+from .webhooks import router as webhooks_router, webhook_consumer
+from .admin_routes import router as admin_router
+from .fair_scheduler import run_dispatcher
 from .metrics import MetricsMiddleware, metrics_handler, update_system_metrics
 from dotenv import load_dotenv
 
@@ -52,16 +56,18 @@ app.include_router(auth_router)
 app.include_router(chat_router)
 app.include_router(infrastructure_router)
 app.include_router(notification_router)
+app.include_router(webhooks_router)
+app.include_router(admin_router)
 
 try:
-    from .notify_handler import start_listener_in_thread
+    from .notify_handler import deployment_event_consumer, live_event_listener
     has_notify = True
 except Exception:
     has_notify = False
-    logger.info("notify_handler not available; websocket notify listener will not start automatically.")
+    logger.info("notify_handler not available; deployment event consumer will not start automatically.")
 
 try:
-    from .tasks import celery_app, health_check
+    from .tasks import celery_app, health_check, dispatch_pending_requests
     has_celery = True
 except Exception:
     celery_app = None
@@ -69,6 +75,9 @@ except Exception:
     has_celery = False
     logger.info("Celery tasks not found; celery-health endpoint will report not configured.")
 
+# Long-running consumers started on startup, cancelled on shutdown
+_background_tasks = []
+
 @app.on_event("startup")
 async def startup():
     try:
@@ -78,23 +87,42 @@ async def startup():
     except Exception as e:
         logger.exception(f"Failed to create DB tables on startup: {e}")
 
-    # Start the notify listener thread if available
+    try:
+        await run_migrations()
+    except Exception as e:
+        logger.exception(f"Failed to migrate DB schema on startup: {e}")
+
+    # Apply deployment events from the workers (Redis stream, shared between API processes) on
+    # this loop, and push live events to the websockets this process holds
     if has_notify:
-        try:
-            start_listener_in_thread()
-            logger.info("Started notify listener thread (Redis pubsub -> websocket).")
-        except Exception as e:
-            logger.exception(f"Failed to start notify listener: {e}")
+        _background_tasks.append(asyncio.create_task(deployment_event_consumer()))
+        _background_tasks.append(asyncio.create_task(live_event_listener()))
+        logger.info("Started deployment event consumer and live event listener.")
+
+    # Apply queued GitHub webhook events in batches
+    _background_tasks.append(asyncio.create_task(webhook_consumer()))
+    logger.info("Started GitHub webhook consumer.")
 
     # Start system metrics collection
-    asyncio.create_task(update_system_metrics())
+    _background_tasks.append(asyncio.create_task(update_system_metrics()))
     logger.info("Started system metrics collection.")
 
     if has_celery:
         logger.info("Celery available (health_check task present).")
+        # Release queued requests into Celery, prod first and fair across departments
+        _background_tasks.append(asyncio.create_task(run_dispatcher(dispatch_pending_requests)))
+        logger.info("Started fair request dispatcher.")
     else:
         logger.info("Celery not configured or tasks module missing. Skipping Celery init.")
 
+@app.on_event("shutdown")
+async def shutdown():
+    for task in _background_tasks:
+        task.cancel()
+    await asyncio.gather(*_background_tasks, return_exceptions=True)
+    _background_tasks.clear()
+    logger.info("Background consumers stopped.")
+
 @app.get("/celery-health")
 async def celery_health():
     """Optional celery health endpoint"""
@@ -102,8 +130,9 @@ async def celery_health():
         return {"status": "unavailable", "detail": "Celery not configured on this instance."}
     
     try:
+        # Round trip through a worker and the result backend, waited for off the event loop
         async_result = health_check.delay()
-        res = async_result.get(timeout=5)
+        res = await asyncio.to_thread(async_result.get, timeout=5)
         return {"status": "healthy", "celery_workers": "running", "task_result": res}
     except Exception as e:
         logger.exception("Celery health check failed")
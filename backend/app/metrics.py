@@ -88,6 +88,115 @@ AUTHENTICATION_ATTEMPTS = Counter(
     registry=registry
 )
 
+PR_QUEUE_DEPTH = Gauge(
+    'pr_queue_depth',
+    'PR creations waiting for a repository slot',
+    ['environment'],
+    registry=registry
+)
+
+PR_QUEUE_WAIT = Histogram(
+    'pr_queue_wait_seconds',
+    'Time a PR creation waited for a repository slot',
+    ['environment'],
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800),
+    registry=registry
+)
+
+PR_SLOTS_IN_USE = Gauge(
+    'pr_slots_in_use',
+    'PR creations currently holding a repository slot',
+    registry=registry
+)
+
+PR_CREATION_ATTEMPTS = Counter(
+    'pr_creation_attempts_total',
+    'PR creation attempts by outcome',
+    ['environment', 'outcome'],
+    registry=registry
+)
+
+GITHUB_WEBHOOK_EVENTS = Counter(
+    'github_webhook_events_total',
+    'GitHub webhook deliveries by event and outcome',
+    ['event', 'outcome'],
+    registry=registry
+)
+
+PR_STATUS_LOOKUPS = Counter(
+    'pr_status_lookups_total',
+    'PR status lookups by source (cache, not_modified, rest, graphql)',
+    ['source'],
+    registry=registry
+)
+
+PIPELINE_STAGE_DURATION = Histogram(
+    'pipeline_stage_duration_seconds',
+    'Duration of each request pipeline stage (render, git, git_batch, notify)',
+    ['stage', 'outcome'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+    registry=registry
+)
+
+IDEMPOTENCY_OUTCOMES = Counter(
+    'idempotency_outcomes_total',
+    'Idempotency guard decisions per stage (acquired, completed, duplicate_done, duplicate_in_flight, released, reaped)',
+    ['stage', 'outcome'],
+    registry=registry
+)
+
+FAIR_QUEUE_DEPTH = Gauge(
+    'fair_queue_depth',
+    'Requests waiting for fair dispatch, per environment and department',
+    ['environment', 'department'],
+    registry=registry
+)
+
+FAIR_QUEUE_WAIT = Histogram(
+    'fair_queue_wait_seconds',
+    'Time a request waited for fair dispatch, per environment and department',
+    ['environment', 'department'],
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800),
+    registry=registry
+)
+
+PIPELINE_FAILURES = Counter(
+    'pipeline_failures_total',
+    'Pipeline stage failures by error class and what was done (retry, dead_letter)',
+    ['stage', 'error_class', 'action'],
+    registry=registry
+)
+
+DEAD_LETTER_DEPTH = Gauge(
+    'dead_letter_depth',
+    'Pipeline tasks waiting in the dead-letter queue',
+    registry=registry
+)
+
+CELERY_TASK_QUEUE_WAIT = Histogram(
+    'celery_task_queue_wait_seconds',
+    'Time a Celery task waited in its queue before a worker started it (after any countdown/eta)',
+    ['task_name', 'queue'],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300),
+    registry=registry
+)
+
+CELERY_TASK_RUNTIME = Histogram(
+    'celery_task_runtime_seconds',
+    'Celery task run time by final state (success, failure, retry)',
+    ['task_name', 'outcome'],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+    registry=registry
+)
+
+WORKER_STARTUP_SECONDS = Histogram(
+    'worker_startup_seconds',
+    'Celery worker process warm start, per step (loop, managers, database, git_mirror) and in total',
+    ['step'],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+    registry=registry
+)
+
 class MetricsMiddleware:
     def __init__(self, app):
         self.app = app
@@ -189,6 +298,21 @@ def track_celery_task(task_name: str, status: str):
 
 async def metrics_handler() -> Response:
     """Endpoint to expose metrics"""
+    try:
+        from .pr_scheduler import refresh_queue_metrics
+        await refresh_queue_metrics()
+    except Exception as e:
+        logger.debug(f"Could not refresh PR queue metrics: {e}")
+    try:
+        from .dead_letters import refresh_dead_letter_metrics
+        await asyncio.to_thread(refresh_dead_letter_metrics)
+    except Exception as e:
+        logger.debug(f"Could not refresh dead-letter metrics: {e}")
+    try:
+        from .fair_scheduler import refresh_fair_queue_metrics
+        await asyncio.to_thread(refresh_fair_queue_metrics)
+    except Exception as e:
+        logger.debug(f"Could not refresh fair queue metrics: {e}")
     try:
         data = generate_latest(registry)
         return PlainTextResponse(data, media_type=CONTENT_TYPE_LATEST)
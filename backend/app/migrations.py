@@ -0,0 +1,106 @@
+# backend/app/migrations.py
+"""
+In-place schema upgrades for databases created before a model change.
+
+Tables are created with Base.metadata.create_all, which adds missing tables but never
+alters an existing one, so column changes on existing tables are applied here. Every step
+reads the live schema first and is safe to run again; run_migrations() is called at API
+startup right after create_all, under an advisory lock so API processes starting
+together do not race.
+"""
+import logging
+
+from sqlalchemy import String, column, inspect, select, text, update
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from .database import engine, AsyncSessionLocal
+from .models import TerraformState
+from .state_history import record_state_version
+from .state_storage import store_state_blob
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# pg_advisory_lock key held while migrating
+_LOCK_KEY = 4207311
+_BACKFILL_BATCH = 50
+
+# Dropped from the model; only read while moving old rows into blobs
+_state_file = column("terraform_state_file", String)
+
+
+async def _columns(conn: AsyncConnection, table: str) -> set:
+    return await conn.run_sync(lambda sync_conn: {c["name"] for c in inspect(sync_conn).get_columns(table)})
+
+
+async def _add_state_blob_id(conn: AsyncConnection):
+    """terraform_states.terraform_state_file (inline text) -> state_blob_id (terraform_state_blobs)."""
+    columns = await _columns(conn, "terraform_states")
+    if "state_blob_id" not in columns:
+        await conn.execute(text(
+            "ALTER TABLE terraform_states ADD COLUMN state_blob_id UUID REFERENCES terraform_state_blobs(id)"
+        ))
+        logger.info("Added terraform_states.state_blob_id")
+    if "terraform_state_file" in columns and conn.dialect.name == "postgresql":
+        # New rows no longer write it; it is dropped once every row has been moved to a blob
+        await conn.execute(text("ALTER TABLE terraform_states ALTER COLUMN terraform_state_file DROP NOT NULL"))
+
+
+async def _add_plan_summary(conn: AsyncConnection):
+    if "plan_summary" not in await _columns(conn, "infrastructure_requests"):
+        await conn.execute(text("ALTER TABLE infrastructure_requests ADD COLUMN plan_summary JSON"))
+        logger.info("Added infrastructure_requests.plan_summary")
+
+
+async def _backfill_state_blobs():
+    """Move inline state documents into blobs (with a first history snapshot), then drop the old column."""
+    async with engine.connect() as conn:
+        if "terraform_state_file" not in await _columns(conn, "terraform_states"):
+            return
+
+    moved = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                select(TerraformState.id, TerraformState.request_identifier, _state_file)
+                .where(TerraformState.state_blob_id.is_(None), _state_file.is_not(None))
+                .limit(_BACKFILL_BATCH)
+            )).all()
+            if not rows:
+                break
+            for state_id, request_identifier, state_file in rows:
+                blob = await store_state_blob(db, state_file.encode("utf-8"))
+                await db.execute(
+                    update(TerraformState).where(TerraformState.id == state_id).values(state_blob_id=blob.id)
+                )
+                await record_state_version(db, request_identifier, None, blob)
+            await db.commit()
+            moved += len(rows)
+    if moved:
+        logger.info("Moved %d Terraform states into state blobs", moved)
+
+    async with engine.begin() as conn:
+        await conn.execute(text("ALTER TABLE terraform_states DROP COLUMN terraform_state_file"))
+    logger.info("Dropped terraform_states.terraform_state_file")
+
+
+_SCHEMA_STEPS = [_add_state_blob_id, _add_plan_summary]
+_DATA_STEPS = [_backfill_state_blobs]
+
+
+async def run_migrations():
+    async with engine.connect() as lock_conn:
+        postgres = lock_conn.dialect.name == "postgresql"
+        if postgres:
+            await lock_conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": _LOCK_KEY})
+            await lock_conn.commit()
+        try:
+            async with engine.begin() as conn:
+                for step in _SCHEMA_STEPS:
+                    await step(conn)
+            for step in _DATA_STEPS:
+                await step()
+        finally:
+            if postgres:
+                await lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _LOCK_KEY})
+                await lock_conn.commit()
@@ -1,7 +1,7 @@
 
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, JSON
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, DateTime, Text, ForeignKey, JSON, LargeBinary, UniqueConstraint, Index
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime
 import uuid
 from .database import Base
@@ -51,6 +51,7 @@ class InfrastructureRequest(Base):
     request_parameters = Column(JSON, nullable=False)
     status = Column(String(30), default="pending")
     pr_number = Column(Integer)
+    plan_summary = Column(JSON, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     deployed_at = Column(DateTime)
     
@@ -67,7 +68,7 @@ class TerraformState(Base):
     request_identifier = Column(String(100), nullable=False)
     cloud_provider = Column(String(20), nullable=False)
     environment = Column(String(20), nullable=False)
-    terraform_state_file = Column(Text, nullable=False)
+    state_blob_id = Column(UUID(as_uuid=True), ForeignKey("terraform_state_blobs.id"), nullable=True)
     resource_ids = Column(JSON)
     status = Column(String(20), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -75,6 +76,64 @@ class TerraformState(Base):
     
     request = relationship("InfrastructureRequest", back_populates="terraform_state")
 
+class TerraformStateBlob(Base):
+    """Compressed Terraform state, deduplicated by the hash of the raw JSON."""
+    __tablename__ = "terraform_state_blobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    content_hash = Column(String(64), unique=True, nullable=False)
+    encoding = Column(String(10), nullable=False)
+    raw_size = Column(BigInteger, nullable=False, default=0)
+    stored_size = Column(BigInteger, nullable=False, default=0)
+    chunk_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class TerraformStateChunk(Base):
+    __tablename__ = "terraform_state_chunks"
+
+    blob_id = Column(UUID(as_uuid=True), ForeignKey("terraform_state_blobs.id", ondelete="CASCADE"), primary_key=True)
+    seq = Column(Integer, primary_key=True)
+    data = deferred(Column(LargeBinary, nullable=False))
+
+class TerraformStateVersion(Base):
+    """One entry of a request's state history: a full snapshot blob or a JSON-patch against the previous version."""
+    __tablename__ = "terraform_state_versions"
+    __table_args__ = (UniqueConstraint("request_identifier", "version", name="uq_state_version"),)
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    request_identifier = Column(String(100), nullable=False, index=True)
+    version = Column(Integer, nullable=False)
+    kind = Column(String(10), nullable=False)
+    snapshot_version = Column(Integer, nullable=False)
+    blob_id = Column(UUID(as_uuid=True), ForeignKey("terraform_state_blobs.id"), nullable=True)
+    patch = Column(JSON, nullable=True)
+    content_hash = Column(String(64), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ManagedResource(Base):
+    """Every managed resource found in a request's Terraform state, indexed by provider ID."""
+    __tablename__ = "managed_resources"
+    __table_args__ = (
+        UniqueConstraint("request_identifier", "address", name="uq_managed_resource_address"),
+        Index("ix_managed_resources_type_provider_id", "resource_type", "provider_id"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    request_id = Column(UUID(as_uuid=True), ForeignKey("infrastructure_requests.id"), nullable=False)
+    request_identifier = Column(String(100), nullable=False, index=True)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
+    department = Column(String(100), index=True)
+    cloud_provider = Column(String(20), nullable=False)
+    environment = Column(String(20), nullable=False)
+    region = Column(String(30), index=True)
+    resource_type = Column(String(100), nullable=False)
+    address = Column(String(500), nullable=False)
+    provider_id = Column(String(255), index=True)
+    arn = Column(String(512))
+    status = Column(String(20), nullable=False, default="active")
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 class UserNotification(Base):
     __tablename__ = "user_notifications"
     
@@ -0,0 +1,207 @@
+# backend/app/notify_handler.py
+"""
+Consumer for deployment events (events.py) appended by Celery workers to the
+deployment_events stream.
+
+Runs as a task on the API's event loop, the one the websocket connections belong to, and
+reads through the "notify" consumer group: each API process is one consumer, so events
+are shared out between processes and each is handled once. An entry is acknowledged
+after it has been applied; one that failed, or whose consumer died, stays pending and is
+claimed again (XAUTOCLAIM) once idle for DEPLOYMENT_EVENTS_CLAIM_IDLE_MS, until it has
+been delivered DEPLOYMENT_EVENTS_MAX_DELIVERIES times.
+
+A batch is applied together: user emails missing from the events are looked up in one
+query, events for the same request are applied in order and different requests
+concurrently. Applying records what must happen once (request status, notifications for
+offline users); the websocket messages go out after the acknowledgement through the live
+channel (push_live), which every API process listens to (live_event_listener) because any
+of them may hold the user's websocket.
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import redis.asyncio as aioredis
+from redis.exceptions import ResponseError
+
+from .config import (
+    REDIS_URL,
+    NOTIFY_BATCH_SIZE,
+    DEPLOYMENT_EVENTS_CLAIM_IDLE_MS,
+    DEPLOYMENT_EVENTS_MAX_DELIVERIES,
+)
+from .db_helpers import get_user_emails_by_requests
+from .events import CONSUMER_GROUP, LIVE_CHANNEL, STREAM_KEY, DeploymentEvent, entry_event, parse_event
+from .infrastructure import apply_deployment_event, push_deployment_event
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Seconds between sweeps for entries left unacknowledged
+_RECLAIM_INTERVAL = 30
+# Consumers of past API processes with nothing pending are removed after this long
+_STALE_CONSUMER_MS = 24 * 3600 * 1000
+
+_redis: Optional[aioredis.Redis] = None
+
+
+def _get_redis() -> aioredis.Redis:
+    global _redis
+    if _redis is None:
+        _redis = aioredis.from_url(REDIS_URL)
+    return _redis
+
+
+def consumer_name() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+async def ensure_group(client: aioredis.Redis):
+    """Create the stream and the consumer group if needed; a new group starts at the stream's end."""
+    try:
+        await client.xgroup_create(STREAM_KEY, CONSUMER_GROUP, id="$", mkstream=True)
+        logger.info("Created consumer group %s on %s", CONSUMER_GROUP, STREAM_KEY)
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+async def push_live(event: DeploymentEvent):
+    """Hand the event to every API process's websocket push, this one's included. Never raises."""
+    try:
+        if REDIS_URL:
+            await _get_redis().publish(LIVE_CHANNEL, event.model_dump_json())
+        else:
+            await push_deployment_event(event)
+    except Exception as e:
+        logger.warning(f"Could not push {event.type.value} for {event.request_identifier} live: {e}")
+
+
+async def live_event_listener():
+    """Push live deployment events to the websockets this process holds, until cancelled."""
+    client = _get_redis()
+    while True:
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(LIVE_CHANNEL)
+            logger.info("Live event listener subscribed to %s", LIVE_CHANNEL)
+            async for message in pubsub.listen():
+                event = parse_event(message["data"])
+                if event is not None:
+                    await push_deployment_event(event)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception("Live event listener error: %s", e)
+            await asyncio.sleep(1)
+        finally:
+            await pubsub.aclose()
+
+
+async def _apply_in_order(entries: List[Tuple[Any, DeploymentEvent]]) -> List[Any]:
+    applied = []
+    for entry_id, event in entries:
+        try:
+            await apply_deployment_event(event)
+            applied.append(entry_id)
+        except Exception as e:
+            logger.error(f"Failed to apply {event.type.value} for {event.request_identifier}, will retry: {e}")
+    return applied
+
+
+async def process_event_batch(entries: List[Tuple[Any, DeploymentEvent]]) -> List[Any]:
+    """Apply a batch of (entry id, event); returns the ids of the entries that were applied."""
+    missing = {event.request_identifier for _, event in entries if not event.user_email}
+    if missing:
+        emails = await get_user_emails_by_requests(missing)
+        for _, event in entries:
+            if not event.user_email:
+                event.user_email = emails.get(event.request_identifier)
+
+    by_request: Dict[str, List[Tuple[Any, DeploymentEvent]]] = defaultdict(list)
+    for entry_id, event in entries:
+        by_request[event.request_identifier].append((entry_id, event))
+    results = await asyncio.gather(*(_apply_in_order(request_entries) for request_entries in by_request.values()))
+    return [entry_id for applied in results for entry_id in applied]
+
+
+async def handle_entries(client: aioredis.Redis, entries: List[Tuple[Any, Optional[Dict]]]) -> int:
+    """Apply stream entries and acknowledge those applied or unreadable; returns how many were acknowledged."""
+    done, events = [], []
+    for entry_id, fields in entries:
+        event = entry_event(fields or {})
+        if event is None:
+            logger.warning("Dropping unreadable deployment event %s", entry_id)
+            done.append(entry_id)
+        else:
+            events.append((entry_id, event))
+    applied = set(await process_event_batch(events)) if events else set()
+    done += applied
+    if done:
+        await client.xack(STREAM_KEY, CONSUMER_GROUP, *done)
+    # Live only: a push lost here is not worth applying the event again
+    for entry_id, event in events:
+        if entry_id in applied:
+            await push_live(event)
+    return len(done)
+
+
+async def reclaim_pending(client: aioredis.Redis, consumer: str, batch_size: int = NOTIFY_BATCH_SIZE) -> int:
+    """Take over entries left unacknowledged past the idle time and apply them again."""
+    handled, start_id = 0, "0-0"
+    while True:
+        start_id, claimed, *_ = await client.xautoclaim(
+            STREAM_KEY, CONSUMER_GROUP, consumer, DEPLOYMENT_EVENTS_CLAIM_IDLE_MS,
+            start_id=start_id, count=batch_size,
+        )
+        if claimed:
+            pending = await client.xpending_range(
+                STREAM_KEY, CONSUMER_GROUP, min=claimed[0][0], max=claimed[-1][0],
+                count=len(claimed), consumername=consumer,
+            )
+            exhausted = {p["message_id"] for p in pending if p["times_delivered"] > DEPLOYMENT_EVENTS_MAX_DELIVERIES}
+            if exhausted:
+                logger.error("Giving up on deployment events after %d deliveries: %s",
+                             DEPLOYMENT_EVENTS_MAX_DELIVERIES, sorted(exhausted))
+                await client.xack(STREAM_KEY, CONSUMER_GROUP, *exhausted)
+            handled += await handle_entries(client, [entry for entry in claimed if entry[0] not in exhausted])
+        if start_id in (b"0-0", "0-0"):
+            return handled
+
+
+async def _drop_stale_consumers(client: aioredis.Redis, consumer: str):
+    for info in await client.xinfo_consumers(STREAM_KEY, CONSUMER_GROUP):
+        name = info["name"].decode() if isinstance(info["name"], bytes) else info["name"]
+        if name != consumer and not info["pending"] and info["idle"] > _STALE_CONSUMER_MS:
+            await client.xgroup_delconsumer(STREAM_KEY, CONSUMER_GROUP, name)
+
+
+async def deployment_event_consumer(batch_size: int = NOTIFY_BATCH_SIZE, consumer: Optional[str] = None):
+    """Apply deployment events as they arrive until cancelled."""
+    consumer = consumer or consumer_name()
+    client = _get_redis()
+    next_sweep = 0.0
+    while True:
+        try:
+            await ensure_group(client)
+            logger.info("Deployment event consumer %s reading %s", consumer, STREAM_KEY)
+            while True:
+                if time.monotonic() >= next_sweep:
+                    next_sweep = time.monotonic() + _RECLAIM_INTERVAL
+                    if await reclaim_pending(client, consumer, batch_size):
+                        logger.info("Reclaimed unacknowledged deployment events")
+                    await _drop_stale_consumers(client, consumer)
+                response = await client.xreadgroup(
+                    CONSUMER_GROUP, consumer, {STREAM_KEY: ">"}, count=batch_size, block=5000,
+                )
+                for _, entries in response or []:
+                    await handle_entries(client, entries)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception("Deployment event consumer error: %s", e)
+            await asyncio.sleep(1)
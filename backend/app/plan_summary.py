@@ -0,0 +1,117 @@
+# backend/app/plan_summary.py
+import logging
+from datetime import datetime
+from typing import Any, Dict, List
+
+import ijson
+
+from .config import PLAN_SUMMARY_MAX_RESOURCES
+
+logger = logging.getLogger(__name__)
+
+
+class PlanParseError(ValueError):
+    pass
+
+
+def _action(actions: List[str]) -> str:
+    if "create" in actions and "delete" in actions:
+        return "replace"
+    if not actions:
+        return "no-op"
+    return actions[0]
+
+
+def _changed_attributes(change: Dict[str, Any]) -> List[str]:
+    before = change.get("before") or {}
+    after = change.get("after") or {}
+    unknown = change.get("after_unknown") or {}
+    if not isinstance(before, dict) or not isinstance(after, dict):
+        return []
+    if not isinstance(unknown, dict):
+        unknown = {}
+    keys = set(before) | set(after) | set(unknown)
+    return sorted(k for k in keys if unknown.get(k) or before.get(k) != after.get(k))
+
+
+def summarize_resource_change(resource_change: Dict[str, Any]) -> Dict[str, Any]:
+    change = resource_change.get("change") or {}
+    action = _action(change.get("actions") or [])
+    entry = {
+        "address": resource_change.get("address"),
+        "type": resource_change.get("type"),
+        "action": action,
+    }
+    if action in ("update", "replace"):
+        entry["changed_attributes"] = _changed_attributes(change)
+    if change.get("replace_paths"):
+        entry["replace_reasons"] = sorted({str(p[0]) for p in change["replace_paths"] if p})
+    return entry
+
+
+class PlanSummaryParser:
+    """
+    Reduce `terraform show -json` output to per-resource actions while reading it
+    incrementally. Only one resource_changes item is materialised at a time;
+    values are dropped and only attribute names are kept.
+    """
+
+    def __init__(self, max_resources: int = PLAN_SUMMARY_MAX_RESOURCES):
+        self.max_resources = max_resources
+        self.counts: Dict[str, int] = {"create": 0, "update": 0, "delete": 0, "replace": 0}
+        self.resources: List[Dict[str, Any]] = []
+        self.truncated = False
+        self._items = ijson.sendable_list()
+        self._coro = ijson.items_coro(self._items, "resource_changes.item")
+
+    def feed(self, data: bytes):
+        try:
+            self._coro.send(data)
+        except ijson.JSONError as e:
+            raise PlanParseError(str(e)) from e
+        self._drain()
+
+    def close(self):
+        try:
+            self._coro.close()
+        except ijson.JSONError as e:
+            raise PlanParseError(str(e)) from e
+        self._drain()
+
+    def _drain(self):
+        for item in self._items:
+            entry = summarize_resource_change(item)
+            if entry["action"] not in self.counts:
+                continue
+            self.counts[entry["action"]] += 1
+            if len(self.resources) < self.max_resources:
+                self.resources.append(entry)
+            else:
+                self.truncated = True
+        del self._items[:]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "counts": self.counts,
+            "resources": self.resources,
+            "truncated": self.truncated,
+            "generated_at": datetime.utcnow().isoformat(),
+        }
+
+
+def format_plan_message(request_identifier: str, summary: Dict[str, Any]) -> str:
+    counts = summary["counts"]
+    short_id = request_identifier.split('_')[-1]
+    lines = [
+        f"Plan for request {short_id}: "
+        f"{counts['create']} to add, {counts['update']} to change, "
+        f"{counts['replace']} to replace, {counts['delete']} to destroy."
+    ]
+    for entry in summary["resources"][:10]:
+        line = f"  {entry['action']}: {entry['address']}"
+        if entry.get("changed_attributes"):
+            line += f" ({', '.join(entry['changed_attributes'][:5])})"
+        lines.append(line)
+    if len(summary["resources"]) > 10 or summary["truncated"]:
+        lines.append("  ...")
+    return "\n".join(lines)
@@ -0,0 +1,258 @@
+# backend/app/pr_scheduler.py
+import asyncio
+import logging
+import random
+import time
+import uuid
+import weakref
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+import redis.asyncio as aioredis
+
+from .config import (
+    REDIS_URL,
+    GITHUB_REPO_OWNER,
+    GITHUB_REPO_NAME,
+    PR_MAX_CONCURRENCY_PER_REPO,
+    PR_SLOT_LEASE_SECONDS,
+    PR_MAX_ATTEMPTS,
+    PR_BACKOFF_MAX_SECONDS,
+)
+from .github_api import GitHubAPIError, GitHubRateLimitError
+from .metrics import PR_QUEUE_DEPTH, PR_QUEUE_WAIT, PR_SLOTS_IN_USE, PR_CREATION_ATTEMPTS
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+T = TypeVar("T")
+
+# Lower value is served first; unknown environments queue behind dev
+ENVIRONMENT_PRIORITY = {"prod": 0, "qa": 1, "dev": 2}
+_DEFAULT_PRIORITY = 3
+_PRIORITY_STRIDE = 10 ** 13  # larger than any millisecond timestamp, so priority dominates arrival order
+
+_POLL_INTERVAL = 0.5
+_WAITER_STALE_SECONDS = 30
+
+# KEYS: slots zset (token -> lease expiry), waiting zset (token -> priority/arrival), seen zset (token -> last poll), pause key
+# ARGV: now, token, limit, lease expiry, stale-before, waiting score
+_ACQUIRE_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+local stale = redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', ARGV[5])
+for _, member in ipairs(stale) do
+    redis.call('ZREM', KEYS[2], member)
+    redis.call('ZREM', KEYS[3], member)
+end
+redis.call('ZADD', KEYS[2], 'NX', ARGV[6], ARGV[2])
+redis.call('ZADD', KEYS[3], ARGV[1], ARGV[2])
+if redis.call('EXISTS', KEYS[4]) == 1 then
+    return 0
+end
+local free = tonumber(ARGV[3]) - redis.call('ZCARD', KEYS[1])
+if free <= 0 then
+    return 0
+end
+local rank = redis.call('ZRANK', KEYS[2], ARGV[2])
+if not rank or rank >= free then
+    return 0
+end
+redis.call('ZADD', KEYS[1], ARGV[4], ARGV[2])
+redis.call('ZREM', KEYS[2], ARGV[2])
+redis.call('ZREM', KEYS[3], ARGV[2])
+return 1
+"""
+
+# One client per event loop: the API's and each worker process's (see worker_runtime)
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aioredis.Redis]" = weakref.WeakKeyDictionary()
+
+
+def _get_redis() -> Optional[aioredis.Redis]:
+    if not REDIS_URL:
+        return None
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = aioredis.from_url(REDIS_URL)
+        _clients[loop] = client
+    return client
+
+
+class RetryablePRError(Exception):
+    def __init__(self, message: str, delay: Optional[float] = None):
+        super().__init__(message)
+        self.delay = delay
+
+
+def _priority(environment: Optional[str]) -> int:
+    return ENVIRONMENT_PRIORITY.get((environment or "").lower(), _DEFAULT_PRIORITY)
+
+
+def _waiting_score(environment: Optional[str]) -> int:
+    return _priority(environment) * _PRIORITY_STRIDE + int(time.time() * 1000)
+
+
+def _backoff(attempt: int) -> float:
+    return min(PR_BACKOFF_MAX_SECONDS, 5 * (2 ** attempt)) + random.uniform(0, 1)
+
+
+def classify_error(exc: Exception, attempt: int) -> Optional[float]:
+    """Seconds to wait before retrying `exc`, or None if retrying will not help."""
+    if isinstance(exc, GitHubRateLimitError):
+        return max(exc.retry_after, _backoff(attempt))
+    if isinstance(exc, GitHubAPIError):
+        return _backoff(attempt) if exc.status_code >= 500 or exc.status_code == 0 else None
+    if isinstance(exc, RetryablePRError):
+        return exc.delay if exc.delay is not None else _backoff(attempt)
+    message = str(exc).lower()
+    if "rate limit" in message or "abuse" in message:
+        # gh CLI does not surface the headers; GitHub asks for at least a minute on secondary limits
+        return max(60.0 * (2 ** attempt), _backoff(attempt))
+    if any(marker in message for marker in ("failed to push", "failed to clone", "failed to fetch", "timed out", "could not resolve host")):
+        return _backoff(attempt)
+    return None
+
+
+class PRScheduler:
+    """
+    Cross-process gate in front of PR creation for one repository. Waiters are ordered by
+    environment priority then arrival; at most `limit` hold a slot at a time. Slots are
+    leases so a crashed worker frees its slot after PR_SLOT_LEASE_SECONDS, and a rate limit
+    seen by any worker pauses the whole repository until GitHub's reset time.
+    """
+
+    def __init__(
+        self,
+        repo: str,
+        limit: int = PR_MAX_CONCURRENCY_PER_REPO,
+        lease_seconds: int = PR_SLOT_LEASE_SECONDS,
+        max_attempts: int = PR_MAX_ATTEMPTS,
+        client: Optional[aioredis.Redis] = None,
+    ):
+        self.repo = repo
+        self.limit = limit
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._client = client
+        self._enabled = True
+        self._slots_key = f"pr_slots:{repo}"
+        self._waiting_key = f"pr_waiting:{repo}"
+        self._seen_key = f"pr_waiting_seen:{repo}"
+        self._pause_key = f"pr_pause:{repo}"
+
+    @property
+    def redis(self) -> Optional[aioredis.Redis]:
+        if not self._enabled:
+            return None
+        return self._client if self._client is not None else _get_redis()
+
+    @redis.setter
+    def redis(self, client: Optional[aioredis.Redis]):
+        # None turns the gate off so every caller is admitted at once (offline runs)
+        self._client, self._enabled = client, client is not None
+
+    async def _try_acquire(self, client: aioredis.Redis, token: str, score: int) -> bool:
+        now = time.time()
+        return bool(await client.register_script(_ACQUIRE_SCRIPT)(
+            keys=[self._slots_key, self._waiting_key, self._seen_key, self._pause_key],
+            args=[now, token, self.limit, now + self.lease_seconds, now - _WAITER_STALE_SECONDS, score],
+        ))
+
+    async def _release(self, client: aioredis.Redis, token: str):
+        pipe = client.pipeline()
+        pipe.zrem(self._slots_key, token)
+        pipe.zrem(self._waiting_key, token)
+        pipe.zrem(self._seen_key, token)
+        await pipe.execute()
+
+    async def _renew(self, client: aioredis.Redis, token: str):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            await client.zadd(self._slots_key, {token: time.time() + self.lease_seconds}, xx=True)
+
+    async def pause(self, seconds: float):
+        """Hold every waiter for this repository, e.g. until the rate limit resets."""
+        client = self.redis
+        if client is not None and seconds > 0:
+            await client.set(self._pause_key, "1", px=int(seconds * 1000))
+
+    @asynccontextmanager
+    async def slot(self, environment: Optional[str], score: Optional[int] = None):
+        """
+        Hold one of the repository's slots. `score` is the waiting position (priority, then
+        arrival); pass the first attempt's score on retries so they keep their place.
+        """
+        client = self.redis
+        if client is None:
+            yield
+            return
+
+        token = uuid.uuid4().hex
+        score = score if score is not None else _waiting_score(environment)
+        started = time.monotonic()
+        try:
+            while not await self._try_acquire(client, token, score):
+                await asyncio.sleep(_POLL_INTERVAL)
+        except BaseException:
+            await asyncio.shield(self._release(client, token))
+            raise
+
+        PR_QUEUE_WAIT.labels(environment=environment or "unknown").observe(time.monotonic() - started)
+        renewer = asyncio.create_task(self._renew(client, token))
+        try:
+            yield
+        finally:
+            renewer.cancel()
+            await asyncio.shield(self._release(client, token))
+
+    async def submit(self, environment: Optional[str], make_attempt: Callable[[int], Awaitable[T]],
+                     max_attempts: Optional[int] = None) -> T:
+        """
+        Run `make_attempt(attempt)` inside a slot, retrying transient failures with exponential
+        backoff. The slot is given up while backing off so other requests can proceed. Callers
+        that retry on their own (Celery tasks) pass max_attempts=1; a rate limit still pauses
+        the repository for everyone.
+        """
+        env_label = environment or "unknown"
+        max_attempts = max_attempts or self.max_attempts
+        score = _waiting_score(environment)
+        for attempt in range(max_attempts):
+            try:
+                async with self.slot(environment, score):
+                    result = await make_attempt(attempt)
+                PR_CREATION_ATTEMPTS.labels(environment=env_label, outcome="success").inc()
+                return result
+            except Exception as e:
+                delay = classify_error(e, attempt)
+                if delay is not None and (isinstance(e, GitHubRateLimitError) or "rate limit" in str(e).lower()):
+                    await self.pause(delay)
+                if delay is None or attempt + 1 >= max_attempts:
+                    PR_CREATION_ATTEMPTS.labels(environment=env_label, outcome="failed").inc()
+                    raise
+                PR_CREATION_ATTEMPTS.labels(environment=env_label, outcome="retry").inc()
+                logger.warning("PR attempt %d for %s failed (%s); retrying in %.1fs", attempt + 1, self.repo, e, delay)
+                await asyncio.sleep(delay)
+        raise RuntimeError("unreachable")
+
+    async def queue_depths(self) -> Dict[str, int]:
+        depths = {}
+        for environment, priority in ENVIRONMENT_PRIORITY.items():
+            low = priority * _PRIORITY_STRIDE
+            depths[environment] = await self.redis.zcount(self._waiting_key, low, low + _PRIORITY_STRIDE - 1)
+        return depths
+
+    async def slots_in_use(self) -> int:
+        return await self.redis.zcount(self._slots_key, time.time(), "+inf")
+
+
+def get_scheduler(owner: str = GITHUB_REPO_OWNER, repo: str = GITHUB_REPO_NAME) -> PRScheduler:
+    return PRScheduler(f"{owner}/{repo}")
+
+
+async def refresh_queue_metrics():
+    if not REDIS_URL:
+        return
+    scheduler = get_scheduler()
+    for environment, depth in (await scheduler.queue_depths()).items():
+        PR_QUEUE_DEPTH.labels(environment=environment).set(depth)
+    PR_SLOTS_IN_USE.set(await scheduler.slots_in_use())
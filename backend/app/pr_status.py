@@ -0,0 +1,153 @@
+# backend/app/pr_status.py
+import json
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import redis
+from sqlalchemy.future import select
+
+from .config import REDIS_URL, GITHUB_TOKEN, GITHUB_REPO_OWNER, GITHUB_REPO_NAME, PR_STATUS_CACHE_TTL, PR_STATUS_GRAPHQL_MIN
+from .database import AsyncSessionLocal
+from .github_api import GitHubAPIClient
+from .metrics import PR_STATUS_LOOKUPS
+from .models import InfrastructureRequest
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# One GraphQL query per this many PRs; well under the 500k node / 100 alias guidance
+GRAPHQL_CHUNK = 50
+RECONCILE_STATUSES = ("pending_approval", "checks_failed")
+
+_redis_client = redis.from_url(REDIS_URL) if REDIS_URL else None
+
+
+def _summary(number: int, state: str, merged: bool) -> Dict[str, Any]:
+    return {"number": number, "state": state.lower(), "merged": bool(merged), "fetched_at": time.time()}
+
+
+class PRStatusCache:
+    """
+    PR state keyed by number. Fresh entries (younger than ttl) are served without a request;
+    stale ones are revalidated with their ETag when there are few, or refetched in one
+    aliased GraphQL query when there are many.
+    """
+
+    def __init__(self, client: GitHubAPIClient, ttl: int = PR_STATUS_CACHE_TTL, redis_client: Optional[redis.Redis] = None):
+        self.client = client
+        self.ttl = ttl
+        self.redis = redis_client if redis_client is not None else _redis_client
+        self._local: Dict[int, Dict[str, Any]] = {}
+        self._prefix = f"pr_status:{client.owner}/{client.repo}:"
+
+    def _load(self, number: int) -> Optional[Dict[str, Any]]:
+        if self.redis is None:
+            return self._local.get(number)
+        raw = self.redis.get(f"{self._prefix}{number}")
+        return json.loads(raw) if raw else None
+
+    def _store(self, entry: Dict[str, Any]):
+        if self.redis is None:
+            self._local[entry["number"]] = entry
+            return
+        # Kept well past the TTL so the ETag survives for revalidation
+        self.redis.set(f"{self._prefix}{entry['number']}", json.dumps(entry), ex=max(self.ttl * 20, 3600))
+
+    async def _fetch_rest(self, number: int, cached: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        headers = {"If-None-Match": cached["etag"]} if cached and cached.get("etag") else None
+        resp = await self.client.request("GET", f"{self.client.repo_path}/pulls/{number}", headers=headers)
+        if resp.status_code == 304 and cached:
+            # Conditional hits do not count against the REST rate limit
+            PR_STATUS_LOOKUPS.labels(source="not_modified").inc()
+            entry = {**cached, "fetched_at": time.time()}
+        else:
+            PR_STATUS_LOOKUPS.labels(source="rest").inc()
+            pr = resp.json()
+            entry = _summary(number, pr.get("state", "open"), pr.get("merged") or pr.get("merged_at"))
+            entry["etag"] = resp.headers.get("etag")
+        self._store(entry)
+        return entry
+
+    async def _fetch_graphql(self, numbers: List[int]) -> Dict[int, Dict[str, Any]]:
+        results: Dict[int, Dict[str, Any]] = {}
+        for start in range(0, len(numbers), GRAPHQL_CHUNK):
+            chunk = numbers[start:start + GRAPHQL_CHUNK]
+            fields = " ".join(f"pr{n}: pullRequest(number: {n}) {{ number state merged }}" for n in chunk)
+            query = f"query($owner: String!, $name: String!) {{ repository(owner: $owner, name: $name) {{ {fields} }} }}"
+            data = await self.client.graphql(query, {"owner": self.client.owner, "name": self.client.repo})
+            PR_STATUS_LOOKUPS.labels(source="graphql").inc()
+            repository = data.get("repository") or {}
+            for n in chunk:
+                pr = repository.get(f"pr{n}")
+                if not pr:
+                    continue
+                entry = _summary(n, pr["state"], pr["merged"])
+                previous = self._load(n)
+                if previous and previous.get("etag"):
+                    # An outdated ETag only costs a normal 200 later, so keep it for revalidation
+                    entry["etag"] = previous["etag"]
+                self._store(entry)
+                results[n] = entry
+        return results
+
+    async def get_many(self, numbers: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        results: Dict[int, Dict[str, Any]] = {}
+        stale: Dict[int, Optional[Dict[str, Any]]] = {}
+        now = time.time()
+        for number in sorted(set(numbers)):
+            cached = self._load(number)
+            if cached and now - cached.get("fetched_at", 0) < self.ttl:
+                PR_STATUS_LOOKUPS.labels(source="cache").inc()
+                results[number] = cached
+            else:
+                stale[number] = cached
+
+        if len(stale) >= PR_STATUS_GRAPHQL_MIN:
+            results.update(await self._fetch_graphql(list(stale)))
+        else:
+            for number, cached in stale.items():
+                try:
+                    results[number] = await self._fetch_rest(number, cached)
+                except Exception as e:
+                    logger.warning("Could not fetch status of PR #%s: %s", number, e)
+        return results
+
+
+def status_for_pr(entry: Dict[str, Any]) -> Optional[str]:
+    if entry.get("merged"):
+        return "deploying"
+    if entry.get("state") == "closed":
+        return "rejected"
+    return None
+
+
+async def reconcile_pending_requests(cache: Optional[PRStatusCache] = None) -> Dict[str, Any]:
+    """Catch up requests whose PR was merged or closed while webhook deliveries were missed."""
+    from .webhooks import apply_status
+
+    cache = cache or PRStatusCache(GitHubAPIClient(GITHUB_TOKEN, GITHUB_REPO_OWNER, GITHUB_REPO_NAME))
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(InfrastructureRequest.pr_number)
+            .where(
+                InfrastructureRequest.status.in_(RECONCILE_STATUSES),
+                InfrastructureRequest.pr_number.isnot(None),
+            )
+            .distinct()
+        )
+        numbers = [n for n in result.scalars().all() if n]
+        if not numbers:
+            return {"checked": 0, "updated": 0}
+
+        statuses = await cache.get_many(numbers)
+        updated = []
+        for number, entry in statuses.items():
+            target = status_for_pr(entry)
+            if target:
+                updated.extend(r.request_identifier for r in await apply_status(db, target, [number]))
+        await db.commit()
+
+    if updated:
+        logger.info("Reconciled %d requests from PR state: %s", len(updated), updated)
+    return {"checked": len(numbers), "updated": len(updated), "request_identifiers": updated}
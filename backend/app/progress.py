@@ -0,0 +1,98 @@
+# backend/app/progress.py
+"""
+Live progress of a request through the pipeline.
+
+Each step is stored as a custom Celery state on the pipeline's task id in the result
+backend (the pipeline's last task overwrites it with its own final state) and published
+live as a progress event, which every API process forwards to the requesting user's
+websocket if it holds it. Nobody is listening while the API is down; the stored state
+answers lookups then.
+
+    progress:{rid}    hash: pipeline_id, user_email (set when the request is dispatched)
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Iterable, Optional
+
+import redis
+from celery import current_app
+
+from .config import REDIS_URL, CELERY_RESULT_EXPIRES
+from .events import DeploymentEvent, EventType, publish_live
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+QUEUED = "QUEUED"
+RENDERING = "RENDERING"
+CLONING = "CLONING"
+PUSHING = "PUSHING"
+PR_OPEN = "PR_OPEN"
+
+PROGRESS_MESSAGES = {
+    QUEUED: "Waiting for a worker",
+    RENDERING: "Preparing Terraform variables",
+    CLONING: "Checking out the infrastructure repository",
+    PUSHING: "Pushing the change to GitHub",
+    PR_OPEN: "Pull request opened, waiting for DevOps approval",
+}
+
+_redis_client = redis.from_url(REDIS_URL) if REDIS_URL else None
+
+
+def _key(request_identifier: str) -> str:
+    return f"progress:{request_identifier}"
+
+
+def _text(value) -> Optional[str]:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def track(request_identifier: str, pipeline_id: str, user_email: Optional[str]):
+    """Remember which pipeline runs the request, so later steps and lookups can find it."""
+    if _redis_client is None:
+        return
+    pipe = _redis_client.pipeline(transaction=True)
+    pipe.hset(_key(request_identifier), mapping={"pipeline_id": pipeline_id, "user_email": user_email or ""})
+    pipe.expire(_key(request_identifier), CELERY_RESULT_EXPIRES)
+    pipe.execute()
+
+
+def pipeline_for(request_identifier: str) -> Dict[str, Optional[str]]:
+    if _redis_client is None:
+        return {}
+    pipeline_id, user_email = _redis_client.hmget(_key(request_identifier), "pipeline_id", "user_email")
+    return {"pipeline_id": _text(pipeline_id), "user_email": _text(user_email) or None}
+
+
+def report(request_identifier: str, state: str, **details: Any):
+    """Record that the request reached `state` and tell the user. Never fails the pipeline."""
+    if _redis_client is None:
+        return
+    try:
+        tracked = pipeline_for(request_identifier)
+        meta = {
+            "request_identifier": request_identifier,
+            "state": state,
+            "message": PROGRESS_MESSAGES.get(state, state),
+            "updated_at": time.time(),
+            **details,
+        }
+        if tracked.get("pipeline_id"):
+            current_app.backend.store_result(tracked["pipeline_id"], meta, state)
+        publish_live(_redis_client, DeploymentEvent(
+            type=EventType.PROGRESS,
+            request_identifier=request_identifier,
+            user_email=tracked.get("user_email"),
+            pr_number=details.get("pr_number"),
+            details=meta,
+        ))
+    except Exception as e:
+        logger.warning("Could not report %s for %s: %s", state, request_identifier, e)
+
+
+async def report_async(request_identifiers: Iterable[str], state: str, **details: Any):
+    """report() for each request, off the event loop."""
+    for request_identifier in request_identifiers:
+        await asyncio.to_thread(report, request_identifier, state, **details)
@@ -0,0 +1,169 @@
+# backend/app/replay_events.py
+"""
+Inspect and replay the deployment event stream (see events.py and notify_handler.py).
+
+    python -m app.replay_events info
+    python -m app.replay_events list --request eng_aws_dev_42 --since 2024-05-01T10:00
+    python -m app.replay_events pending
+    python -m app.replay_events replay --since 2024-05-01T10:00 --until 2024-05-01T11:30 --dry-run
+    python -m app.replay_events rewind --to 2024-05-01T10:00
+
+`replay` appends copies of the matching events to the stream, so the running API applies
+them again (and users get their notifications). `rewind` moves the consumer group back
+instead, so it re-reads everything after the given point. --since/--until/--to take a
+stream entry id, epoch seconds or an ISO timestamp (UTC unless it has an offset).
+"""
+import argparse
+import sys
+from datetime import datetime, timezone
+from typing import Iterator, Optional, Tuple
+
+import redis
+
+from .config import REDIS_URL
+from .events import CONSUMER_GROUP, STREAM_KEY, DeploymentEvent, entry_event, publish_event
+
+_PAGE = 500
+
+
+def to_stream_id(value: Optional[str], default: str) -> str:
+    if not value:
+        return default
+    if "-" in value and value.replace("-", "").isdigit():
+        return value
+    try:
+        seconds = float(value)
+    except ValueError:
+        moment = datetime.fromisoformat(value)
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        seconds = moment.timestamp()
+    return str(int(seconds * 1000))
+
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+def _entry_time(entry_id) -> str:
+    millis = int(_text(entry_id).split("-")[0])
+    return datetime.fromtimestamp(millis / 1000, tz=timezone.utc).isoformat(timespec="seconds")
+
+
+def iter_events(client: redis.Redis, since: str = "-", until: str = "+", request_identifier: Optional[str] = None,
+                event_type: Optional[str] = None) -> Iterator[Tuple[str, DeploymentEvent]]:
+    start = since
+    while True:
+        page = client.xrange(STREAM_KEY, min=start, max=until, count=_PAGE)
+        for entry_id, fields in page:
+            event = entry_event(fields)
+            if event is None:
+                continue
+            if request_identifier and event.request_identifier != request_identifier:
+                continue
+            if event_type and event.type.value != event_type:
+                continue
+            yield _text(entry_id), event
+        if len(page) < _PAGE:
+            return
+        start = "(" + _text(page[-1][0])
+
+
+def cmd_info(client: redis.Redis, args) -> int:
+    info = client.xinfo_stream(STREAM_KEY)
+    print(f"stream {STREAM_KEY}: {info['length']} entries, first {_text(info['first-entry'][0]) if info['first-entry'] else '-'}, "
+          f"last {_text(info['last-entry'][0]) if info['last-entry'] else '-'}")
+    for group in client.xinfo_groups(STREAM_KEY):
+        print(f"group {_text(group['name'])}: {group['pending']} pending, last delivered {_text(group['last-delivered-id'])}")
+        for consumer in client.xinfo_consumers(STREAM_KEY, group["name"]):
+            print(f"  consumer {_text(consumer['name'])}: {consumer['pending']} pending, idle {consumer['idle'] / 1000:.0f}s")
+    return 0
+
+
+def cmd_list(client: redis.Redis, args) -> int:
+    for count, (entry_id, event) in enumerate(iter_events(
+        client, to_stream_id(args.since, "-"), to_stream_id(args.until, "+"), args.request, args.type
+    )):
+        if count >= args.limit:
+            break
+        line = f"{entry_id}  {_entry_time(entry_id)}  {event.type.value:<18} {event.request_identifier}"
+        if event.pr_number:
+            line += f"  PR #{event.pr_number}"
+        if event.error:
+            line += f"  error: {event.error}"
+        if event.type.value == "progress":
+            line += f"  {event.details.get('state')}"
+        print(line)
+    return 0
+
+
+def cmd_pending(client: redis.Redis, args) -> int:
+    for entry in client.xpending_range(STREAM_KEY, CONSUMER_GROUP, min="-", max="+", count=args.limit):
+        print(f"{_text(entry['message_id'])}  {_text(entry['consumer'])}  idle {entry['time_since_delivered'] / 1000:.0f}s  "
+              f"delivered {entry['times_delivered']}x")
+    return 0
+
+
+def cmd_replay(client: redis.Redis, args) -> int:
+    if not (args.since or args.request):
+        print("replay needs --since or --request", file=sys.stderr)
+        return 2
+    replayed = 0
+    matches = list(iter_events(client, to_stream_id(args.since, "-"), to_stream_id(args.until, "+"), args.request, args.type))
+    for entry_id, event in matches:
+        if args.skip_progress and event.type.value == "progress":
+            continue
+        if args.dry_run:
+            print(f"would replay {entry_id} {event.type.value} {event.request_identifier}")
+        else:
+            copy = event.model_copy(update={"details": {**event.details, "replayed_from": entry_id}})
+            print(f"replayed {entry_id} as {publish_event(client, copy)} {event.type.value} {event.request_identifier}")
+        replayed += 1
+    print(f"{'would replay' if args.dry_run else 'replayed'} {replayed} of {len(matches)} matching events")
+    return 0
+
+
+def cmd_rewind(client: redis.Redis, args) -> int:
+    target = to_stream_id(args.to, "0")
+    if args.dry_run:
+        print(f"would move group {CONSUMER_GROUP} to {target}; {client.xinfo_stream(STREAM_KEY)['length']} entries in stream")
+        return 0
+    client.xgroup_setid(STREAM_KEY, CONSUMER_GROUP, target)
+    print(f"group {CONSUMER_GROUP} now re-reads entries after {target}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and replay deployment events")
+    parser.add_argument("--redis-url", default=REDIS_URL)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("info", help="stream length, consumer group and consumers")
+
+    for name, help_text in (("list", "print events"), ("replay", "append copies of events for the API to apply again")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("--since", help="entry id, epoch seconds or ISO timestamp")
+        p.add_argument("--until", help="entry id, epoch seconds or ISO timestamp")
+        p.add_argument("--request", help="only this request_identifier")
+        p.add_argument("--type", help="only this event type (pr_created, request_failed, deployed, ...)")
+        if name == "list":
+            p.add_argument("--limit", type=int, default=100)
+        else:
+            p.add_argument("--skip-progress", action="store_true", help="leave out progress events")
+            p.add_argument("--dry-run", action="store_true")
+
+    p = sub.add_parser("pending", help="entries delivered but not yet acknowledged")
+    p.add_argument("--limit", type=int, default=100)
+
+    p = sub.add_parser("rewind", help="move the consumer group back so it re-reads the stream")
+    p.add_argument("--to", required=True, help="entry id, epoch seconds or ISO timestamp")
+    p.add_argument("--dry-run", action="store_true")
+
+    args = parser.parse_args()
+    client = redis.from_url(args.redis_url)
+    commands = {"info": cmd_info, "list": cmd_list, "pending": cmd_pending, "replay": cmd_replay, "rewind": cmd_rewind}
+    sys.exit(commands[args.command](client, args))
+
+
+if __name__ == "__main__":
+    main()
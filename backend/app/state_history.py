@@ -0,0 +1,132 @@
+# backend/app/state_history.py
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from .config import STATE_SNAPSHOT_INTERVAL
+from .json_patch import make_patch, apply_patch
+from .models import TerraformStateBlob, TerraformStateVersion
+from .state_storage import load_state_bytes
+
+logger = logging.getLogger(__name__)
+
+
+async def _latest_version(db: AsyncSession, request_identifier: str) -> Optional[TerraformStateVersion]:
+    result = await db.execute(
+        select(TerraformStateVersion)
+        .where(TerraformStateVersion.request_identifier == request_identifier)
+        .order_by(TerraformStateVersion.version.desc())
+        .limit(1)
+    )
+    return result.scalar_one_or_none()
+
+
+async def record_state_version(
+    db: AsyncSession,
+    request_identifier: str,
+    state_doc: Optional[Any],
+    blob: TerraformStateBlob,
+) -> TerraformStateVersion:
+    """
+    Append a history entry for a newly stored state. Every STATE_SNAPSHOT_INTERVAL
+    versions (or when the document is not available in memory) the blob itself is
+    kept as a snapshot; otherwise only the JSON-patch against the previous version is stored.
+    """
+    latest = await _latest_version(db, request_identifier)
+    if latest and latest.content_hash == blob.content_hash:
+        return latest
+
+    version = latest.version + 1 if latest else 1
+    needs_snapshot = (
+        latest is None
+        or state_doc is None
+        or version - latest.snapshot_version >= STATE_SNAPSHOT_INTERVAL
+    )
+
+    if needs_snapshot:
+        entry = TerraformStateVersion(
+            request_identifier=request_identifier,
+            version=version,
+            kind="snapshot",
+            snapshot_version=version,
+            blob_id=blob.id,
+            content_hash=blob.content_hash,
+        )
+    else:
+        previous = await load_state_version(db, request_identifier, latest.version)
+        entry = TerraformStateVersion(
+            request_identifier=request_identifier,
+            version=version,
+            kind="delta",
+            snapshot_version=latest.snapshot_version,
+            patch=make_patch(previous, state_doc),
+            content_hash=blob.content_hash,
+        )
+
+    db.add(entry)
+    await db.flush()
+    logger.info("Recorded state version %s (%s) for %s", version, entry.kind, request_identifier)
+    return entry
+
+
+async def load_state_version(db: AsyncSession, request_identifier: str, version: int) -> Optional[Any]:
+    """Rebuild a version from its snapshot plus at most STATE_SNAPSHOT_INTERVAL - 1 patches."""
+    target = await db.execute(
+        select(TerraformStateVersion.snapshot_version).where(
+            TerraformStateVersion.request_identifier == request_identifier,
+            TerraformStateVersion.version == version,
+        )
+    )
+    snapshot_version = target.scalar_one_or_none()
+    if snapshot_version is None:
+        return None
+
+    result = await db.execute(
+        select(TerraformStateVersion)
+        .where(
+            TerraformStateVersion.request_identifier == request_identifier,
+            TerraformStateVersion.version >= snapshot_version,
+            TerraformStateVersion.version <= version,
+        )
+        .order_by(TerraformStateVersion.version)
+    )
+    entries = result.scalars().all()
+
+    snapshot = entries[0]
+    doc = json.loads(await load_state_bytes(db, snapshot.blob_id) or b"null")
+    for entry in entries[1:]:
+        doc = apply_patch(doc, entry.patch or [], in_place=True)
+    return doc
+
+
+async def list_state_versions(db: AsyncSession, request_identifier: str) -> List[Dict[str, Any]]:
+    result = await db.execute(
+        select(
+            TerraformStateVersion.version,
+            TerraformStateVersion.kind,
+            TerraformStateVersion.content_hash,
+            TerraformStateVersion.created_at,
+        )
+        .where(TerraformStateVersion.request_identifier == request_identifier)
+        .order_by(TerraformStateVersion.version)
+    )
+    return [
+        {
+            "version": version,
+            "kind": kind,
+            "content_hash": content_hash,
+            "created_at": created_at.isoformat() if created_at else None,
+        }
+        for version, kind, content_hash, created_at in result.all()
+    ]
+
+
+async def diff_state_versions(db: AsyncSession, request_identifier: str, from_version: int, to_version: int) -> Optional[List[Dict[str, Any]]]:
+    source = await load_state_version(db, request_identifier, from_version)
+    target = await load_state_version(db, request_identifier, to_version)
+    if source is None or target is None:
+        return None
+    return make_patch(source, target)
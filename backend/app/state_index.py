@@ -0,0 +1,224 @@
+# backend/app/state_index.py
+import json
+import logging
+from decimal import Decimal
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import ijson
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import InfrastructureRequest, ManagedResource, User
+
+logger = logging.getLogger(__name__)
+
+# Rows per INSERT: managed_resources binds 15 parameters a row, so 1000 rows stay well
+# under the 32767 bind-parameter limit of asyncpg/PostgreSQL
+UPSERT_BATCH_SIZE = 1000
+
+
+def _region_from_attributes(attributes: Dict[str, Any]) -> Optional[str]:
+    if attributes.get("region"):
+        return attributes["region"]
+    arn = attributes.get("arn") or ""
+    parts = arn.split(":")
+    if len(parts) > 3 and parts[3]:
+        return parts[3]
+    zone = attributes.get("availability_zone") or ""
+    if zone:
+        return zone[:-1]
+    return None
+
+
+def resource_record(resource: Dict[str, Any], instance: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce one state resource instance to the columns stored in managed_resources."""
+    attributes = instance.get("attributes") or {}
+    address = f"{resource.get('type')}.{resource.get('name')}"
+    if resource.get("module"):
+        address = f"{resource['module']}.{address}"
+    index_key = instance.get("index_key")
+    if index_key is not None:
+        address += f"[{json.dumps(index_key)}]"
+    # A create_before_destroy replacement leaves the old object in state next to the new one
+    # under the same address; Terraform tells them apart by the deposed key
+    if instance.get("deposed"):
+        address += f" (deposed object {instance['deposed']})"
+    return {
+        "resource_type": resource.get("type"),
+        "address": address,
+        "provider_id": attributes.get("id"),
+        "arn": attributes.get("arn"),
+        "region": _region_from_attributes(attributes),
+    }
+
+
+def extract_managed_resources(state_doc: Any) -> List[Dict[str, Any]]:
+    if not isinstance(state_doc, dict):
+        return []
+    records = []
+    for resource in state_doc.get("resources") or []:
+        if resource.get("mode") != "managed":
+            continue
+        for instance in resource.get("instances") or []:
+            records.append(resource_record(resource, instance))
+    return records
+
+
+class StateParseError(ValueError):
+    pass
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+
+class StateStreamParser:
+    """
+    Incremental counterpart of extract_managed_resources: fed raw state bytes in
+    arbitrary pieces, it keeps only the output values and per-resource attributes
+    the index needs, never the document itself.
+    """
+
+    OUTPUT_KEYS = ("instance_id", "public_ip", "console_url")
+    RESOURCE_KEYS = ("mode", "type", "name", "module")
+    ATTRIBUTE_KEYS = ("id", "arn", "region", "availability_zone")
+
+    def __init__(self):
+        self.outputs: Dict[str, Any] = {}
+        self.resources: List[Dict[str, Any]] = []
+        self._events = ijson.sendable_list()
+        self._coro = ijson.parse_coro(self._events)
+        self._resource: Optional[Dict[str, Any]] = None
+        self._instances: List[Dict[str, Any]] = []
+        self._instance: Optional[Dict[str, Any]] = None
+
+    def feed(self, data: bytes):
+        try:
+            self._coro.send(data)
+        except ijson.JSONError as e:
+            raise StateParseError(str(e)) from e
+        self._drain()
+
+    def close(self):
+        try:
+            self._coro.close()
+        except ijson.JSONError as e:
+            raise StateParseError(str(e)) from e
+        self._drain()
+
+    def resource_ids(self) -> Dict[str, Any]:
+        return {key: self.outputs.get(key) for key in self.OUTPUT_KEYS}
+
+    def _drain(self):
+        for prefix, event, value in self._events:
+            self._handle(prefix, event, _plain(value))
+        del self._events[:]
+
+    def _handle(self, prefix: str, event: str, value: Any):
+        if prefix.startswith("outputs."):
+            parts = prefix.split(".")
+            if len(parts) == 3 and parts[2] == "value" and parts[1] in self.OUTPUT_KEYS and event in ("string", "number", "boolean"):
+                self.outputs[parts[1]] = value
+            return
+
+        if not prefix.startswith("resources.item"):
+            return
+
+        if prefix == "resources.item":
+            if event == "start_map":
+                self._resource = {}
+                self._instances = []
+            elif event == "end_map" and self._resource is not None:
+                if self._resource.get("mode") == "managed":
+                    self.resources.extend(resource_record(self._resource, i) for i in self._instances)
+                self._resource = None
+            return
+
+        if self._resource is None:
+            return
+
+        rest = prefix[len("resources.item."):]
+        if rest in self.RESOURCE_KEYS and event == "string":
+            self._resource[rest] = value
+        elif rest == "instances.item":
+            if event == "start_map":
+                self._instance = {"attributes": {}}
+            elif event == "end_map" and self._instance is not None:
+                self._instances.append(self._instance)
+                self._instance = None
+        elif self._instance is not None:
+            if rest == "instances.item.index_key" and event in ("string", "number"):
+                self._instance["index_key"] = value
+            elif rest == "instances.item.deposed" and event == "string":
+                self._instance["deposed"] = value
+            elif rest.startswith("instances.item.attributes."):
+                key = rest[len("instances.item.attributes."):]
+                if key in self.ATTRIBUTE_KEYS and event == "string":
+                    self._instance["attributes"][key] = value
+
+
+async def upsert_managed_resources(
+    db: AsyncSession,
+    infra_request: InfrastructureRequest,
+    records: List[Dict[str, Any]],
+) -> int:
+    """
+    Upsert the resources from the latest state and mark any that disappeared as destroyed,
+    so ownership lookups keep working after teardown.
+    """
+    user = await db.get(User, infra_request.user_id)
+    department = getattr(user, "department", None)
+    now = datetime.utcnow()
+
+    # Keyed by address: one INSERT may not touch the same (request_identifier, address) row
+    # twice, so a repeated address keeps its last record
+    rows = list({
+        record["address"]: {
+            "request_id": infra_request.id,
+            "request_identifier": infra_request.request_identifier,
+            "user_id": infra_request.user_id,
+            "department": department,
+            "cloud_provider": infra_request.cloud_provider,
+            "environment": infra_request.environment,
+            "status": "active",
+            "created_at": now,
+            "updated_at": now,
+            **record,
+        }
+        for record in records
+    }.values())
+
+    for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+        stmt = insert(ManagedResource).values(rows[start:start + UPSERT_BATCH_SIZE])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ManagedResource.request_identifier, ManagedResource.address],
+            set_={
+                "provider_id": stmt.excluded.provider_id,
+                "arn": stmt.excluded.arn,
+                "region": stmt.excluded.region,
+                "department": stmt.excluded.department,
+                "status": "active",
+                "updated_at": now,
+            },
+        )
+        await db.execute(stmt)
+
+    # Every row upserted above carries updated_at=now, so anything older is gone from the
+    # state; this avoids binding one NOT IN parameter per address
+    stale = (
+        update(ManagedResource)
+        .where(
+            ManagedResource.request_identifier == infra_request.request_identifier,
+            ManagedResource.status == "active",
+            ManagedResource.updated_at < now,
+        )
+        .values(status="destroyed", updated_at=now)
+    )
+    await db.execute(stale)
+
+    logger.info("Indexed %d managed resources for %s", len(rows), infra_request.request_identifier)
+    return len(rows)
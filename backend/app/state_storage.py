@@ -0,0 +1,179 @@
+# backend/app/state_storage.py
+import hashlib
+import logging
+import zlib
+from typing import AsyncIterator, Optional
+from uuid import uuid4
+
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from .config import STATE_COMPRESSION, STATE_COMPRESSION_LEVEL, STATE_CHUNK_SIZE
+from .models import TerraformState, TerraformStateBlob, TerraformStateChunk, TerraformStateVersion
+
+try:
+    import zstandard
+except Exception:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+GZIP_WBITS = 31
+
+
+def default_encoding() -> str:
+    if STATE_COMPRESSION == "zstd" and zstandard is None:
+        logger.warning("zstandard not installed; falling back to gzip for Terraform state")
+        return "gzip"
+    return STATE_COMPRESSION if STATE_COMPRESSION in ("zstd", "gzip") else "gzip"
+
+
+def _compressobj(encoding: str):
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=STATE_COMPRESSION_LEVEL).compressobj()
+    return zlib.compressobj(STATE_COMPRESSION_LEVEL, zlib.DEFLATED, GZIP_WBITS)
+
+
+def _decompressobj(encoding: str):
+    if encoding == "zstd":
+        if zstandard is None:
+            raise RuntimeError("State blob is zstd-compressed but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompressobj()
+    return zlib.decompressobj(GZIP_WBITS)
+
+
+class StateBlobWriter:
+    """
+    Streams raw state bytes into a compressed, chunked blob.
+    Only one chunk of compressed output is held in memory at a time.
+    """
+
+    def __init__(self, db: AsyncSession, encoding: Optional[str] = None, chunk_size: int = STATE_CHUNK_SIZE):
+        self.db = db
+        self.encoding = encoding or default_encoding()
+        self.chunk_size = chunk_size
+        self.raw_size = 0
+        self.stored_size = 0
+        self._compressor = _compressobj(self.encoding)
+        self._hasher = hashlib.sha256()
+        self._pending = bytearray()
+        self._seq = 0
+        self._blob: Optional[TerraformStateBlob] = None
+
+    async def _ensure_blob(self):
+        if self._blob is None:
+            # Placeholder hash until the content is fully read; swapped in finish()
+            self._blob = TerraformStateBlob(
+                id=uuid4(),
+                content_hash=f"pending-{uuid4().hex}",
+                encoding=self.encoding,
+            )
+            self.db.add(self._blob)
+            await self.db.flush()
+
+    async def _emit_chunk(self, data: bytes):
+        await self._ensure_blob()
+        chunk = TerraformStateChunk(blob_id=self._blob.id, seq=self._seq, data=data)
+        self.db.add(chunk)
+        await self.db.flush()
+        self.db.expunge(chunk)
+        self._seq += 1
+        self.stored_size += len(data)
+
+    async def write(self, data: bytes):
+        if not data:
+            return
+        self.raw_size += len(data)
+        self._hasher.update(data)
+        self._pending.extend(self._compressor.compress(data))
+        await self._drain()
+
+    async def _drain(self, final: bool = False):
+        while len(self._pending) >= self.chunk_size or (final and self._pending):
+            piece = bytes(self._pending[:self.chunk_size])
+            del self._pending[:self.chunk_size]
+            await self._emit_chunk(piece)
+
+    async def finish(self) -> TerraformStateBlob:
+        self._pending.extend(self._compressor.flush())
+        await self._drain(final=True)
+        await self._ensure_blob()
+
+        content_hash = self._hasher.hexdigest()
+        existing = await _find_blob(self.db, content_hash)
+        if existing:
+            await self.db.execute(delete(TerraformStateChunk).where(TerraformStateChunk.blob_id == self._blob.id))
+            await self.db.delete(self._blob)
+            await self.db.flush()
+            logger.info("State blob %s already stored; reusing", content_hash[:12])
+            return existing
+
+        self._blob.content_hash = content_hash
+        self._blob.raw_size = self.raw_size
+        self._blob.stored_size = self.stored_size
+        self._blob.chunk_count = self._seq
+        await self.db.flush()
+        logger.info(
+            "Stored state blob %s: %d -> %d bytes (%s, %d chunks)",
+            content_hash[:12], self.raw_size, self.stored_size, self.encoding, self._seq,
+        )
+        return self._blob
+
+
+async def _find_blob(db: AsyncSession, content_hash: str) -> Optional[TerraformStateBlob]:
+    result = await db.execute(select(TerraformStateBlob).where(TerraformStateBlob.content_hash == content_hash))
+    return result.scalar_one_or_none()
+
+
+async def store_state_blob(db: AsyncSession, raw: bytes) -> TerraformStateBlob:
+    """Store an in-memory state document, skipping the write entirely if it is already known."""
+    existing = await _find_blob(db, hashlib.sha256(raw).hexdigest())
+    if existing:
+        return existing
+    writer = StateBlobWriter(db)
+    for offset in range(0, len(raw), STATE_CHUNK_SIZE):
+        await writer.write(raw[offset:offset + STATE_CHUNK_SIZE])
+    return await writer.finish()
+
+
+async def release_state_blob(db: AsyncSession, blob_id) -> bool:
+    """Delete a blob once neither a current state nor a history snapshot points at it."""
+    if blob_id is None:
+        return False
+    for column in (TerraformState.state_blob_id, TerraformStateVersion.blob_id):
+        result = await db.execute(select(column).where(column == blob_id).limit(1))
+        if result.first():
+            return False
+    await db.execute(delete(TerraformStateChunk).where(TerraformStateChunk.blob_id == blob_id))
+    await db.execute(delete(TerraformStateBlob).where(TerraformStateBlob.id == blob_id))
+    logger.info("Released unreferenced state blob %s", blob_id)
+    return True
+
+
+async def iter_state_bytes(db: AsyncSession, blob_id) -> AsyncIterator[bytes]:
+    """Lazily stream decompressed state bytes, one stored chunk at a time."""
+    blob = await db.get(TerraformStateBlob, blob_id)
+    if blob is None:
+        return
+    decompressor = _decompressobj(blob.encoding)
+    result = await db.stream_scalars(
+        select(TerraformStateChunk.data)
+        .where(TerraformStateChunk.blob_id == blob_id)
+        .order_by(TerraformStateChunk.seq)
+    )
+    async for data in result:
+        out = decompressor.decompress(data)
+        if out:
+            yield out
+    if hasattr(decompressor, "flush"):
+        tail = decompressor.flush()
+        if tail:
+            yield tail
+
+
+async def load_state_bytes(db: AsyncSession, blob_id) -> bytes:
+    parts = []
+    async for part in iter_state_bytes(db, blob_id):
+        parts.append(part)
+    return b"".join(parts)
@@ -1,211 +1,508 @@
 # backend/app/tasks.py
-import logging
 import asyncio
+import logging
 import json
-import importlib
-from celery import Celery
-from typing import Dict, Any, Optional
-import httpx
+import time
+from contextlib import contextmanager
+from celery import Celery, chain
+from celery.result import AsyncResult
+from celery.utils import uuid
+from typing import Dict, Any, List, Optional
 import redis
 
-from .config import CELERY_BROKER_URL, API_URL, API_TOKEN, REDIS_URL
-from .database import AsyncSessionLocal, get_infra_sync, SyncSessionLocal
-from .models import InfrastructureRequest
+from .config import (
+    CELERY_BROKER_URL, CELERY_RESULT_BACKEND, CELERY_RESULT_EXPIRES, REDIS_URL, PR_COALESCE_WINDOWS, PR_STATUS_POLL_INTERVAL,
+    IDEMPOTENCY_REAP_INTERVAL, FAIR_DISPATCH_MAX_INFLIGHT, DEAD_LETTER_RETENTION_DAYS,
+)
+from . import celery_metrics  # registers the task telemetry signal handlers
+from . import progress, worker_runtime
+from .database import AsyncSessionLocal
+from .dead_letters import retry_or_dead_letter, DeadLetterQueue
+from .events import pipeline_event, publish_event
+from .github_manager import get_github_manager
+from .terraform_manager import get_terraform_manager
+from .fair_scheduler import ENVIRONMENTS, FairScheduler, normalize_environment
+from .idempotency import StageInFlight, run_once, claim_dispatch, release_dispatch, reap_expired_leases
+from .metrics import PIPELINE_STAGE_DURATION
+from .models import InfrastructureRequest, User
 from sqlalchemy.future import select
 from sqlalchemy import update
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-celery_app = Celery("aiops_tasks", broker=CELERY_BROKER_URL)
+celery_app = Celery("aiops_tasks", broker=CELERY_BROKER_URL, backend=CELERY_RESULT_BACKEND)
+celery_app.conf.result_expires = CELERY_RESULT_EXPIRES
 _redis_client = redis.from_url(REDIS_URL) if REDIS_URL else None
+_broker_client = redis.from_url(CELERY_BROKER_URL) if CELERY_BROKER_URL.startswith("redis") else None
 
+celery_app.conf.beat_schedule = {
+    "reconcile-pr-statuses": {
+        "task": "aiops.reconcile_pr_statuses",
+        "schedule": PR_STATUS_POLL_INTERVAL,
+    },
+    "reap-idempotency-leases": {
+        "task": "aiops.reap_idempotency_leases",
+        "schedule": IDEMPOTENCY_REAP_INTERVAL,
+    },
+    "purge-dead-letters": {
+        "task": "aiops.purge_dead_letters",
+        "schedule": 86400,
+    },
+}
 
-def _run_async_safely(coro_fn, *args, **kwargs):
-    loop = asyncio.new_event_loop()
-    try:
-        asyncio.set_event_loop(loop)
-        coro = coro_fn(*args, **kwargs)
-        return loop.run_until_complete(coro)
-    finally:
-        try:
-            to_cancel = asyncio.all_tasks(loop=loop)
-            for t in to_cancel:
-                t.cancel()
-            loop.run_until_complete(asyncio.sleep(0))
-        except Exception:
-            pass
-        try:
-            loop.close()
-        finally:
-            asyncio.set_event_loop(None)
+# A request runs as render -> git -> notify, each stage on its own queue so the slow git
+# push cannot starve rendering or notifications, and each stage queue is split per
+# environment. Workers list the environments in priority order; with the "priority" queue
+# order strategy they drain prod before qa before dev. Scale each pool independently, e.g.
+#   celery -A app.tasks worker -Q render.prod,render.qa,render.dev -c 8
+#   celery -A app.tasks worker -Q git.prod,git.qa,git.dev -c 4
+#   celery -A app.tasks worker -Q notify.prod,notify.qa,notify.dev -c 4
+#   celery -A app.tasks worker -Q celery -c 2 -B
+RENDER_QUEUE = "render"
+GIT_QUEUE = "git"
+NOTIFY_QUEUE = "notify"
+
+
+def stage_queue(stage: str, environment: Optional[str]) -> str:
+    return f"{stage}.{normalize_environment(environment)}"
+
+
+celery_app.conf.task_routes = {
+    "aiops.render_tfvars": {"queue": stage_queue(RENDER_QUEUE, None)},
+    "aiops.open_pull_request": {"queue": stage_queue(GIT_QUEUE, None)},
+    "aiops.create_batch_pull_request": {"queue": stage_queue(GIT_QUEUE, None)},
+    "aiops.notify_pr_result": {"queue": stage_queue(NOTIFY_QUEUE, None)},
+}
+celery_app.conf.broker_transport_options = {"queue_order_strategy": "priority"}
+# Stages acknowledge after they finish so a lost worker hands its stage to another one;
+# a prefetched git task must not sit behind a long push
+celery_app.conf.task_acks_late = True
+celery_app.conf.worker_prefetch_multiplier = 1
+
+# Stage tasks retry themselves; only the failing stage reruns. How often and how soon is
+# decided per error class by dead_letters.retry_or_dead_letter, not by Celery's max_retries.
+STAGE_OPTIONS = {"bind": True, "max_retries": None}
 
 
-def _update_db_sync(request_identifier: str, pr_number: Optional[int]) -> Dict[str, Any]:
+async def _update_db(request_identifiers: List[str], pr_number: Optional[int]) -> Dict[str, Any]:
+    values = {"pr_number": int(pr_number), "status": "pending_approval"} if pr_number else {"status": "pr_failed"}
     try:
-        with SyncSessionLocal() as db:
-            if pr_number:
-                result = db.execute(
-                    update(InfrastructureRequest)
-                    .where(InfrastructureRequest.request_identifier == request_identifier)
-                    .values(
-                        pr_number=int(pr_number),
-                        status="pending_approval"
-                    )
-                )
-            else:
-                result = db.execute(
-                    update(InfrastructureRequest)
-                    .where(InfrastructureRequest.request_identifier == request_identifier)
-                    .values(status="pr_failed")
-                )
-            
-            db.commit()
-            
-            if result.rowcount > 0:
-                logger.info("Successfully updated DB for %s with PR #%s", request_identifier, pr_number)
-                return {"db_updated": True, "rows_affected": result.rowcount}
-            else:
-                logger.warning("No rows updated for request %s", request_identifier)
-                return {"db_updated": False, "error": "no_rows_affected"}
-                
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                update(InfrastructureRequest)
+                .where(InfrastructureRequest.request_identifier.in_(request_identifiers))
+                .values(**values)
+            )
+            await db.commit()
+
+        if result.rowcount > 0:
+            logger.info("Successfully updated DB for %s with PR #%s", request_identifiers, pr_number)
+            return {"db_updated": True, "rows_affected": result.rowcount}
+        logger.warning("No rows updated for requests %s", request_identifiers)
+        return {"db_updated": False, "error": "no_rows_affected"}
+
     except Exception as e:
-        logger.exception("Failed to update DB for %s: %s", request_identifier, e)
+        logger.exception("Failed to update DB for %s: %s", request_identifiers, e)
         return {"db_updated": False, "db_error": str(e)}
 
 
+async def _load_request(request_identifier: str):
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(InfrastructureRequest, User)
+            .outerjoin(User, User.id == InfrastructureRequest.user_id)
+            .where(InfrastructureRequest.request_identifier == request_identifier)
+        )
+        return result.first()
+
+
 @celery_app.task(name="aiops.health_check")
 def health_check() -> str:
     return "ok"
 
 
+@celery_app.task(name="aiops.reconcile_pr_statuses")
+def reconcile_pr_statuses() -> Dict[str, Any]:
+    from .pr_status import reconcile_pending_requests
+    try:
+        return worker_runtime.run(reconcile_pending_requests)
+    except Exception as e:
+        logger.exception("PR status reconciliation failed: %s", e)
+        return {"status": "failed", "error": str(e)}
+
+
+@contextmanager
+def _stage(ctx: Dict[str, Any], stage: str):
+    """Record a stage's duration in the metric and in the context handed down the chain."""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = ctx.get("status") or "ok"
+    finally:
+        elapsed = time.perf_counter() - started
+        ctx.setdefault("timings", {})[stage] = round(elapsed, 3)
+        PIPELINE_STAGE_DURATION.labels(stage=stage, outcome=outcome).observe(elapsed)
+        logger.info("Stage %s for %s took %.2fs (%s)", stage, ctx.get("request_identifier"), elapsed, outcome)
+
+
+def request_pipeline(request_identifier: str, user_email: str, environment: Optional[str] = None):
+    """The render -> git -> notify chain for one request, on its environment's queues."""
+    return chain(
+        render_tfvars.s(request_identifier, user_email).set(queue=stage_queue(RENDER_QUEUE, environment)),
+        open_pull_request.s().set(queue=stage_queue(GIT_QUEUE, environment)),
+        notify_pr_result.s().set(queue=stage_queue(NOTIFY_QUEUE, environment)),
+    )
+
+
+def start_request_pipeline(request_identifier: str, user_email: str,
+                           environment: Optional[str] = None, department: Optional[str] = None):
+    """
+    Dispatch the pipeline once; a repeated submit gets the already-dispatched pipeline's result.
+    With Redis the request first waits for fair dispatch (see fair_scheduler); the returned
+    result's id is the pipeline's from the start.
+    """
+    pipeline_id = uuid()
+    existing = claim_dispatch(request_identifier, pipeline_id)
+    if existing:
+        logger.info("Pipeline %s already dispatched for %s, not dispatching again", existing, request_identifier)
+        return AsyncResult(existing, app=celery_app)
+    item = {"request_identifier": request_identifier, "user_email": user_email, "pipeline_id": pipeline_id}
+    try:
+        progress.track(request_identifier, pipeline_id, user_email)
+        progress.report(request_identifier, progress.QUEUED)
+        if _redis_client is not None:
+            FairScheduler(_redis_client).enqueue(item, environment, department)
+            return AsyncResult(pipeline_id, app=celery_app)
+        return _send_pipeline({**item, "environment": environment})
+    except Exception:
+        release_dispatch(request_identifier)
+        raise
+
+
+def pipeline_progress(request_identifier: str) -> Dict[str, Any]:
+    """Where the request's pipeline stands, from the result backend; reads never wait on a worker."""
+    pipeline_id = progress.pipeline_for(request_identifier).get("pipeline_id")
+    if not pipeline_id:
+        return {"pipeline_id": None, "state": None, "progress": None}
+    result = AsyncResult(pipeline_id, app=celery_app)
+    state = result.state
+    info = result.info if state in progress.PROGRESS_MESSAGES else None
+    if state == "SUCCESS" and isinstance(result.result, dict):
+        info = {"status": result.result.get("status")}
+    elif state == "FAILURE":
+        info = {"error": str(result.info)}
+    return {"pipeline_id": pipeline_id, "state": state, "progress": info}
+
+
+def _send_pipeline(item: Dict[str, Any]):
+    return request_pipeline(item["request_identifier"], item["user_email"], item.get("environment")).apply_async(
+        task_id=item["pipeline_id"]
+    )
+
+
+def render_backlog() -> int:
+    """Messages waiting in the broker's render queues."""
+    if _broker_client is None:
+        return 0
+    pipe = _broker_client.pipeline()
+    for environment in ENVIRONMENTS:
+        pipe.llen(stage_queue(RENDER_QUEUE, environment))
+    return sum(pipe.execute())
+
+
+def dispatch_pending_requests(max_inflight: int = FAIR_DISPATCH_MAX_INFLIGHT) -> int:
+    """Release fairly ordered requests into Celery while the render queues have room."""
+    budget = max_inflight - render_backlog()
+    if budget <= 0 or _redis_client is None:
+        return 0
+    sent = FairScheduler(_redis_client).dispatch(_send_pipeline, budget)
+    if sent:
+        logger.info("Dispatched %d queued requests", sent)
+    return sent
+
+
+def _run_stage(ctx: Dict[str, Any], stage: str, coro_fn, keep) -> Dict[str, Any]:
+    """Run a stage once per request; a duplicate delivery gets the stored result or stops the chain."""
+    with _stage(ctx, stage):
+        try:
+            return run_once(ctx["request_identifier"], stage, lambda: worker_runtime.run(coro_fn, ctx), keep=keep)
+        except StageInFlight:
+            logger.info("%s for %s is running elsewhere; dropping this duplicate", stage, ctx["request_identifier"])
+            ctx["status"] = "in_flight"
+            return ctx
+
+
 @celery_app.task(name="aiops.process_infrastructure_request")
 def process_infrastructure_request(request_identifier: str, user_email: str) -> Dict[str, Any]:
+    """Kept for callers and queued messages that predate the staged pipeline."""
+    row = worker_runtime.run(_load_request, request_identifier)
+    infra_row, user_obj = row if row else (None, None)
+    result = start_request_pipeline(
+        request_identifier, user_email,
+        environment=getattr(infra_row, "environment", None),
+        department=getattr(user_obj, "department", None),
+    )
+    logger.info("Started pipeline %s for %s", result.id, request_identifier)
+    return {"request_identifier": request_identifier, "status": "dispatched", "pipeline_id": result.id}
+
+
+def _give_up(ctx: Dict[str, Any], stage: str, dead_letter_id: Optional[str], exc: Exception) -> Dict[str, Any]:
+    """A stage ran out of attempts: mark the request failed and let the chain carry on to notify."""
+    ctx.update(status="failed", error=f"{stage}_failed: {exc}", dead_letter_id=dead_letter_id)
+    ctx.update(worker_runtime.run(_update_db, [ctx["request_identifier"]], None))
+    return ctx
+
+
+@celery_app.task(name="aiops.render_tfvars", **STAGE_OPTIONS)
+def render_tfvars(self, request_identifier: str, user_email: str) -> Dict[str, Any]:
+    ctx: Dict[str, Any] = {"request_identifier": request_identifier, "user_email": user_email, "status": "failed"}
     try:
-        logger.info("Celery task starting processing: %s", request_identifier)
+        return _run_stage(ctx, "render", _render_async, keep=lambda r: r.get("status") in ("rendered", "batched"))
+    except Exception as e:
+        logger.exception("Render stage failed for %s: %s", request_identifier, e)
+        return _give_up(ctx, "render", retry_or_dead_letter(self, e, "render", request_identifier), e)
 
-        try:
-            infra_row = get_infra_sync(request_identifier)
-        except Exception as e:
-            logger.exception("Synchronous DB lookup failed for %s: %s", request_identifier, e)
-            return {"request_identifier": request_identifier, "status": "failed", "error": f"sync-db-lookup-failed: {e}"}
-
-        if not infra_row:
-            logger.error("Request %s not found (sync lookup)", request_identifier)
-            return {"request_identifier": request_identifier, "status": "failed", "error": "request-not-found"}
-
-        infra_payload = {
-            "id": getattr(infra_row, "id", None),
-            "request_identifier": getattr(infra_row, "request_identifier", request_identifier),
-            "user_id": getattr(infra_row, "user_id", None),
-            "user_email": getattr(infra_row, "user_email", user_email),
-            "request_parameters": getattr(infra_row, "request_parameters", None),
-            "status": getattr(infra_row, "status", None),
-            "created_at": getattr(infra_row, "created_at", None),
-        }
-
-        result = _run_async_safely(_process_request_async, request_identifier, user_email, infra_payload)
-        
-        pr_number = result.get("pr_number")
-        db_result = _update_db_sync(request_identifier, pr_number)
-        result.update(db_result)
-        
-        logger.info("Finished processing: %s -> %s", request_identifier, result.get("status"))
-        return result
 
+@celery_app.task(name="aiops.open_pull_request", **STAGE_OPTIONS)
+def open_pull_request(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+    if ctx.get("status") != "rendered":
+        return ctx
+    try:
+        return _run_stage(ctx, "git", _open_pull_request_async, keep=lambda r: r.get("status") == "pr_created")
     except Exception as e:
-        logger.exception("Error processing request %s: %s", request_identifier, e)
-        return {"request_identifier": request_identifier, "status": "failed", "error": str(e)}
+        logger.exception("Git stage failed for %s: %s", ctx.get("request_identifier"), e)
+        return _give_up(ctx, "git", retry_or_dead_letter(self, e, "git", ctx.get("request_identifier")), e)
 
 
-async def _process_request_async(request_identifier: str, user_email: str, infra_payload: Dict[str, Any]) -> Dict[str, Any]:
+@celery_app.task(name="aiops.notify_pr_result", **STAGE_OPTIONS)
+def notify_pr_result(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+    if ctx.get("status") not in ("pr_created", "pr_failed", "failed"):
+        return ctx
     try:
-        logger.info("Running _process_request_async on loop %s", asyncio.get_running_loop())
-    except Exception:
-        pass
+        # Keyed by outcome: a later, different result for the same request is still announced
+        ctx = _run_stage(ctx, f"notify-{ctx['status']}", _notify_stage_async, keep=lambda r: True)
+        logger.info("Finished processing: %s -> %s %s", ctx["request_identifier"], ctx["status"], ctx.get("timings"))
+        return ctx
+    except Exception as e:
+        logger.exception("Notify stage failed for %s: %s", ctx.get("request_identifier"), e)
+        ctx["dead_letter_id"] = retry_or_dead_letter(self, e, "notify", ctx.get("request_identifier"))
+        return ctx
+
+
+@celery_app.task(name="aiops.reap_idempotency_leases")
+def reap_idempotency_leases() -> Dict[str, Any]:
+    try:
+        return reap_expired_leases()
+    except Exception as e:
+        logger.exception("Idempotency lease reaping failed: %s", e)
+        return {"status": "failed", "error": str(e)}
+
+
+def replay_dead_letter(entry: Dict[str, Any]) -> str:
+    """
+    Send a dead-lettered task again. Pipeline stages are replayed together with the stages
+    after them, so a replayed render or git stage still ends in a notification.
+    """
+    queue = entry.get("queue")
+    environment = queue.split(".", 1)[1] if queue and "." in queue else None
+    args = entry.get("args") or []
+    if entry["task"] == render_tfvars.name:
+        signature = request_pipeline(args[0], args[1], environment)
+    elif entry["task"] == open_pull_request.name:
+        environment = args[0].get("environment") or environment
+        signature = chain(
+            open_pull_request.s(*args).set(queue=stage_queue(GIT_QUEUE, environment)),
+            notify_pr_result.s().set(queue=stage_queue(NOTIFY_QUEUE, environment)),
+        )
+    else:
+        signature = celery_app.signature(entry["task"], args=args, kwargs=entry.get("kwargs") or {})
+        if queue:
+            signature = signature.set(queue=queue)
+    return signature.apply_async().id
+
+
+@celery_app.task(name="aiops.purge_dead_letters")
+def purge_dead_letters() -> Dict[str, Any]:
+    try:
+        return {"purged": DeadLetterQueue().purge_older_than(DEAD_LETTER_RETENTION_DAYS)}
+    except Exception as e:
+        logger.exception("Dead-letter purge failed: %s", e)
+        return {"status": "failed", "error": str(e)}
+
+
+def _enqueue_for_batch(environment: str, request_identifier: str, user_email: str):
+    """
+    Park a request until its environment's coalescing window closes. The first request
+    in a window schedules the batch task; later ones only join the list.
+    """
+    window = PR_COALESCE_WINDOWS[environment]
+    batch_key = f"pr_batch:{environment}"
+    _redis_client.rpush(batch_key, json.dumps({"request_identifier": request_identifier, "user_email": user_email}))
+    if _redis_client.set(f"{batch_key}:open", "1", nx=True, ex=window * 2 + 60):
+        create_batch_pull_request.apply_async(args=[environment], countdown=window, queue=stage_queue(GIT_QUEUE, environment))
+        logger.info("Opened %ss PR batch window for %s", window, environment)
+
+
+def _take_batch(environment: str) -> List[Dict[str, str]]:
+    batch_key = f"pr_batch:{environment}"
+    pipe = _redis_client.pipeline(transaction=True)
+    pipe.lrange(batch_key, 0, -1)
+    pipe.delete(batch_key)
+    pipe.delete(f"{batch_key}:open")
+    items, _, _ = pipe.execute()
+    members = []
+    for raw in items:
+        try:
+            members.append(json.loads(raw))
+        except Exception:
+            logger.warning("Dropping malformed batch entry for %s: %r", environment, raw)
+    return members
 
-    result_payload: Dict[str, Any] = {"request_identifier": request_identifier, "status": "failed"}
 
-    infra = infra_payload
+@celery_app.task(name="aiops.create_batch_pull_request", **STAGE_OPTIONS)
+def create_batch_pull_request(self, environment: str, members: Optional[List[Dict[str, str]]] = None) -> Dict[str, Any]:
+    # Retries carry the members: they left the Redis batch list on the first attempt
+    members = members if members is not None else _take_batch(environment)
+    if not members:
+        return {"environment": environment, "status": "empty"}
 
+    request_identifiers = [m["request_identifier"] for m in members]
+    ctx: Dict[str, Any] = {"request_identifier": ",".join(request_identifiers), "status": "failed"}
     try:
-        user_obj = None
-        if infra.get("user_id"):
-            try:
-                async with AsyncSessionLocal() as db:
-                    from .models import User
-                    user_result = await db.execute(select(User).where(User.id == infra["user_id"]))
-                    user_obj = user_result.scalar_one_or_none()
-            except Exception as e:
-                logger.warning(f"Could not fetch user object: {e}")
-        
-        tm_mod = importlib.import_module("app.terraform_manager")
-        TerraformManager = getattr(tm_mod, "TerraformManager")
-        tm = TerraformManager()
-        
-        backend_path, clone_expected_path = await tm.generate_tfvars_for_request(
-            request_identifier, 
+        logger.info("Creating batched PR for %s: %s", environment, request_identifiers)
+        with _stage(ctx, "git_batch"):
+            result = worker_runtime.run(_process_batch_async, environment, members)
+    except Exception as e:
+        logger.exception("Error processing PR batch for %s: %s", environment, e)
+        dead_letter_id = retry_or_dead_letter(self, e, "git_batch", ctx["request_identifier"], args=[environment, members])
+        result = {"environment": environment, "request_identifiers": request_identifiers, "status": "failed",
+                  "error": str(e), "dead_letter_id": dead_letter_id}
+        result.update(worker_runtime.run(_update_db, request_identifiers, None))
+
+    for member in members:
+        notify_pr_result.apply_async(args=[{
+            "request_identifier": member["request_identifier"],
+            "user_email": member.get("user_email"),
+            "status": result["status"],
+            "pr_number": result.get("pr_number"),
+            "timings": ctx["timings"],
+        }], queue=stage_queue(NOTIFY_QUEUE, environment))
+    logger.info("Finished batch for %s -> %s", environment, result.get("status"))
+    return result
+
+
+async def _process_batch_async(environment: str, members: List[Dict[str, str]]) -> Dict[str, Any]:
+    result_payload: Dict[str, Any] = {
+        "environment": environment,
+        "request_identifiers": [m["request_identifier"] for m in members],
+        "status": "failed",
+    }
+
+    # One attempt here: errors propagate to the task, which retries or dead-letters them by class
+    pr_number = await get_github_manager().create_batch_pull_request(result_payload["request_identifiers"], retry=False)
+    result_payload["pr_number"] = pr_number
+    result_payload["status"] = "pr_created" if pr_number else "pr_failed"
+    if pr_number:
+        await progress.report_async(result_payload["request_identifiers"], progress.PR_OPEN, pr_number=pr_number)
+
+    result_payload.update(await _update_db(result_payload["request_identifiers"], pr_number))
+    return result_payload
+
+
+async def _render_async(ctx: Dict[str, Any]) -> Dict[str, Any]:
+    request_identifier = ctx["request_identifier"]
+    await progress.report_async([request_identifier], progress.RENDERING)
+    row = await _load_request(request_identifier)
+    if not row:
+        logger.error("Request %s not found", request_identifier)
+        ctx.update(status="not_found", error="request-not-found")
+        return ctx
+
+    infra_row, user_obj = row
+    infra = {
+        "id": infra_row.id,
+        "request_identifier": infra_row.request_identifier,
+        "user_id": infra_row.user_id,
+        "user_email": getattr(user_obj, "email", ctx["user_email"]),
+        "request_parameters": infra_row.request_parameters,
+        "status": infra_row.status,
+        "environment": infra_row.environment,
+        "created_at": infra_row.created_at,
+    }
+
+    try:
+        backend_path, clone_expected_path = await get_terraform_manager().generate_tfvars_for_request(
+            request_identifier,
             params=infra.get("request_parameters", {}),
             user=user_obj,
             request_obj=infra
         )
-        result_payload["tfvars_written"] = True
-        result_payload["tfvars_backend_path"] = str(backend_path)
-        result_payload["tfvars_repo_path"] = str(clone_expected_path) if clone_expected_path else None
+        ctx["tfvars_written"] = True
+        ctx["tfvars_backend_path"] = str(backend_path)
+        ctx["tfvars_repo_path"] = str(clone_expected_path) if clone_expected_path else None
         logger.info("Local TFVARS generated for %s -> %s", request_identifier, backend_path)
     except Exception as e:
+        # The git stage renders the file it commits itself, so carry on and record why
         logger.exception("Terraform tfvars generation failed for %s: %s", request_identifier, e)
-        result_payload["tfvars_written"] = False
-        result_payload["error"] = "tfvars_generation_failed:" + str(e)
+        ctx["tfvars_written"] = False
+        ctx["error"] = "tfvars_generation_failed:" + str(e)
 
-    pr_number: Optional[int] = None
-    try:
-        gh_mod = importlib.import_module("app.github_manager")
-        GitHubManager = getattr(gh_mod, "GitHubManager")
-        gh = GitHubManager()
-        pr_number = await gh.create_pull_request(request_identifier)
-        result_payload["pr_number"] = pr_number
-        result_payload["status"] = "pr_created" if pr_number else "pr_failed"
-        logger.info("Created PR #%s for request %s", pr_number, request_identifier)
-    except Exception as e:
-        logger.exception("GitHubManager failed to create PR for %s: %s", request_identifier, e)
-        result_payload["error"] = "pr_creation_failed:" + str(e)
-        result_payload["status"] = "failed"
+    environment = ((infra.get("request_parameters") or {}).get("environment") or infra.get("environment") or "dev").lower()
+    ctx["environment"] = environment
+    ctx["status"] = "rendered"
+    if ctx.get("tfvars_written") and PR_COALESCE_WINDOWS.get(environment, 0) > 0 and _redis_client:
+        try:
+            await asyncio.to_thread(_enqueue_for_batch, environment, request_identifier, ctx["user_email"])
+            ctx["status"] = "batched"
+        except Exception as e:
+            logger.exception("Could not queue %s for batching, opening its own PR: %s", request_identifier, e)
+    return ctx
 
-    try:
-        if API_URL and API_TOKEN:
-            notify_url = f"{API_URL.rstrip('/')}/infrastructure/notify-deployment"
-            payload = {
-                "request_identifier": request_identifier,
-                "user_email": user_email,
-                "status": result_payload.get("status"),
-                "pr_number": pr_number,
-            }
-            headers = {"Authorization": f"Bearer {API_TOKEN}", "Content-Type": "application/json"}
-            async with httpx.AsyncClient(timeout=30) as client:
-                resp = await client.post(notify_url, json=payload, headers=headers)
-                if resp.status_code in (200, 201):
-                    try:
-                        result_payload["notify_response"] = resp.json() if resp.content else {"status": "ok"}
-                    except Exception:
-                        result_payload["notify_response"] = {"status": "ok"}
-                else:
-                    result_payload["notify_status_code"] = resp.status_code
-        else:
-            result_payload["notify_error"] = "API_URL or API_TOKEN not configured"
-    except Exception as e:
-        logger.exception("Failed to notify user API")
-        result_payload["notify_error"] = str(e)
 
-    try:
-        if _redis_client:
-            channel = f"deployment:{request_identifier}"
-            msg = json.dumps({"request_id": request_identifier, "pr_number": pr_number, "status": result_payload.get("status")})
-            _redis_client.publish(channel, msg)
-            result_payload["redis_published"] = True
-    except Exception as e:
-        logger.exception("Failed to publish Redis message")
-        result_payload["redis_published"] = False
-        result_payload["redis_publish_error"] = str(e)
+async def _open_pull_request_async(ctx: Dict[str, Any]) -> Dict[str, Any]:
+    request_identifier = ctx["request_identifier"]
+    row = await _load_request(request_identifier)
+    if not row:
+        ctx.update(status="failed", error="request-not-found")
+        return ctx
+
+    infra_row, user_obj = row
+    if infra_row.pr_number:
+        # A redelivered or retried stage: the PR exists already, do not open a second one
+        logger.info("Request %s already has PR #%s", request_identifier, infra_row.pr_number)
+        ctx.update(status="pr_created", pr_number=infra_row.pr_number)
+        return ctx
+
+    # One attempt here: errors propagate to the stage task, which retries or dead-letters them by class
+    pr_number = await get_github_manager().create_pull_request(request_identifier, {
+        "request": infra_row,
+        "user": user_obj,
+        "parameters": infra_row.request_parameters,
+    }, retry=False)
+    ctx["pr_number"] = pr_number
+    ctx["status"] = "pr_created" if pr_number else "pr_failed"
+    logger.info("Created PR #%s for request %s", pr_number, request_identifier)
+    if pr_number:
+        await progress.report_async([request_identifier], progress.PR_OPEN, pr_number=pr_number)
+
+    ctx.update(await _update_db([request_identifier], pr_number))
+    return ctx
+
+
+async def _notify_stage_async(ctx: Dict[str, Any]) -> Dict[str, Any]:
+    ctx["notify"] = await asyncio.to_thread(_notify_pr_result, ctx["request_identifier"], ctx.get("user_email"),
+                                            ctx["status"], ctx.get("pr_number"), ctx.get("error"))
+    return ctx
+
+
+def _notify_pr_result(request_identifier: str, user_email: Optional[str], status: Optional[str],
+                      pr_number: Optional[int], error: Optional[str] = None) -> Dict[str, Any]:
+    """Append the pipeline outcome to the deployment event stream for the API to deliver."""
+    if _redis_client is None:
+        logger.warning("No Redis configured; %s outcome %s not delivered", request_identifier, status)
+        return {"published": False, "error": "REDIS_URL not configured"}
 
-    return result_payload
\ No newline at end of file
+    event = pipeline_event(request_identifier, user_email, status, pr_number, error)
+    return {"published": True, "event": event.type.value, "entry_id": publish_event(_redis_client, event)}
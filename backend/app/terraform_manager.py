@@ -252,6 +252,11 @@ def _render_tfvars_content(request_identifier: str, user: Optional[Any], params:
     logger.info(f"Generated tfvars for user: {user_info['email']}, department: {user_info['department']}, keypair: {tfvars['key_name']} (new: {tfvars['create_new_keypair']})")
     return '\n'.join(lines) + '\n'
 
+def _write_atomic(path: Path, content: str):
+    tmp = path.with_suffix(".tfvars.tmp")
+    tmp.write_text(content, encoding="utf-8")
+    tmp.rename(path)
+
 class TerraformManager:
     async def generate_tfvars_for_request(
         self,
@@ -265,7 +270,7 @@ class TerraformManager:
         if repo_root_override:
             repo_root = Path(repo_root_override).expanduser().resolve()
         else:
-            repo_root = find_repo_root() or Path.cwd().resolve()
+            repo_root = await asyncio.to_thread(find_repo_root) or Path.cwd().resolve()
 
         logger.info("TerraformManager: using repo_root=%s", repo_root)
 
@@ -273,20 +278,30 @@ class TerraformManager:
         environment = (params.get("environment") or getattr(request_obj, "environment", None) or "dev").lower()
 
         requests_dir = repo_root / "terraform" / "environments" / cloud / environment / "requests"
-        _ensure_dir(requests_dir)
+        await asyncio.to_thread(_ensure_dir, requests_dir)
 
         tfvars_path = requests_dir / f"{request_identifier}.tfvars"
         content = _render_tfvars_content(request_identifier, user, params, request_obj)
 
-        tmp = tfvars_path.with_suffix(".tfvars.tmp")
-        tmp.write_text(content, encoding="utf-8")
-        tmp.rename(tfvars_path)
+        await asyncio.to_thread(_write_atomic, tfvars_path, content)
 
         logger.info("TerraformManager: generated tfvars file: %s", tfvars_path)
 
         clone_expected = Path("terraform") / "environments" / cloud / environment / "requests" / f"{request_identifier}.tfvars"
         return tfvars_path, clone_expected
 
+
+_manager: Optional[TerraformManager] = None
+
+
+def get_terraform_manager() -> TerraformManager:
+    """The process-wide TerraformManager; it keeps no per-request state."""
+    global _manager
+    if _manager is None:
+        _manager = TerraformManager()
+    return _manager
+
+
 def generate_tfvars_for_request_sync(request_identifier: str, params: Dict[str, Any] = None, user: Optional[Any] = None, request_obj: Optional[Any] = None, repo_root_override: Optional[str] = None):
     return asyncio.get_event_loop().run_until_complete(
         TerraformManager().generate_tfvars_for_request(request_identifier, params, user, request_obj, repo_root_override)
@@ -0,0 +1,39 @@
+# test_branch_names.py
+"""
+PR branch names round-trip: the webhook handler must recover the request identifier from
+any branch github_manager names after a request, and none from a batch branch.
+
+    python -m app.test_branch_names
+"""
+from app.github_manager import _batch_branch, _request_branch
+from app.webhooks import request_identifier_from_branch
+
+REQUEST_IDENTIFIERS = [
+    "eng_aws_dev_42",
+    "REQ-1234-5678",
+    "devops_aws_prod_ec2_1718000000",
+    "a",
+]
+
+
+def test_request_branch_round_trip():
+    for request_identifier in REQUEST_IDENTIFIERS:
+        branch = _request_branch(request_identifier)
+        assert request_identifier_from_branch(branch) == request_identifier, branch
+
+
+def test_batch_branch_has_no_request():
+    branch = _batch_branch("dev", REQUEST_IDENTIFIERS)
+    assert request_identifier_from_branch(branch) is None, branch
+
+
+def test_foreign_branches_have_no_request():
+    for branch in (None, "", "main", "feature/infra-x", "infra-"):
+        assert request_identifier_from_branch(branch) is None, branch
+
+
+if __name__ == "__main__":
+    test_request_branch_round_trip()
+    test_batch_branch_has_no_request()
+    test_foreign_branches_have_no_request()
+    print("OK: branch names round-trip")
@@ -0,0 +1,252 @@
+# test_loop_lag.py
+"""
+Loop-lag check for the PR pipeline. Runs the pipeline's stage coroutines (render ->
+batch or git -> notify, plus the batched PR) for many requests concurrently while a ticker
+measures how late the event loop wakes it up. Any synchronous call made on the loop shows
+up as lag of roughly its duration.
+
+    python -m app.test_loop_lag --concurrency 20 --max-lag-ms 50
+    python -m app.test_loop_lag --live-db
+
+Nothing external is needed by default: GitHub is app.fake_github, the database is an
+async stand-in, and every Redis and broker client the stages use (progress, events, PR
+batching, the PR scheduler) is a fake whose commands take --redis-latency-ms. The sync
+fakes block for that long, so a Redis call left on the loop fails the check instead of
+hiding behind a fast local server. --live-db also runs the request lookups and status
+updates against the configured DATABASE_URL (identifiers that do not exist are fine).
+
+Exits non-zero when the worst observed lag exceeds --max-lag-ms.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+from app import github_manager, progress, tasks
+from app.fake_github import OfflineGitHub
+
+TICK = 0.005
+ENVIRONMENTS = ("dev", "qa", "prod")
+
+
+class _BlockingPipeline:
+    def __init__(self, redis: "_BlockingRedis"):
+        self._redis = redis
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
+
+    def execute(self):
+        self._redis.round_trip()
+        return []
+
+
+class _BlockingRedis:
+    """Sync Redis stand-in: each command blocks the calling thread for one round trip."""
+
+    _RESULTS = {"set": True, "xadd": b"0-1", "hmget": [None, None]}
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def round_trip(self):
+        time.sleep(self.latency)
+
+    def pipeline(self, *args, **kwargs):
+        return _BlockingPipeline(self)
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            self.round_trip()
+            return self._RESULTS.get(name, 1)
+        return command
+
+
+class _AsyncPipeline:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
+
+    async def execute(self):
+        await asyncio.sleep(self.latency)
+        return []
+
+
+class _AsyncRedis:
+    """redis.asyncio stand-in for the PR scheduler; every slot is granted at once."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def register_script(self, script: str):
+        async def run(keys=None, args=None):
+            await asyncio.sleep(self.latency)
+            return 1
+        return run
+
+    def pipeline(self, *args, **kwargs):
+        return _AsyncPipeline(self.latency)
+
+    def __getattr__(self, name):
+        async def command(*args, **kwargs):
+            await asyncio.sleep(self.latency)
+            return 1
+        return command
+
+
+def _use_pidfd_child_watcher():
+    # Python 3.12 (what the services run) watches subprocesses through pidfds; 3.11 defaults
+    # to a thread per git subprocess, whose start shows up here as lag that production lacks
+    if sys.version_info < (3, 12) and hasattr(asyncio, "PidfdChildWatcher") and hasattr(os, "pidfd_open"):
+        watcher = asyncio.PidfdChildWatcher()
+        watcher.attach_loop(asyncio.get_running_loop())
+        asyncio.set_child_watcher(watcher)
+
+
+def _install_fakes(fake: OfflineGitHub, redis_latency: float, db_latency: float) -> Dict[str, Any]:
+    blocking = _BlockingRedis(redis_latency)
+    tasks._redis_client = blocking
+    progress._redis_client = blocking
+    tasks.create_batch_pull_request.apply_async = lambda *args, **kwargs: blocking.round_trip()
+    tasks.PR_COALESCE_WINDOWS = {"dev": 60, "qa": 0, "prod": 0}
+
+    gm = fake.manager(backend="mirror")
+    gm.scheduler.redis = _AsyncRedis(redis_latency)
+    github_manager._manager = gm
+
+    rows: Dict[str, Any] = {}
+
+    def row(request_identifier: str):
+        if request_identifier not in rows:
+            environment = ENVIRONMENTS[len(rows) % len(ENVIRONMENTS)]
+            params = {"environment": environment, "instance_type": "t3.micro", "region": "us-east-1"}
+            rows[request_identifier] = (
+                SimpleNamespace(id=request_identifier, request_identifier=request_identifier, user_id="lag",
+                                request_parameters=params, status="pending", environment=environment,
+                                cloud_provider="aws", created_at=None, pr_number=None),
+                SimpleNamespace(email="lag@example.com", name="Lag Check", department="Engineering"),
+            )
+        return rows[request_identifier]
+
+    async def load_request(request_identifier: str):
+        await asyncio.sleep(db_latency)
+        return row(request_identifier)
+
+    async def update_db(request_identifiers: List[str], pr_number):
+        await asyncio.sleep(db_latency)
+        return {"db_updated": True}
+
+    async def requests_details(request_identifiers: List[str]):
+        await asyncio.sleep(db_latency)
+        return {
+            rid: {"request": row(rid)[0], "user": row(rid)[1], "parameters": row(rid)[0].request_parameters}
+            for rid in request_identifiers
+        }
+
+    live = {"load_request": tasks._load_request, "update_db": tasks._update_db,
+            "requests_details": gm._get_requests_details}
+    tasks._load_request = load_request
+    tasks._update_db = update_db
+    gm._get_requests_details = requests_details
+    return live
+
+
+async def _ticker(lags: List[float], stop: asyncio.Event):
+    while not stop.is_set():
+        expected = time.perf_counter() + TICK
+        await asyncio.sleep(TICK)
+        lags.append(max(0.0, time.perf_counter() - expected))
+
+
+async def _measure(work) -> List[float]:
+    lags: List[float] = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_ticker(lags, stop))
+    await asyncio.sleep(TICK * 4)
+    try:
+        await work()
+    finally:
+        stop.set()
+        await ticker
+    return lags
+
+
+def _report(label: str, lags: List[float]) -> float:
+    worst = max(lags) * 1000 if lags else 0.0
+    p99 = statistics.quantiles(lags, n=100)[98] * 1000 if len(lags) >= 100 else worst
+    print(f"{label:<12} ticks={len(lags):<6} p99={p99:7.1f}ms  max={worst:7.1f}ms")
+    return worst
+
+
+async def run_lag_check(concurrency: int, max_lag_ms: float, redis_latency_ms: float, live_db: bool) -> bool:
+    identifiers = [f"lagcheck_{i}" for i in range(concurrency)]
+    _use_pidfd_child_watcher()
+    with OfflineGitHub() as fake:
+        os.environ["REPO_ROOT"] = tempfile.mkdtemp(prefix="aiops-lag-")
+        live = _install_fakes(fake, redis_latency_ms / 1000, 0.002)
+
+        async def one(rid: str) -> Dict[str, Any]:
+            ctx = await tasks._render_async({"request_identifier": rid, "user_email": "lag@example.com"})
+            if ctx["status"] == "rendered":
+                ctx = await tasks._open_pull_request_async(ctx)
+                await tasks._notify_stage_async(ctx)
+            return ctx
+
+        async def pipeline():
+            contexts = await asyncio.gather(*(one(rid) for rid in identifiers))
+            batched = [{"request_identifier": c["request_identifier"], "user_email": c["user_email"]}
+                       for c in contexts if c["status"] == "batched"]
+            if batched:
+                await tasks._process_batch_async("dev", batched)
+            print(f"pipeline     {len(contexts) - len(batched)} single PRs, {len(batched)} batched; "
+                  f"{len(fake.pulls)} PRs opened")
+
+        async def database():
+            async def one_db(rid: str):
+                await live["load_request"](rid)
+                await live["requests_details"]([rid, *identifiers[:5]])
+                await live["update_db"]([rid], None)
+            await asyncio.gather(*(one_db(rid) for rid in identifiers))
+
+        async def calibration():
+            # Proves the ticker notices blocking work: a 200ms synchronous sleep must register
+            time.sleep(0.2)
+
+        calibrated = _report("calibration", await _measure(calibration)) >= 150
+        worst = _report("pipeline", await _measure(pipeline))
+        if live_db:
+            worst = max(worst, _report("database", await _measure(database)))
+
+    if not calibrated:
+        print("FAIL: lag monitor did not detect a deliberate 200ms block")
+        return False
+    if worst > max_lag_ms:
+        print(f"FAIL: event loop blocked for {worst:.1f}ms (limit {max_lag_ms}ms)")
+        return False
+    print("OK: the pipeline stages never blocked the event loop")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Event-loop lag check for the PR pipeline")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--max-lag-ms", type=float, default=50.0)
+    parser.add_argument("--redis-latency-ms", type=float, default=100.0,
+                        help="per-command delay of the Redis fakes; keep it above --max-lag-ms")
+    parser.add_argument("--live-db", action="store_true", help="also query the configured DATABASE_URL")
+    args = parser.parse_args()
+    if args.redis_latency_ms <= args.max_lag_ms:
+        parser.error("--redis-latency-ms must be above --max-lag-ms, or a blocking Redis call could pass")
+    ok = asyncio.run(run_lag_check(args.concurrency, args.max_lag_ms, args.redis_latency_ms, args.live_db))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+# backend/app/webhooks.py
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import re
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+import redis.asyncio as aioredis
+from fastapi import APIRouter, Header, HTTPException, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from .config import REDIS_URL, GITHUB_WEBHOOK_SECRET, GITHUB_DEPLOY_WORKFLOW, WEBHOOK_BATCH_SIZE, WEBHOOK_MAX_ATTEMPTS
+from .database import AsyncSessionLocal
+from .dead_letters import TRANSIENT, DeadLetterQueue, classify_failure
+from .events import DeploymentEvent, EventType
+from .metrics import GITHUB_WEBHOOK_EVENTS
+from .models import InfrastructureRequest, User
+from .notify_handler import push_live
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/webhooks", tags=["webhooks"])
+
+WEBHOOK_QUEUE_KEY = "github_webhooks"
+# Task name of webhook records in the dead-letter queue; replayed by pushing them back on the queue
+DEAD_LETTER_TASK = "webhook"
+DELIVERY_TTL_SECONDS = 24 * 3600
+HANDLED_EVENTS = {"pull_request", "workflow_run", "check_suite"}
+
+# Target status -> statuses it may be entered from. Deliveries can arrive out of order or be
+# redelivered, so anything not listed here is ignored rather than moving a request backwards.
+TRANSITIONS = {
+    "pending_approval": {"pending", "pr_failed", "checks_failed", "rejected"},
+    "checks_failed": {"pending", "pending_approval"},
+    "rejected": {"pending", "pending_approval", "checks_failed"},
+    "deploying": {"pending", "pending_approval", "checks_failed"},
+    "deployed": {"deploying", "pending_approval"},
+    "failed": {"deploying", "pending_approval"},
+}
+
+STATUS_MESSAGES = {
+    "pending_approval": "Pull request #{pr} is open and waiting for DevOps approval.",
+    "checks_failed": "Checks failed on pull request #{pr}. DevOps has been notified.",
+    "rejected": "Pull request #{pr} was closed without merging.",
+    "deploying": "Pull request #{pr} was approved and merged. Deployment started.",
+    "deployed": "Deployment for pull request #{pr} finished.",
+    "failed": "Deployment for pull request #{pr} failed. DevOps team has been notified.",
+}
+
+# Single-request PR branches, see github_manager._request_branch; batch branches carry no one request
+_BRANCH_RE = re.compile(r"^infra-(?!batch-)(?P<rid>.+)$")
+
+_redis: Optional[aioredis.Redis] = None
+
+
+def _get_redis() -> aioredis.Redis:
+    global _redis
+    if _redis is None:
+        _redis = aioredis.from_url(REDIS_URL)
+    return _redis
+
+
+def verify_signature(body: bytes, signature: Optional[str]):
+    if not GITHUB_WEBHOOK_SECRET:
+        raise HTTPException(status_code=503, detail="Webhook secret not configured")
+    if not signature or not signature.startswith("sha256="):
+        raise HTTPException(status_code=401, detail="Missing webhook signature")
+    expected = hmac.new(GITHUB_WEBHOOK_SECRET.encode(), body, hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(expected, signature[len("sha256="):]):
+        raise HTTPException(status_code=401, detail="Invalid webhook signature")
+
+
+def request_identifier_from_branch(branch: Optional[str]) -> Optional[str]:
+    match = _BRANCH_RE.match(branch or "")
+    return match.group("rid") if match else None
+
+
+def _pr_numbers(items: Optional[Iterable[Dict[str, Any]]]) -> List[int]:
+    return [int(pr["number"]) for pr in items or [] if pr.get("number")]
+
+
+def compact_event(event: str, delivery: str, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Keep only what the consumer needs; full payloads can be hundreds of KB."""
+    record = {"delivery": delivery, "event": event, "action": payload.get("action"), "received_at": time.time()}
+    if event == "pull_request":
+        pr = payload.get("pull_request") or {}
+        record.update(
+            pr_numbers=_pr_numbers([pr]),
+            merged=bool(pr.get("merged")),
+            head_branch=(pr.get("head") or {}).get("ref"),
+        )
+    elif event == "workflow_run":
+        run = payload.get("workflow_run") or {}
+        if GITHUB_DEPLOY_WORKFLOW and run.get("path") and not run["path"].startswith(GITHUB_DEPLOY_WORKFLOW):
+            return None
+        record.update(
+            pr_numbers=_pr_numbers(run.get("pull_requests")),
+            conclusion=run.get("conclusion"),
+            head_branch=run.get("head_branch"),
+            run_id=run.get("id"),
+        )
+    elif event == "check_suite":
+        suite = payload.get("check_suite") or {}
+        record.update(
+            pr_numbers=_pr_numbers(suite.get("pull_requests")),
+            conclusion=suite.get("conclusion"),
+            head_branch=suite.get("head_branch"),
+        )
+    else:
+        return None
+    return record
+
+
+def target_status(record: Dict[str, Any]) -> Optional[str]:
+    event, action = record["event"], record.get("action")
+    if event == "pull_request":
+        if action in ("opened", "reopened"):
+            return "pending_approval"
+        if action == "closed":
+            return "deploying" if record.get("merged") else "rejected"
+    elif event == "workflow_run":
+        if action in ("requested", "in_progress"):
+            return "deploying"
+        if action == "completed":
+            if record.get("conclusion") == "success":
+                return "deployed"
+            if record.get("conclusion") in ("failure", "timed_out", "startup_failure"):
+                return "failed"
+    elif event == "check_suite" and action == "completed":
+        if record.get("conclusion") == "success":
+            return "pending_approval"
+        if record.get("conclusion") in ("failure", "timed_out", "action_required"):
+            return "checks_failed"
+    return None
+
+
+@router.post("/github", status_code=202)
+async def github_webhook(
+    request: Request,
+    x_github_event: Optional[str] = Header(None),
+    x_github_delivery: Optional[str] = Header(None),
+    x_hub_signature_256: Optional[str] = Header(None),
+):
+    body = await request.body()
+    verify_signature(body, x_hub_signature_256)
+
+    if x_github_event == "ping":
+        return JSONResponse({"status": "pong"}, status_code=200)
+    if x_github_event not in HANDLED_EVENTS:
+        GITHUB_WEBHOOK_EVENTS.labels(event=x_github_event or "unknown", outcome="ignored").inc()
+        return {"status": "ignored"}
+
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+
+    record = compact_event(x_github_event, x_github_delivery or "", payload)
+    if record is None or target_status(record) is None:
+        GITHUB_WEBHOOK_EVENTS.labels(event=x_github_event, outcome="ignored").inc()
+        return {"status": "ignored"}
+
+    try:
+        await _get_redis().rpush(WEBHOOK_QUEUE_KEY, json.dumps(record))
+    except Exception as e:
+        logger.exception("Failed to queue webhook %s: %s", x_github_delivery, e)
+        # A non-2xx marks the delivery failed in GitHub so it can be redelivered instead of silently lost
+        raise HTTPException(status_code=503, detail="Webhook queue unavailable")
+
+    GITHUB_WEBHOOK_EVENTS.labels(event=x_github_event, outcome="queued").inc()
+    return {"status": "queued", "delivery": x_github_delivery}
+
+
+async def apply_status(
+    db: AsyncSession,
+    target: str,
+    pr_numbers: Iterable[int] = (),
+    request_identifiers: Iterable[str] = (),
+) -> List[InfrastructureRequest]:
+    """Move the matching requests to `target` where TRANSITIONS allows it; returns those changed."""
+    pr_numbers, request_identifiers = list(pr_numbers), list(request_identifiers)
+    if not pr_numbers and not request_identifiers:
+        return []
+    query = select(InfrastructureRequest)
+    if pr_numbers:
+        query = query.where(InfrastructureRequest.pr_number.in_(pr_numbers))
+    else:
+        query = query.where(InfrastructureRequest.request_identifier.in_(request_identifiers))
+
+    changed = []
+    for infra_request in (await db.execute(query)).scalars().all():
+        if infra_request.status not in TRANSITIONS[target]:
+            continue
+        infra_request.status = target
+        if target == "deployed" and not infra_request.deployed_at:
+            infra_request.deployed_at = datetime.utcnow()
+        changed.append(infra_request)
+    return changed
+
+
+async def _notify_status_change(db: AsyncSession, infra_request: InfrastructureRequest):
+    user = await db.get(User, infra_request.user_id)
+    if not user:
+        return
+    # The user's websocket may be held by any API process
+    await push_live(DeploymentEvent(
+        type=EventType.STATUS_CHANGED,
+        request_identifier=infra_request.request_identifier,
+        user_email=user.email,
+        pr_number=infra_request.pr_number,
+        details={
+            "status": infra_request.status,
+            "message": STATUS_MESSAGES[infra_request.status].format(pr=infra_request.pr_number),
+        },
+    ))
+
+
+async def process_webhook_batch(records: List[Dict[str, Any]]) -> int:
+    """Apply a batch of queued events in one transaction, in arrival order."""
+    changed: Dict[str, InfrastructureRequest] = {}
+    async with AsyncSessionLocal() as db:
+        for record in records:
+            target = target_status(record)
+            if target is None:
+                continue
+            rid = request_identifier_from_branch(record.get("head_branch"))
+            for infra_request in await apply_status(
+                db, target, record.get("pr_numbers") or [], [rid] if rid else []
+            ):
+                changed[infra_request.request_identifier] = infra_request
+        await db.commit()
+
+        for infra_request in changed.values():
+            try:
+                await _notify_status_change(db, infra_request)
+            except Exception as e:
+                logger.warning("Could not notify status change for %s: %s", infra_request.request_identifier, e)
+
+    for record in records:
+        GITHUB_WEBHOOK_EVENTS.labels(event=record["event"], outcome="processed").inc()
+    if changed:
+        logger.info("Webhook batch of %d updated %d requests", len(records), len(changed))
+    return len(changed)
+
+
+async def _dedupe(client: aioredis.Redis, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Drop redeliveries, keyed by X-GitHub-Delivery, both within the batch and across batches."""
+    unique, seen = [], set()
+    for record in records:
+        delivery = record.get("delivery")
+        if delivery and delivery in seen:
+            GITHUB_WEBHOOK_EVENTS.labels(event=record["event"], outcome="duplicate").inc()
+            continue
+        seen.add(delivery)
+        unique.append(record)
+
+    keyed = [record for record in unique if record.get("delivery")]
+    pipe = client.pipeline(transaction=False)
+    for record in keyed:
+        pipe.set(f"webhook_delivery:{record['delivery']}", "1", nx=True, ex=DELIVERY_TTL_SECONDS)
+    duplicates = {record["delivery"] for record, is_new in zip(keyed, await pipe.execute()) if not is_new}
+    for record in unique:
+        if record.get("delivery") in duplicates:
+            GITHUB_WEBHOOK_EVENTS.labels(event=record["event"], outcome="duplicate").inc()
+    return [record for record in unique if record.get("delivery") not in duplicates]
+
+
+async def _requeue_at_head(client: aioredis.Redis, records: List[Dict[str, Any]]):
+    """Put records back at the head of the queue and release their dedupe keys so they are retried."""
+    delivery_keys = [f"webhook_delivery:{r['delivery']}" for r in records if r.get("delivery")]
+    if delivery_keys:
+        await client.delete(*delivery_keys)
+    await client.lpush(WEBHOOK_QUEUE_KEY, *[json.dumps(r) for r in reversed(records)])
+
+
+async def _retry_or_dead_letter(client: aioredis.Redis, record: Dict[str, Any], exc: Exception):
+    """Count a failed attempt at one record: back to the tail of the queue, or to the dead-letter queue once exhausted."""
+    if record.get("delivery"):
+        await client.delete(f"webhook_delivery:{record['delivery']}")
+    attempts = int(record.get("attempts") or 0) + 1
+    if attempts < WEBHOOK_MAX_ATTEMPTS:
+        logger.warning("Webhook %s failed (attempt %d/%d), requeued: %s",
+                       record.get("delivery"), attempts, WEBHOOK_MAX_ATTEMPTS, exc)
+        await client.rpush(WEBHOOK_QUEUE_KEY, json.dumps({**record, "attempts": attempts}))
+        return
+    GITHUB_WEBHOOK_EVENTS.labels(event=record["event"], outcome="dead_letter").inc()
+    await asyncio.to_thread(
+        DeadLetterQueue().add, DEAD_LETTER_TASK, [record], {}, exc, classify_failure(exc), attempts,
+        stage="webhook", request_identifier=request_identifier_from_branch(record.get("head_branch")),
+    )
+
+
+async def _apply_one_by_one(client: aioredis.Redis, records: List[Dict[str, Any]]):
+    """Apply a failed batch record by record so one bad delivery cannot hold back the others."""
+    for index, record in enumerate(records):
+        try:
+            await process_webhook_batch([record])
+        except Exception as e:
+            if classify_failure(e) == TRANSIENT:
+                await _requeue_at_head(client, records[index:])
+                raise
+            await _retry_or_dead_letter(client, record, e)
+
+
+async def requeue_webhook(record: Dict[str, Any]) -> str:
+    """Push a dead-lettered record back on the queue with a fresh attempt count."""
+    record = {k: v for k, v in record.items() if k != "attempts"}
+    await _get_redis().rpush(WEBHOOK_QUEUE_KEY, json.dumps(record))
+    return record.get("delivery") or ""
+
+
+async def webhook_consumer(batch_size: int = WEBHOOK_BATCH_SIZE):
+    """
+    Drain the webhook queue: block for the first event, then take whatever else is waiting.
+    A batch that fails on a transient error (e.g. the database is unreachable) goes back to
+    the head of the queue as it is; any other failure is retried record by record, and a
+    record that keeps failing is dead-lettered after WEBHOOK_MAX_ATTEMPTS.
+    """
+    client = _get_redis()
+    while True:
+        try:
+            first = await client.blpop(WEBHOOK_QUEUE_KEY, timeout=5)
+            if not first:
+                continue
+            raw = [first[1]]
+            more = await client.lpop(WEBHOOK_QUEUE_KEY, batch_size - 1) if batch_size > 1 else None
+            raw.extend(more or [])
+
+            records = []
+            for item in raw:
+                try:
+                    records.append(json.loads(item))
+                except ValueError:
+                    logger.warning("Dropping malformed webhook record: %r", item[:200])
+
+            records = await _dedupe(client, records)
+            if not records:
+                continue
+            try:
+                await process_webhook_batch(records)
+            except Exception as e:
+                if classify_failure(e) == TRANSIENT:
+                    await _requeue_at_head(client, records)
+                    raise
+                logger.warning("Webhook batch of %d failed (%s); applying records one at a time", len(records), e)
+                await _apply_one_by_one(client, records)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception("Webhook consumer error: %s", e)
+            await asyncio.sleep(1)
@@ -0,0 +1,162 @@
+# backend/app/worker_runtime.py
+"""
+One long-lived asyncio loop per Celery worker process.
+
+The loop runs in a daemon thread started on worker_process_init, together with a
+process-local async engine (AsyncSessionLocal is rebound to it) and the pooled httpx
+client from github_api. Tasks hand their coroutine to it with run(); pooled asyncpg and
+HTTP connections stay attached to the loop that opened them and are reused across tasks.
+
+On boot the process is also warmed up (warm_start): the manager singletons and ORM
+mappers are built right away, then a DB connection is opened and the git mirror fetched
+in the background on the loop. Those two stay off worker_process_init, which Celery only
+allows a few seconds before it gives up on the process; a task that arrives meanwhile
+waits on the same pool and mirror lock as it would anyway.
+
+Outside a worker (scripts, eager tasks) the runtime starts lazily on first use.
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from celery.signals import worker_process_init, worker_process_shutdown
+from sqlalchemy import text
+from sqlalchemy.orm import configure_mappers
+
+from .config import WORKER_WARM_START
+from .database import AsyncSessionLocal, make_engine
+from .github_api import close_http_client, get_http_client
+from .github_manager import get_github_manager
+from .metrics import WORKER_STARTUP_SECONDS
+from .terraform_manager import get_terraform_manager
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+_lock = threading.Lock()
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_thread: Optional[threading.Thread] = None
+_engine = None
+
+
+async def _open_resources():
+    global _engine
+    _engine = make_engine()
+    AsyncSessionLocal.configure(bind=_engine)
+    get_http_client()
+
+
+async def _close_resources():
+    await close_http_client()
+    if _engine is not None:
+        await _engine.dispose()
+
+
+def start() -> asyncio.AbstractEventLoop:
+    """Start the worker loop if it is not running yet and return it."""
+    global _loop, _thread
+    with _lock:
+        if _loop is not None and _loop.is_running():
+            return _loop
+
+        loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        def _serve():
+            asyncio.set_event_loop(loop)
+            loop.call_soon(ready.set)
+            loop.run_forever()
+
+        thread = threading.Thread(target=_serve, name="aiops-worker-loop", daemon=True)
+        thread.start()
+        ready.wait()
+        asyncio.run_coroutine_threadsafe(_open_resources(), loop).result()
+
+        _loop, _thread = loop, thread
+        logger.info("Worker event loop started")
+        return loop
+
+
+def stop(timeout: float = 10.0):
+    """Close pooled connections and stop the loop thread."""
+    global _loop, _thread, _engine
+    with _lock:
+        loop, thread = _loop, _thread
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(_close_resources(), loop).result(timeout)
+        except Exception as e:
+            logger.warning("Error closing worker resources: %s", e)
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(timeout)
+        loop.close()
+        _loop, _thread, _engine = None, None, None
+        logger.info("Worker event loop stopped")
+
+
+def run(coro_fn: Callable[..., Awaitable[Any]], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+    """Run coro_fn(*args, **kwargs) on the worker loop and block until it finishes."""
+    loop = _loop if _loop is not None and _loop.is_running() else start()
+    if threading.current_thread() is _thread:
+        raise RuntimeError("worker_runtime.run() called from the worker loop itself")
+    future = asyncio.run_coroutine_threadsafe(coro_fn(*args, **kwargs), loop)
+    try:
+        return future.result(timeout)
+    except BaseException:
+        # Timeout or a task-level interrupt: do not leave the coroutine running
+        future.cancel()
+        raise
+
+
+def _observe_step(step: str, started: float):
+    elapsed = time.perf_counter() - started
+    WORKER_STARTUP_SECONDS.labels(step=step).observe(elapsed)
+    logger.info("Warm start: %s took %.2fs", step, elapsed)
+
+
+async def _warm_database():
+    async with _engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+async def _warm_in_background(boot_started: float):
+    for step, warm in (("database", _warm_database), ("git_mirror", get_github_manager().warm_up)):
+        started = time.perf_counter()
+        try:
+            await warm()
+        except Exception as e:
+            logger.warning("Warm start: %s failed, the first task will do it: %s", step, e)
+        _observe_step(step, started)
+    _observe_step("total", boot_started)
+
+
+def warm_start():
+    """Do the one-off work of a worker's first task at boot instead."""
+    boot_started = started = time.perf_counter()
+    start()
+    _observe_step("loop", started)
+
+    started = time.perf_counter()
+    get_github_manager()
+    get_terraform_manager()
+    configure_mappers()
+    _observe_step("managers", started)
+
+    asyncio.run_coroutine_threadsafe(_warm_in_background(boot_started), _loop)
+
+
+@worker_process_init.connect
+def _on_worker_process_init(**kwargs):
+    if WORKER_WARM_START:
+        warm_start()
+    else:
+        start()
+
+
+@worker_process_shutdown.connect
+def _on_worker_process_shutdown(**kwargs):
+    stop()